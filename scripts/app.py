@@ -1,61 +1,90 @@
+import os
 import random
+import uuid
 from flask import Flask, request, jsonify
 from flask_cors import CORS
 import json
-from feng_shui_optimizer import FengShuiOptimizer
-from helpers import (
-    is_position_valid,
-    check_object_collision,
-    add_occupied_positions,
-    get_object_grid_dimensions
-)
+from typing import Tuple
+from feng_shui_optimizer import FengShuiOptimizer, resolve_grid_size, resolve_seed
+from floor_plan import parse_floor_plan, optimize_floor_plan
+from strategies import STRATEGIES, sanitize_algorithm_params
+from layout import Layout, intern_type
+from cancellation import CancellationToken, OptimizationCancelled, validate_cancel_id, request_cancel
+from heatmap import compute_heatmaps
+from wire_format import PLACEMENT_FORMAT_HEADER, placement_format, read_placements, to_columnar, maybe_gzip
+from free_space import FreeSpaceIndex
+from random_layouts import sample_random_layouts, summarize_scores, layouts_to_placements, DEFAULT_PERCENTILES
+from optimizer_pool import PoolBusy, PoolTimeout, optimize_task, optimizer_pool
+from single_flight import SingleFlight, canonical_key
+import numpy as np
 
 app = Flask(__name__)
 CORS(app)
 
-def generate_random_layout(grid_width: int, grid_height: int, objects_to_place: list) -> list:
-    """Generate a truly random layout with collision checking."""
+# Fraction of optimizer requests that collect search diagnostics for the logs
+# even when the client did not ask for them
+DIAGNOSTICS_SAMPLE_RATE = float(os.environ.get('FENG_SHUI_DIAGNOSTICS_SAMPLE_RATE', '0'))
+
+# Trained surrogate model (train_surrogate.py) used to pre-screen proposals; unset scores every proposal.
+# Experimental: it saves exact evaluations but costs wall time in this tree (see surrogate.py)
+SURROGATE_PATH = os.environ.get('FENG_SHUI_SURROGATE_PATH') or None
+
+# Identical optimizer requests in flight share one search (see single_flight.py); 0 turns it off
+COALESCE_OPTIMIZATIONS = os.environ.get('FENG_SHUI_COALESCE_OPTIMIZATIONS', '1') != '0'
+OPTIMIZATION_FLIGHTS = SingleFlight()
+
+def wants_columnar() -> bool:
+    """Whether the client asked for columnar placements; ValueError on an unknown format."""
+    return placement_format(request.headers.get(PLACEMENT_FORMAT_HEADER)) == 'columnar'
+
+def placement_response(payload: dict, columnar: bool):
+    """JSON response in the negotiated placement format, gzipped when accepted (see wire_format.py)."""
+    if columnar:
+        body = app.json.dumps(to_columnar(payload), separators=(',', ':'))
+    else:
+        body = app.json.dumps(payload)
+    response = app.response_class(body, mimetype='application/json')
+    compressed = maybe_gzip(response.get_data(), request.accept_encodings.quality('gzip') > 0)
+    if compressed is not None:
+        response.set_data(compressed)
+        response.headers['Content-Encoding'] = 'gzip'
+    response.headers[PLACEMENT_FORMAT_HEADER] = 'columnar' if columnar else 'objects'
+    response.vary.update(['Accept-Encoding', PLACEMENT_FORMAT_HEADER])
+    return response
+
+def generate_random_layout(grid_width: int, grid_height: int, objects_to_place: list,
+                           rng: random.Random) -> Tuple[list, list]:
+    """
+    Generate a truly random layout without collisions.
+    
+    Each object goes to a uniformly random anchor where it still fits (see
+    free_space.py), drawn from `rng`. Returns the placements and the object
+    types that did not fit in the space left.
+    """
     placements = []
-    occupied_positions = set()
+    unplaced = []
+    free_space = FreeSpaceIndex(grid_width, grid_height, rng)
     
     print(f"Generating random layout for {objects_to_place}")
     
     for obj_type in objects_to_place:
-        max_attempts = 1000
-        placed = False
-        
-        for attempt in range(max_attempts):
-            # Generate random position
-            x = random.randint(0, grid_width - 1)
-            y = random.randint(0, grid_height - 1)
-            
-            # Check if position is valid and doesn't collide
-            if (is_position_valid(x, y, obj_type, occupied_positions, grid_width, grid_height) and
-                not check_object_collision(x, y, obj_type, occupied_positions)):
-                
-                placements.append({
-                    'type': obj_type,
-                    'x': x,
-                    'y': y
-                })
-                
-                # Update occupied positions
-                add_occupied_positions(x, y, obj_type, occupied_positions)
-                placed = True
-                print(f"Placed {obj_type} at ({x}, {y}) on attempt {attempt + 1}")
-                break
-        
-        if not placed:
-            # Fallback: place at origin
-            print(f"WARNING: Could not place {obj_type} after {max_attempts} attempts, placing at origin")
-            placements.append({
-                'type': obj_type,
-                'x': 0,
-                'y': 0
-            })
-            add_occupied_positions(0, 0, obj_type, occupied_positions)
+        type_id = intern_type(obj_type)
+        position = free_space.sample(type_id)
+        if position is None:
+            print(f"WARNING: {obj_type} does not fit in the remaining space, leaving it out")
+            unplaced.append(obj_type)
+            continue
+        
+        x, y = position
+        placements.append({
+            'type': obj_type,
+            'x': x,
+            'y': y
+        })
+        free_space.occupy(type_id, x, y)
+        print(f"Placed {obj_type} at ({x}, {y})")
     
-    return placements
+    return placements, unplaced
 
 @app.route('/test', methods=['GET'])
 def test():
@@ -67,7 +96,12 @@ def test():
             'GET /test',
             'POST /calculate-live-score',
             'POST /random-auto-placer',
-            'POST /feng-shui-optimizer'
+            'POST /feng-shui-optimizer',
+            'POST /floor-plan-optimizer',
+            'POST /cancel-optimization',
+            'POST /heatmap',
+            'POST /random-layouts',
+            'GET /optimizer-stats'
         ]
     })
 
@@ -78,45 +112,23 @@ def calculate_live_score():
         print(f"Received request: {data}")
         
         placements = data.get('placements', [])
-        grid_width = data.get('grid_width', 144)
-        grid_height = data.get('grid_height', 144)
+        try:
+            grid_width, grid_height = resolve_grid_size(data.get('grid_width', 144), data.get('grid_height', 144))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
         print(f"Processing {len(placements)} placements on {grid_width}x{grid_height} grid")
         
         # Create optimizer instance
         optimizer = FengShuiOptimizer(grid_width, grid_height)
         
-        # Calculate score for the current layout
-        score = optimizer._calculate_layout_score(placements)
+        # Calculate score for the current layout (placements in either wire format)
+        layout = read_placements(placements)
+        score = optimizer._calculate_layout_score(layout)
         print(f"Calculated score: {score}")
         
         # Get detailed breakdown
-        breakdown = {
-            'bagua_scores': 0.0,
-            'command_position': optimizer._calculate_command_position_score(placements),
-            'chi_flow': optimizer._calculate_chi_flow_score(placements),
-            'layout_bonus': len(placements) * 10.0,
-            'wall_bonuses': 0.0,
-            'feng_shui_penalties': optimizer._calculate_feng_shui_penalties(placements),
-            'door_blocked': optimizer._check_door_blocked(placements),
-            'furniture_overlap': optimizer._check_furniture_overlap(placements),
-        }
-        
-        # Calculate bagua scores
-        for placement in placements:
-            bagua_score = optimizer._calculate_bagua_score(placement)
-            weight = optimizer.config['furniture_preferences'].get(
-                placement['type'], {}).get('weight', 1)
-            normalized_weight = weight / 10.0
-            breakdown['bagua_scores'] += bagua_score * normalized_weight
-        
-        # Calculate wall bonuses
-        for placement in placements:
-            if placement['type'] in ['door', 'window']:
-                x, y = placement['x'], placement['y']
-                if (x == 0 or x == grid_width - 1 or 
-                    y == 0 or y == grid_height - 1):
-                    breakdown['wall_bonuses'] += 15.0
+        breakdown = optimizer.get_score_breakdown(layout)
         
         # Generate message based on score
         if score >= 80:
@@ -168,26 +180,33 @@ def random_auto_placer():
     """Generate truly random placements with collision checking."""
     try:
         data = request.get_json()
-        grid_width = data.get('grid_width', 144)
-        grid_height = data.get('grid_height', 144)
         objects_to_place = data.get('objects_to_place', ['bed', 'desk', 'door', 'window'])
+        try:
+            grid_width, grid_height = resolve_grid_size(data.get('grid_width', 144), data.get('grid_height', 144))
+            columnar = wants_columnar()
+            seed = resolve_seed(data.get('seed'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
         print(f"Generating random placements for {len(objects_to_place)} objects on {grid_width}x{grid_height} grid")
         
         # Generate random layout with collision checking
-        placements = generate_random_layout(grid_width, grid_height, objects_to_place)
+        placements, unplaced = generate_random_layout(grid_width, grid_height, objects_to_place,
+                                                      random.Random(seed))
         
         # Calculate score for the random layout
         optimizer = FengShuiOptimizer(grid_width, grid_height)
-        score = optimizer._calculate_layout_score(placements)
+        score = optimizer._calculate_layout_score(Layout.from_placements(placements))
         
         print(f"Random layout generated. Score: {score}")
         print(f"Random placements: {placements}")
         
-        return jsonify({
+        return placement_response({
             'placements': placements,
-            'score': score
-        })
+            'score': score,
+            'unplaced': unplaced,
+            'seed': seed
+        }, columnar)
         
     except Exception as e:
         print(f"Error in random_auto_placer: {e}")
@@ -195,35 +214,272 @@ def random_auto_placer():
         traceback.print_exc()
         return jsonify({'error': str(e)}), 500
 
+@app.route('/random-layouts', methods=['POST'])
+def random_layouts():
+    """K random valid layouts of one room, batch-scored, with summary statistics."""
+    try:
+        data = request.get_json()
+        grid_width, grid_height = resolve_grid_size(data.get('grid_width', 144), data.get('grid_height', 144))
+        objects_to_place = data.get('objects_to_place', ['bed', 'desk', 'door', 'window'])
+        count = int(data.get('count', 100))
+        summary_only = bool(data.get('summary_only', False))
+        percentiles = data.get('percentiles', list(DEFAULT_PERCENTILES))
+        seed = resolve_seed(data.get('seed'))
+        columnar = wants_columnar()
+        
+        print(f"Generating {count} random layouts for {len(objects_to_place)} objects on {grid_width}x{grid_height} grid")
+        
+        optimizer = FengShuiOptimizer(grid_width, grid_height)
+        scorer, xs, ys, scores = sample_random_layouts(optimizer, objects_to_place, count,
+                                                       np.random.default_rng(seed))
+        summary = summarize_scores(scores, percentiles)
+        result = {
+            'requested': count,
+            'generated': len(scores),
+            'summary': summary,
+            'seed': seed
+        }
+        if len(scores):
+            best = int(np.argmax(scores))
+            result['best'] = {'placements': scorer.to_layout(xs[best], ys[best]).to_placements(),
+                              'score': float(scores[best])}
+        if not summary_only:
+            result['layouts'] = [{'placements': placements, 'score': float(score)}
+                                 for placements, score in zip(layouts_to_placements(scorer, xs, ys), scores)]
+        
+        print(f"Generated {len(scores)}/{count} random layouts, mean score {summary.get('mean')}")
+        
+        return placement_response(result, columnar)
+        
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        print(f"Error in random_layouts: {e}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/feng-shui-optimizer', methods=['POST'])
 def feng_shui_optimizer():
     """Feng Shui optimization endpoint for the optimize button."""
     try:
         data = request.get_json()
-        grid_width = data.get('grid_width', 144)
-        grid_height = data.get('grid_height', 144)
         objects_to_place = data.get('objects_to_place', ['bed', 'desk', 'door', 'window'])
         
+        # Strategy and budgets: request body overrides config['algorithm']
+        strategy = data.get('strategy', data.get('mode'))
+        try:
+            grid_width, grid_height = resolve_grid_size(data.get('grid_width', 144), data.get('grid_height', 144))
+            algorithm = sanitize_algorithm_params(data.get('algorithm'))
+            algorithm.update(sanitize_algorithm_params(
+                {key: data[key] for key in ('population_size', 'generations') if key in data}))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        # Diagnostics go in the response on request; a sample of the rest only logs them
+        include_diagnostics = bool(data.get('diagnostics', False))
+        algorithm['diagnostics'] = include_diagnostics or random.random() < DIAGNOSTICS_SAMPLE_RATE
+        
+        # Model files come from the server configuration, never from the request
+        algorithm['surrogate_path'] = SURROGATE_PATH
+        
         print(f"Optimizing layout for {len(objects_to_place)} objects on {grid_width}x{grid_height} grid")
         
-        # Create optimizer and get optimized placements
-        optimizer = FengShuiOptimizer(grid_width, grid_height)
-        placements, score = optimizer.optimize_layout(objects_to_place)
+        if strategy is not None and strategy not in STRATEGIES:
+            return jsonify({'error': f"Unknown optimization strategy: {strategy}",
+                            'available_strategies': sorted(STRATEGIES)}), 400
+        try:
+            columnar = wants_columnar()
+            seed = resolve_seed(data.get('seed'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        # Stop when the client goes away or POST /cancel-optimization names cancel_id;
+        # pool workers can only see cancellation through a cancel id
+        pool = optimizer_pool()
+        cancel_id = data.get('cancel_id')
+        if cancel_id is None and pool is not None:
+            cancel_id = uuid.uuid4().hex
+        try:
+            cancel_token = CancellationToken.for_request(request.environ, cancel_id)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        task = {
+            'grid_width': grid_width,
+            'grid_height': grid_height,
+            'objects_to_place': objects_to_place,
+            'strategy': strategy,
+            'algorithm': algorithm,
+            'seed': seed,
+            'cancel_id': cancel_id
+        }
+        
+        def compute():
+            if pool is not None:
+                return pool.run(task, cancel_token)
+            return optimize_task(task, cancel_token)
+        
+        # Requests without a seed coalesce too, and share the seed the first one drew
+        key = canonical_key({
+            'grid_width': grid_width,
+            'grid_height': grid_height,
+            'objects_to_place': objects_to_place,
+            'strategy': strategy,
+            'algorithm': {**algorithm, 'diagnostics': include_diagnostics},
+            'seed': data.get('seed')
+        })
+        try:
+            if COALESCE_OPTIMIZATIONS:
+                result, coalesced = OPTIMIZATION_FLIGHTS.run(key, compute, cancel_token)
+            else:
+                result, coalesced = compute(), False
+        finally:
+            cancel_token.release()
+        placements, score, stats = result['placements'], result['score'], result['stats']
+        if not include_diagnostics:
+            stats.pop('diagnostics', None)
+        stats['coalesced'] = coalesced
         
         print(f"Optimization complete. Score: {score}")
         print(f"Optimized placements: {placements}")
         
-        return jsonify({
+        return placement_response({
             'placements': placements,
-            'score': score
-        })
+            'score': score,
+            'stats': stats,
+            'seed': stats['seed']
+        }, columnar)
         
+    except OptimizationCancelled as e:
+        print(f"Optimization cancelled: {e}")
+        return jsonify({'error': 'Optimization cancelled', 'reason': str(e), 'cancelled': True}), 499
+    except PoolBusy as e:
+        print(f"Optimizer pool busy: {e}")
+        response = jsonify({'error': 'Optimizer busy, retry later', 'reason': str(e)})
+        response.headers['Retry-After'] = '1'
+        return response, 503
+    except PoolTimeout as e:
+        print(f"Optimizer pool timeout: {e}")
+        return jsonify({'error': 'Optimization timed out', 'reason': str(e)}), 504
     except Exception as e:
         print(f"Error in feng_shui_optimizer: {e}")
         import traceback
         traceback.print_exc()
         return jsonify({'error': str(e)}), 500
 
+@app.route('/floor-plan-optimizer', methods=['POST'])
+def floor_plan_optimizer():
+    """Optimize every room of a floor plan in one request."""
+    try:
+        data = request.get_json()
+        seed = resolve_seed(data.get('seed'))
+        rooms = parse_floor_plan(data, seed, SURROGATE_PATH)
+        max_workers = data.get('max_workers')
+        if max_workers is not None:
+            if isinstance(max_workers, bool) or not isinstance(max_workers, int) or max_workers < 1:
+                raise ValueError(f"max_workers must be a positive integer, got {max_workers!r}")
+            # optimize_floor_plan also caps it at the optimizer pool size
+            max_workers = min(max_workers, os.cpu_count() or 1)
+        columnar = wants_columnar()
+        
+        # The pool workers can only see cancellation through a cancel id
+        cancel_token = CancellationToken.for_request(request.environ, data.get('cancel_id') or uuid.uuid4().hex)
+        
+        print(f"Optimizing floor plan with {len(rooms)} rooms")
+        
+        try:
+            result = optimize_floor_plan(rooms, max_workers, cancel_token)
+        finally:
+            cancel_token.release()
+        result['seed'] = seed
+        
+        print(f"Floor plan optimization complete. Total score: {result['total_score']}")
+        
+        return placement_response(result, columnar)
+        
+    except OptimizationCancelled as e:
+        print(f"Floor plan optimization cancelled: {e}")
+        return jsonify({'error': 'Optimization cancelled', 'reason': str(e), 'cancelled': True}), 499
+    except PoolBusy as e:
+        print(f"Optimizer pool busy: {e}")
+        response = jsonify({'error': 'Optimizer busy, retry later', 'reason': str(e)})
+        response.headers['Retry-After'] = '1'
+        return response, 503
+    except PoolTimeout as e:
+        print(f"Optimizer pool timeout: {e}")
+        return jsonify({'error': 'Optimization timed out', 'reason': str(e)}), 504
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        print(f"Error in floor_plan_optimizer: {e}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/cancel-optimization', methods=['POST'])
+def cancel_optimization():
+    """Cancel the running optimization started with the given cancel_id."""
+    try:
+        data = request.get_json()
+        cancel_id = validate_cancel_id(data.get('cancel_id'))
+        if not request_cancel(cancel_id):
+            print(f"Cancel requested for {cancel_id}, which is not running")
+            return jsonify({'cancel_id': cancel_id, 'cancelled': False,
+                            'error': 'No running optimization has this cancel_id'}), 404
+        print(f"Cancel requested for {cancel_id}")
+        return jsonify({'cancel_id': cancel_id, 'cancelled': True})
+        
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        print(f"Error in cancel_optimization: {e}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/heatmap', methods=['POST'])
+def heatmap():
+    """Score raster per object type, given the objects already placed."""
+    try:
+        data = request.get_json()
+        grid_width, grid_height = resolve_grid_size(data.get('grid_width', 144), data.get('grid_height', 144))
+        others = read_placements(data.get('placements', []))
+        object_types = data.get('object_types', ['bed', 'desk', 'door', 'window'])
+        step = int(data.get('step', 4))
+        terms = data.get('terms', 'layout')
+        columnar = wants_columnar()
+        
+        print(f"Computing {terms} heatmaps for {object_types} on {grid_width}x{grid_height} grid, step {step}")
+        
+        optimizer = FengShuiOptimizer(grid_width, grid_height)
+        heatmaps = compute_heatmaps(optimizer, object_types, others, step, terms)
+        
+        return placement_response({
+            'grid_width': grid_width,
+            'grid_height': grid_height,
+            'step': step,
+            'terms': terms,
+            'heatmaps': heatmaps
+        }, columnar)
+        
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        print(f"Error in heatmap: {e}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/optimizer-stats', methods=['GET'])
+def optimizer_stats():
+    """Load on this server process's optimizer pool and request coalescing."""
+    pool = optimizer_pool()
+    return jsonify({
+        'pid': os.getpid(),
+        'pool': pool.to_dict() if pool is not None else None,
+        'coalescing': OPTIMIZATION_FLIGHTS.to_dict() if COALESCE_OPTIMIZATIONS else None
+    })
+
 if __name__ == '__main__':
     print("Starting Feng Shui Scoring Server...")
     print("Server will be available at: http://localhost:5000")
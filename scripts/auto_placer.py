@@ -1,16 +1,25 @@
 from flask import Flask, request, jsonify
 import random
-from helpers import (
-    is_position_valid,
-    check_object_collision,
-    add_occupied_positions,
-    get_boundary_span,
-    get_object_grid_dimensions
-)
-from feng_shui_optimizer import FengShuiOptimizer
+import numpy as np
+from feng_shui_optimizer import FengShuiOptimizer, resolve_seed
+from free_space import FreeSpaceIndex
+from layout import intern_type
 
 app = Flask(__name__)
 
+def opposite_wall(door: dict, grid_width: int, grid_height: int) -> np.ndarray:
+    """Mask of the anchors on the wall opposite a door."""
+    region = np.zeros((grid_height, grid_width), dtype=bool)
+    if door['x'] == 0:
+        region[:, grid_width - 1] = True
+    elif door['x'] == grid_width - 1:
+        region[:, 0] = True
+    elif door['y'] == 0:
+        region[grid_height - 1, :] = True
+    else:
+        region[0, :] = True
+    return region
+
 @app.route('/random-auto-placer', methods=['POST'])
 def random_auto_placer():
     data = request.json
@@ -18,140 +27,48 @@ def random_auto_placer():
     # Get grid dimensions from request, default to 8x8
     grid_width = data.get('grid_width', 8)
     grid_height = data.get('grid_height', 8)
+    try:
+        seed = resolve_seed(data.get('seed'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
     print(f"DEBUG: Starting auto placement for grid {grid_width}x{grid_height}")
     
-    # Define the objects to place
-    objects_to_place = ['bed', 'desk', 'window', 'door']
+    # Define the objects to place, door first so the window can face it
+    objects_to_place = ['door', 'window', 'bed', 'desk']
     
-    # Placement rules for valid configuration
+    # Each object goes to a uniformly random anchor where it still fits (see free_space.py)
     placements = []
-    occupied_positions = set()
+    unplaced = []
+    free_space = FreeSpaceIndex(grid_width, grid_height, random.Random(seed))
     
-    # Place door first (usually on walls)
-    door_placed = False
-    attempts = 0
-    print("DEBUG: Attempting to place door...")
-    while not door_placed and attempts < 100:
-        # Place door on walls with proper bounds checking
-        door_span = get_boundary_span('door')
-        if random.choice([True, False]):  # Horizontal wall
-            door_x = random.randint(0, max(0, grid_width - door_span))
-            door_y = random.choice([0, grid_height - 1])
-        else:  # Vertical wall
-            door_x = random.choice([0, grid_width - 1])
-            door_y = random.randint(0, max(0, grid_height - door_span))
-        
-        print(f"DEBUG: Door attempt {attempts + 1}: position ({door_x}, {door_y})")
+    for obj_type in objects_to_place:
+        print(f"DEBUG: Attempting to place {obj_type}...")
+        type_id = intern_type(obj_type)
+        position = None
         
-        if is_position_valid(door_x, door_y, 'door', occupied_positions, grid_width, grid_height):
-            print(f"DEBUG: Door placement successful at ({door_x}, {door_y})")
-            placements.append({"x": door_x, "y": door_y, "type": "door"})
-            add_occupied_positions(door_x, door_y, 'door', occupied_positions)
-            door_placed = True
-        else:
-            print(f"DEBUG: Door placement failed at ({door_x}, {door_y})")
-        attempts += 1
-    
-    # Place window (usually on walls, opposite to door when possible)
-    window_placed = False
-    attempts = 0
-    print("DEBUG: Attempting to place window...")
-    while not window_placed and attempts < 100:
-        window_span = get_boundary_span('window')
-        # Try to place window on opposite wall from door
-        if door_placed and len(placements) > 0:
-            door_pos = placements[0]
-            # Place window on opposite wall
-            if door_pos['x'] == 0:
-                window_x = grid_width - 1
-                window_y = random.randint(0, max(0, grid_height - window_span))
-            elif door_pos['x'] == grid_width - 1:
-                window_x = 0
-                window_y = random.randint(0, max(0, grid_height - window_span))
-            elif door_pos['y'] == 0:
-                window_x = random.randint(0, max(0, grid_width - window_span))
-                window_y = grid_height - 1
-            elif door_pos['y'] == grid_height - 1:
-                window_x = random.randint(0, max(0, grid_width - window_span))
-                window_y = 0
-            else:
-                # Fallback to random wall placement
-                if random.choice([True, False]):  # Horizontal wall
-                    window_x = random.randint(0, max(0, grid_width - window_span))
-                    window_y = random.choice([0, grid_height - 1])
-                else:  # Vertical wall
-                    window_x = random.choice([0, grid_width - 1])
-                    window_y = random.randint(0, max(0, grid_height - window_span))
-        else:
-            # Random wall placement
-            if random.choice([True, False]):  # Horizontal wall
-                window_x = random.randint(0, max(0, grid_width - window_span))
-                window_y = random.choice([0, grid_height - 1])
-            else:  # Vertical wall
-                window_x = random.choice([0, grid_width - 1])
-                window_y = random.randint(0, max(0, grid_height - window_span))
+        # Place window on the wall opposite the door when it fits there
+        if obj_type == 'window' and placements and placements[0]['type'] == 'door':
+            position = free_space.sample(type_id, opposite_wall(placements[0], grid_width, grid_height))
+        if position is None:
+            position = free_space.sample(type_id)
         
-        print(f"DEBUG: Window attempt {attempts + 1}: position ({window_x}, {window_y})")
+        if position is None:
+            print(f"DEBUG: {obj_type} does not fit in the remaining space")
+            unplaced.append(obj_type)
+            continue
         
-        if is_position_valid(window_x, window_y, 'window', occupied_positions, grid_width, grid_height):
-            print(f"DEBUG: Window placement successful at ({window_x}, {window_y})")
-            placements.append({"x": window_x, "y": window_y, "type": "window"})
-            add_occupied_positions(window_x, window_y, 'window', occupied_positions)
-            window_placed = True
-        else:
-            print(f"DEBUG: Window placement failed at ({window_x}, {window_y})")
-        attempts += 1
-    
-    # Place bed (avoid walls, need space around it)
-    bed_placed = False
-    attempts = 0
-    print("DEBUG: Attempting to place bed...")
-    bed_width, bed_height = get_object_grid_dimensions('bed')
-    while not bed_placed and attempts < 200:
-        # Ensure bed fits within grid bounds
-        bed_x = random.randint(0, max(0, grid_width - bed_width))
-        bed_y = random.randint(0, max(0, grid_height - bed_height))
-        
-        print(f"DEBUG: Bed attempt {attempts + 1}: position ({bed_x}, {bed_y})")
-        
-        if (is_position_valid(bed_x, bed_y, 'bed', occupied_positions, grid_width, grid_height) and
-            not check_object_collision(bed_x, bed_y, 'bed', occupied_positions)):
-            print(f"DEBUG: Bed placement successful at ({bed_x}, {bed_y})")
-            placements.append({"x": bed_x, "y": bed_y, "type": "bed"})
-            add_occupied_positions(bed_x, bed_y, 'bed', occupied_positions)
-            bed_placed = True
-        else:
-            print(f"DEBUG: Bed placement failed at ({bed_x}, {bed_y})")
-        attempts += 1
-    
-    # Place desk (avoid walls, need some space)
-    desk_placed = False
-    attempts = 0
-    print("DEBUG: Attempting to place desk...")
-    desk_width, desk_height = get_object_grid_dimensions('desk')
-    while not desk_placed and attempts < 200:
-        # Ensure desk fits within grid bounds
-        desk_x = random.randint(0, max(0, grid_width - desk_width))
-        desk_y = random.randint(0, max(0, grid_height - desk_height))
-        
-        print(f"DEBUG: Desk attempt {attempts + 1}: position ({desk_x}, {desk_y})")
-        
-        if (is_position_valid(desk_x, desk_y, 'desk', occupied_positions, grid_width, grid_height) and
-            not check_object_collision(desk_x, desk_y, 'desk', occupied_positions)):
-            print(f"DEBUG: Desk placement successful at ({desk_x}, {desk_y})")
-            placements.append({"x": desk_x, "y": desk_y, "type": "desk"})
-            add_occupied_positions(desk_x, desk_y, 'desk', occupied_positions)
-            desk_placed = True
-        else:
-            print(f"DEBUG: Desk placement failed at ({desk_x}, {desk_y})")
-        attempts += 1
+        x, y = position
+        print(f"DEBUG: {obj_type} placement successful at ({x}, {y})")
+        placements.append({"x": x, "y": y, "type": obj_type})
+        free_space.occupy(type_id, x, y)
     
     print(f"DEBUG: Final placements: {placements}")
-    print(f"DEBUG: Final occupied positions: {occupied_positions}")
     
     return jsonify({
         "placements": placements,
+        "unplaced": unplaced,
+        "seed": seed,
         "clear_grid": True  # Indicate that the grid should be cleared first
     })
 
@@ -168,6 +85,10 @@ def feng_shui_optimizer():
     
     # Get custom configuration if provided
     custom_config = data.get('config', None)
+    try:
+        seed = resolve_seed(data.get('seed'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
     print(f"DEBUG: Starting Feng Shui optimization for grid {grid_width}x{grid_height}")
     print(f"DEBUG: Objects to place: {objects_to_place}")
@@ -177,7 +98,8 @@ def feng_shui_optimizer():
         optimizer = FengShuiOptimizer(grid_width, grid_height, custom_config)
         
         # Optimize layout
-        optimized_layout, score = optimizer.optimize_layout(objects_to_place)
+        layout, score = optimizer.optimize_layout(objects_to_place, seed=seed)
+        optimized_layout = layout.to_placements()
         
         # Ensure all requested objects are present
         placed_types = [p['type'] for p in optimized_layout]
@@ -196,7 +118,8 @@ def feng_shui_optimizer():
             "placements": optimized_layout,
             "clear_grid": True,
             "feng_shui_score": score,
-            "analysis": analysis
+            "analysis": analysis,
+            "seed": seed
         })
         
     except Exception as e:
@@ -0,0 +1,337 @@
+"""
+Vectorised Feng Shui scoring for many layouts of the same objects at once.
+
+Every layout in a batch places the same list of object types, so the
+type-dependent parts of the score (which index is the bed, which pairs are
+furniture, ...) are resolved once and the coordinates are held in
+(num_layouts, num_objects) integer arrays. The rules mirror
+FengShuiOptimizer._calculate_layout_score one for one.
+"""
+
+from typing import List, Dict
+import numpy as np
+from helpers import (
+    is_boundary,
+    get_boundary_span,
+    get_object_grid_dimensions,
+    OBJECT_DIMENSIONS,
+    BAGUA_PREFERENCES,
+    DEFAULT_BAGUA_PREFERENCE
+)
+from layout import Layout, as_layout, intern_type
+
+FURNITURE_TYPES = ('bed', 'desk')
+BOUNDARY_TYPES = ('door', 'window')
+
+def _last_index(object_types: List[str], obj_type: str):
+    """Index of the last object of a type (the scalar scorer keeps the last one)."""
+    indices = [i for i, t in enumerate(object_types) if t == obj_type]
+    return indices[-1] if indices else None
+
+def _distance(x1, y1, x2, y2):
+    return np.sqrt((x1 - x2) ** 2 + (y1 - y2) ** 2)
+
+class BatchScorer:
+    """
+    Score a batch of layouts in one pass.
+    """
+
+    def __init__(self, optimizer, object_types: List[str]):
+        """
+        Args:
+            optimizer: FengShuiOptimizer providing the grid size and config
+            object_types: Object type of each column of the coordinate arrays
+        """
+        self.grid_width = optimizer.grid_width
+        self.grid_height = optimizer.grid_height
+        self.config = optimizer.config
+        self.object_types = list(object_types)
+        self.type_ids = tuple(intern_type(t) for t in self.object_types)
+        self.num_objects = len(self.object_types)
+
+        dims = [get_object_grid_dimensions(t) for t in self.object_types]
+        self.widths = np.array([d[0] for d in dims], dtype=np.int64)
+        self.heights = np.array([d[1] for d in dims], dtype=np.int64)
+
+        types = self.object_types
+        self.furniture = np.array([i for i, t in enumerate(types) if t in FURNITURE_TYPES], dtype=np.int64)
+        self.wall_boundaries = np.array([i for i, t in enumerate(types) if t in BOUNDARY_TYPES], dtype=np.int64)
+        self.doors = np.array([i for i, t in enumerate(types) if t == 'door'], dtype=np.int64)
+        self.windows = np.array([i for i, t in enumerate(types) if t == 'window'], dtype=np.int64)
+        self.bed = _last_index(types, 'bed')
+        self.door = _last_index(types, 'door')
+        self.window = _last_index(types, 'window')
+
+        self.pair_i, self.pair_j = np.triu_indices(self.num_objects, k=1)
+        furniture_i, furniture_j = np.triu_indices(len(self.furniture), k=1)
+        self.furniture_pair_i = self.furniture[furniture_i]
+        self.furniture_pair_j = self.furniture[furniture_j]
+        self.is_desk = np.array([types[i] == 'desk' for i in self.furniture], dtype=bool)
+        self.is_bed = np.array([types[i] == 'bed' for i in self.furniture], dtype=bool)
+
+        # Bagua score of each zone for each object, weight already applied
+        preferences = self.config['furniture_preferences']
+        self.bagua_table = np.array([
+            [zone_score * 8.0 * (preferences.get(t, {}).get('weight', 1) / 10.0)
+             for zone_score in BAGUA_PREFERENCES.get(t, DEFAULT_BAGUA_PREFERENCE)]
+            for t in types
+        ], dtype=np.float64).reshape(self.num_objects, 9)
+
+        # Validity follows helpers.is_position_valid / check_object_collision
+        self.known = np.array([t in OBJECT_DIMENSIONS for t in types], dtype=bool)
+        self.boundary_mask = np.array([is_boundary(t) for t in types], dtype=bool)
+        self.spans = np.array([get_boundary_span(t) for t in types], dtype=np.int64)
+        solid = np.array([i for i, t in enumerate(types) if not is_boundary(t)], dtype=np.int64)
+        solid_i, solid_j = np.triu_indices(len(solid), k=1)
+        self.solid_pair_i = solid[solid_i]
+        self.solid_pair_j = solid[solid_j]
+
+    def _overlaps(self, xs, ys, index_i, index_j):
+        """(layouts, pairs) mask of bounding-box overlaps for index pairs."""
+        x1, y1 = xs[:, index_i], ys[:, index_i]
+        x2, y2 = xs[:, index_j], ys[:, index_j]
+        w1, h1 = self.widths[index_i], self.heights[index_i]
+        w2, h2 = self.widths[index_j], self.heights[index_j]
+        return ~((x1 + w1 <= x2) | (x2 + w2 <= x1) | (y1 + h1 <= y2) | (y2 + h2 <= y1))
+
+    def _door_blocked(self, xs, ys):
+        """(layouts, doors, furniture) mask of furniture within 2 cells of a door."""
+        door_x = xs[:, self.doors][:, :, None]
+        door_y = ys[:, self.doors][:, :, None]
+        furniture_x = xs[:, self.furniture][:, None, :]
+        furniture_y = ys[:, self.furniture][:, None, :]
+        furniture_w = self.widths[self.furniture]
+        furniture_h = self.heights[self.furniture]
+        return ((furniture_x <= door_x + 2) & (furniture_x + furniture_w >= door_x - 2) &
+                (furniture_y <= door_y + 2) & (furniture_y + furniture_h >= door_y - 2))
+
+    def _door_window_distances(self, xs, ys):
+        """(layouts, doors, windows) distances between every door and window."""
+        return _distance(xs[:, self.doors][:, :, None], ys[:, self.doors][:, :, None],
+                         xs[:, self.windows][:, None, :], ys[:, self.windows][:, None, :])
+
+    def placement_validity(self, xs: np.ndarray, ys: np.ndarray) -> np.ndarray:
+        """(layouts, objects) mask of placements that pass is_position_valid."""
+        W, H = self.grid_width, self.grid_height
+
+        # Furniture must fit inside the grid
+        solid_ok = ((xs >= 0) & (ys >= 0) &
+                    (xs + self.widths <= W) & (ys + self.heights <= H))
+
+        # Boundaries must sit on a wall with their span inside the grid
+        vertical_wall = (xs == 0) | (xs == W - 1)
+        horizontal_wall = (ys == 0) | (ys == H - 1)
+        boundary_ok = np.where(vertical_wall,
+                               (ys >= 0) & (ys + self.spans <= H),
+                               horizontal_wall & (xs >= 0) & (xs + self.spans <= W))
+
+        return np.where(self.boundary_mask, boundary_ok, solid_ok) & self.known
+
+    def validity(self, xs: np.ndarray, ys: np.ndarray) -> np.ndarray:
+        """Boolean mask of layouts that FengShuiOptimizer._is_valid_layout accepts."""
+        valid = self.placement_validity(xs, ys).all(axis=1)
+        if len(self.solid_pair_i):
+            valid &= ~self._overlaps(xs, ys, self.solid_pair_i, self.solid_pair_j).any(axis=1)
+        return valid
+
+    def invalid_scores(self, xs: np.ndarray, ys: np.ndarray) -> np.ndarray:
+        """Vectorised _check_invalid_configurations: first violation wins."""
+        penalties = self.config['feng_shui_penalties']
+        num_layouts = xs.shape[0]
+        score = np.zeros(num_layouts)
+        unresolved = np.ones(num_layouts, dtype=bool)
+
+        checks = []
+        if len(self.furniture):
+            fx, fy = xs[:, self.furniture], ys[:, self.furniture]
+            out_of_bounds = ((fx < 0) | (fy < 0) |
+                             (fx + self.widths[self.furniture] > self.grid_width) |
+                             (fy + self.heights[self.furniture] > self.grid_height)).any(axis=1)
+            checks.append((out_of_bounds, 10000.0))
+        if len(self.furniture_pair_i):
+            overlap = self._overlaps(xs, ys, self.furniture_pair_i, self.furniture_pair_j).any(axis=1)
+            checks.append((overlap, penalties['furniture_overlap']))
+        if len(self.doors) and len(self.furniture):
+            checks.append((self._door_blocked(xs, ys).any(axis=(1, 2)), penalties['door_blocked']))
+        if len(self.doors) and len(self.windows):
+            too_close = (self._door_window_distances(xs, ys) < 3).any(axis=(1, 2))
+            checks.append((too_close, penalties['door_window_overlap']))
+
+        for violated, penalty in checks:
+            hit = violated & unresolved
+            score[hit] -= penalty
+            unresolved &= ~hit
+        return score
+
+    def components(self, xs: np.ndarray, ys: np.ndarray) -> Dict[str, np.ndarray]:
+        """
+        Score components for every layout, keyed like the live-score breakdown.
+        """
+        xs = np.asarray(xs, dtype=np.int64)
+        ys = np.asarray(ys, dtype=np.int64)
+        W, H = self.grid_width, self.grid_height
+        penalties = self.config['feng_shui_penalties']
+        num_layouts, num_objects = xs.shape
+        zeros = np.zeros(num_layouts)
+        fxs, fys = xs.astype(np.float64), ys.astype(np.float64)
+
+        # Bagua zone of each object's center
+        zone_x = np.clip(((xs + self.widths / 2) / W * 3).astype(np.int64), 0, 2)
+        zone_y = np.clip(((ys + self.heights / 2) / H * 3).astype(np.int64), 0, 2)
+        bagua = self.bagua_table[np.arange(num_objects), zone_y * 3 + zone_x].sum(axis=1)
+
+        # Command position: bed at a moderate distance from the door
+        command = zeros.copy()
+        if self.bed is not None and self.door is not None:
+            distance = _distance(fxs[:, self.bed], fys[:, self.bed], fxs[:, self.door], fys[:, self.door])
+            optimal_distance = min(W, H) * 0.3
+            command = np.maximum(0, 30 - np.abs(distance - optimal_distance)) * 1.0
+
+        # Chi flow: pairwise spacing plus spread around the center of mass
+        chi = zeros.copy()
+        if num_objects >= 2:
+            distance = _distance(fxs[:, self.pair_i], fys[:, self.pair_i], fxs[:, self.pair_j], fys[:, self.pair_j])
+            pair_scores = np.where((distance >= 5) & (distance <= 20), 10.0,
+                                   np.where(distance < 5, -15.0, 2.0))
+            chi = pair_scores.sum(axis=1)
+            if num_objects > 2:
+                center_x = fxs.sum(axis=1, keepdims=True) / num_objects
+                center_y = fys.sum(axis=1, keepdims=True) / num_objects
+                spread = _distance(fxs, fys, center_x, center_y).sum(axis=1)
+                chi = chi + np.minimum(25, spread / num_objects)
+
+        layout_bonus = np.full(num_layouts, num_objects * 10.0)
+
+        # Boundaries on a wall
+        wall_bonuses = zeros.copy()
+        if len(self.wall_boundaries):
+            bx, by = xs[:, self.wall_boundaries], ys[:, self.wall_boundaries]
+            on_wall = (bx == 0) | (bx == W - 1) | (by == 0) | (by == H - 1)
+            wall_bonuses = on_wall.sum(axis=1) * 15.0
+
+        feng_shui = self._feng_shui_penalties(xs, ys, fxs, fys, penalties) if num_objects else zeros.copy()
+
+        door_blocked = zeros.copy()
+        if len(self.doors) and len(self.furniture):
+            blocked = self._door_blocked(xs, ys)
+            per_blocked = penalties['door_blocked'] + np.where(self.is_desk, 500.0, 0.0)
+            door_blocked = -(blocked * per_blocked).sum(axis=(1, 2))
+
+        furniture_overlap = zeros.copy()
+        if len(self.furniture_pair_i):
+            overlaps = self._overlaps(xs, ys, self.furniture_pair_i, self.furniture_pair_j)
+            furniture_overlap = -overlaps.sum(axis=1) * penalties['furniture_overlap']
+
+        door_window_overlap = zeros.copy()
+        if len(self.doors) and len(self.windows):
+            too_close = self._door_window_distances(xs, ys) < 3
+            door_window_overlap = -too_close.sum(axis=(1, 2)) * penalties['door_window_overlap']
+
+        return {
+            'bagua_scores': bagua,
+            'command_position': command,
+            'chi_flow': chi,
+            'layout_bonus': layout_bonus,
+            'wall_bonuses': wall_bonuses,
+            'feng_shui_penalties': feng_shui,
+            'door_blocked': door_blocked,
+            'furniture_overlap': furniture_overlap,
+            'door_window_overlap': door_window_overlap,
+        }
+
+    def _feng_shui_penalties(self, xs, ys, fxs, fys, penalties) -> np.ndarray:
+        """Vectorised _calculate_feng_shui_penalties."""
+        W, H = self.grid_width, self.grid_height
+        score = np.zeros(xs.shape[0])
+
+        # Wall distance bonuses and penalties for furniture
+        if len(self.furniture):
+            fx, fy = xs[:, self.furniture], ys[:, self.furniture]
+            left = fx
+            right = W - (fx + self.widths[self.furniture])
+            top = fy
+            bottom = H - (fy + self.heights[self.furniture])
+            min_distance = np.minimum(np.minimum(left, right), np.minimum(top, bottom))
+            walls_touched = ((left == 0) | (right == 0)).astype(np.int64) + ((top == 0) | (bottom == 0))
+            in_corner = walls_touched >= 2
+            against_wall = (penalties['wall_placement_bonus'] +
+                            np.where(in_corner, penalties['corner_placement_bonus'], 0.0) -
+                            np.where(in_corner & self.is_bed, 75.0, 0.0))
+            per_object = np.where(min_distance == 0, against_wall,
+                         np.where(min_distance > 6, -penalties['furniture_floating'],
+                         np.where(min_distance > 3, -100.0,
+                         np.where(min_distance > 1, -50.0, 0.0))))
+            score += per_object.sum(axis=1)
+
+        bed, door, window = self.bed, self.door, self.window
+        if bed is not None:
+            bed_w, bed_h = self.widths[bed], self.heights[bed]
+            bed_x, bed_y = fxs[:, bed], fys[:, bed]
+            bed_center_x = bed_x + bed_w // 2
+            bed_center_y = bed_y + bed_h // 2
+
+        if bed is not None and door is not None:
+            door_x, door_y = fxs[:, door], fys[:, door]
+            distance_to_foot = _distance(door_x, door_y, bed_x + bed_w // 2, bed_y + bed_h)
+            score -= np.where(distance_to_foot < 8, penalties['door_at_bed_foot'], 0.0)
+
+        if door is not None and window is not None:
+            door_x, door_y = xs[:, door], ys[:, door]
+            window_x, window_y = xs[:, window], ys[:, window]
+            distance = _distance(fxs[:, door], fys[:, door], fxs[:, window], fys[:, window])
+            score -= np.where(distance < 6, penalties['window_next_to_door'], 0.0)
+
+            door_on_wall = (door_x == 0) | (door_x == W - 1) | (door_y == 0) | (door_y == H - 1)
+            window_on_wall = (window_x == 0) | (window_x == W - 1) | (window_y == 0) | (window_y == H - 1)
+            same_wall = (((door_x == 0) & (window_x == 0)) |
+                         ((door_x == W - 1) & (window_x == W - 1)) |
+                         ((door_y == 0) & (window_y == 0)) |
+                         ((door_y == H - 1) & (window_y == H - 1)))
+            same_wall_penalty = door_on_wall & window_on_wall & same_wall & (distance < 12)
+            score -= np.where(same_wall_penalty, penalties['same_wall_door_window'], 0.0)
+
+        if bed is not None and window is not None:
+            distance = _distance(bed_center_x, bed_center_y, fxs[:, window], fys[:, window])
+            score -= np.where(distance < 10, penalties['bed_under_window'], 0.0)
+
+        if bed is not None and door is not None:
+            distance = _distance(fxs[:, door], fys[:, door], bed_center_x, bed_center_y)
+            score -= np.where(distance < 15, penalties['door_facing_bed'], 0.0)
+
+        # Gaps between every door and every piece of furniture
+        if len(self.doors) and len(self.furniture):
+            center_x = fxs[:, self.furniture] + self.widths[self.furniture] // 2
+            center_y = fys[:, self.furniture] + self.heights[self.furniture] // 2
+            distance = _distance(fxs[:, self.doors][:, :, None], fys[:, self.doors][:, :, None],
+                                 center_x[:, None, :], center_y[:, None, :])
+            score -= (distance < 3).sum(axis=(1, 2)) * penalties['door_furniture_gap']
+
+        if door is not None and window is not None:
+            distance = _distance(fxs[:, door], fys[:, door], fxs[:, window], fys[:, window])
+            score -= np.where(distance < 6, penalties['door_window_overlap'], 0.0)
+
+        return score
+
+    def score(self, xs: np.ndarray, ys: np.ndarray) -> np.ndarray:
+        """Total score of every layout, equal to _calculate_layout_score."""
+        xs = np.asarray(xs, dtype=np.int64)
+        ys = np.asarray(ys, dtype=np.int64)
+        if self.num_objects == 0:
+            return np.zeros(xs.shape[0])
+
+        components = self.components(xs, ys)
+        total = sum(components.values())
+
+        invalid = self.invalid_scores(xs, ys)
+        return np.where(invalid < -1000, invalid, total)
+
+    def to_arrays(self, layouts: List[Layout]):
+        """Convert layouts (objects in object_types order) to coordinate arrays."""
+        layouts = [as_layout(layout) for layout in layouts]
+        xs = np.array([layout.xs for layout in layouts], dtype=np.int64).reshape(len(layouts), self.num_objects)
+        ys = np.array([layout.ys for layout in layouts], dtype=np.int64).reshape(len(layouts), self.num_objects)
+        return xs, ys
+
+    def to_layout(self, xs_row, ys_row) -> Layout:
+        """Convert one row of coordinate arrays back to a Layout."""
+        return Layout(self.type_ids, [int(x) for x in xs_row], [int(y) for y in ys_row])
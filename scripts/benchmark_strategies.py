@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Compare optimization strategies on repeated seeded runs.
+
+For each strategy and grid size this reports the mean final score, how many
+runs reached the target score, the mean number of evaluations those runs
+took to first reach it, the expected evaluations per run reaching it, and
+the mean wall time. The target defaults to the median final score over all
+runs of that grid, so it is reachable but not trivial.
+
+Compare strategies on expected evaluations: every evaluation spent, by the
+runs that reached the target (up to reaching it) and by those that did not,
+divided by the number that did. The mean over successful runs alone favours
+a strategy that only succeeds when it gets lucky early. Runs vary a lot, so
+use a few dozen of them per strategy.
+
+    python benchmark_strategies.py --runs 50 --grid 144x144 --grid 96x120
+    python benchmark_strategies.py --strategies annealing adaptive_annealing --target 300
+    python benchmark_strategies.py --param initial_acceptance=0.5 --param window=10
+    python benchmark_strategies.py --surrogate surrogate.npz --grid 96x120
+
+With --surrogate each strategy also runs with that model pre-screening its
+proposals (reported as '<strategy>+surrogate'), on the same seeds.
+"""
+
+import argparse
+import contextlib
+import io
+import statistics
+from typing import List, Dict, Optional
+from feng_shui_optimizer import FengShuiOptimizer
+from strategies import STRATEGIES
+from run_server import parse_grid_size
+
+def run_once(strategy: str, grid_width: int, grid_height: int, objects: List[str],
+             seed: int, params: Dict) -> Dict:
+    """One seeded optimization run with its debug output discarded."""
+    optimizer = FengShuiOptimizer(grid_width, grid_height)
+    with contextlib.redirect_stdout(io.StringIO()):
+        _, score = optimizer.optimize_layout(objects, strategy, params, seed=seed)
+    return {'score': score, 'stats': optimizer.search_stats}
+
+def parse_param(value: str):
+    """Parse a key=value algorithm parameter, converting numbers."""
+    key, _, raw = value.partition('=')
+    if not key or not raw:
+        raise argparse.ArgumentTypeError(f"Parameter must look like key=value, got {value!r}")
+    try:
+        return key, int(raw)
+    except ValueError:
+        try:
+            return key, float(raw)
+        except ValueError:
+            return key, raw
+
+def expected_evaluations(runs: List[Dict], target: float) -> Optional[float]:
+    """Evaluations spent by all runs per run reaching target, or None when none does."""
+    spent, successes = 0, 0
+    for run in runs:
+        evaluations = run['stats'].evaluations_to_reach(target)
+        if evaluations is None:
+            spent += run['stats'].evaluations
+        else:
+            spent += evaluations
+            successes += 1
+    return spent / successes if successes else None
+
+def summarize(runs: List[Dict], target: float) -> Dict:
+    reached = [run['stats'].evaluations_to_reach(target) for run in runs]
+    reached = [evaluations for evaluations in reached if evaluations is not None]
+    return {
+        'mean_score': statistics.mean(run['score'] for run in runs),
+        'reached': len(reached),
+        'mean_evaluations_to_target': statistics.mean(reached) if reached else None,
+        'expected_evaluations': expected_evaluations(runs, target),
+        'mean_evaluations': statistics.mean(run['stats'].evaluations for run in runs),
+        'mean_wall_time': statistics.mean(run['stats'].wall_time for run in runs)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark optimization strategies")
+    parser.add_argument('--strategies', nargs='+', default=['annealing', 'adaptive_annealing'],
+                        choices=sorted(STRATEGIES))
+    parser.add_argument('--grid', type=parse_grid_size, action='append', default=None, metavar='WxH')
+    parser.add_argument('--objects', nargs='+', default=['bed', 'desk', 'door', 'window'])
+    parser.add_argument('--runs', type=int, default=50, help="Seeded runs per strategy and grid")
+    parser.add_argument('--max-iterations', type=int, default=200)
+    parser.add_argument('--target', type=float, default=None,
+                        help="Score to reach (default: median final score per grid)")
+    parser.add_argument('--param', type=parse_param, action='append', default=[], metavar='KEY=VALUE',
+                        help="Extra algorithm parameter passed to every strategy (repeatable)")
+    parser.add_argument('--surrogate', default=None, metavar='PATH',
+                        help="Also run every strategy with this surrogate model (train_surrogate.py)")
+    args = parser.parse_args()
+
+    params = {'max_iterations': args.max_iterations, **dict(args.param)}
+    variants = [(strategy, strategy, params) for strategy in args.strategies]
+    if args.surrogate:
+        variants += [(f"{strategy}+surrogate", strategy, {**params, 'surrogate_path': args.surrogate})
+                     for strategy in args.strategies]
+    for grid_width, grid_height in args.grid or [(144, 144)]:
+        results = {
+            label: [run_once(strategy, grid_width, grid_height, args.objects, seed, variant_params)
+                    for seed in range(args.runs)]
+            for label, strategy, variant_params in variants
+        }
+        all_scores = [run['score'] for runs in results.values() for run in runs]
+        target = args.target if args.target is not None else statistics.median(all_scores)
+
+        print(f"\nGrid {grid_width}x{grid_height}, {args.runs} runs, target score {target:.2f}")
+        print(f"{'strategy':<30}{'mean score':>12}{'reached':>10}{'evals to target':>17}"
+              f"{'expected evals':>16}{'evals':>9}{'wall s':>9}")
+        for strategy, runs in results.items():
+            summary = summarize(runs, target)
+            to_target = summary['mean_evaluations_to_target']
+            expected = summary['expected_evaluations']
+            print(f"{strategy:<30}{summary['mean_score']:>12.2f}"
+                  f"{summary['reached']:>6}/{len(runs):<3}"
+                  f"{(f'{to_target:.1f}' if to_target is not None else '-'):>17}"
+                  f"{(f'{expected:.1f}' if expected is not None else '-'):>16}"
+                  f"{summary['mean_evaluations']:>9.1f}{summary['mean_wall_time']:>9.3f}")
+
+if __name__ == '__main__':
+    main()
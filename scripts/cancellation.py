@@ -0,0 +1,191 @@
+"""
+Cooperative cancellation for long-running optimizations.
+
+A CancellationToken is passed down through optimize_layout, the search
+strategies and _generate_valid_mutation, which call check() in their loops.
+A token trips when:
+
+  * cancel() is called on it,
+  * the HTTP client that started the request disconnects, or
+  * POST /cancel-optimization names its cancel id.
+
+Cancel ids are marked with small files in CANCEL_DIR rather than in memory,
+so a cancel request reaches the optimization whichever server process (or
+optimizer pool worker) is running it. The request that owns an id marks it
+running for as long as it is in flight; cancel markers are only written for
+running ids, and both are removed when the request finishes. Markers left
+behind by a process that died are swept once older than MARKER_TTL.
+"""
+
+import os
+import re
+import select
+import tempfile
+import time
+from typing import Callable, List, Optional
+
+CANCEL_DIR = os.path.join(tempfile.gettempdir(), 'feng_shui_cancel')
+RUNNING_DIR = os.path.join(CANCEL_DIR, 'running')
+CANCELLED_DIR = os.path.join(CANCEL_DIR, 'cancelled')
+CANCEL_ID_PATTERN = re.compile(r'^[A-Za-z0-9_.-]{1,64}$')
+
+# Seconds after which a marker is assumed to belong to a request that never finished
+MARKER_TTL = 3600.0
+
+class OptimizationCancelled(Exception):
+    """Raised by CancellationToken.check() once the token has tripped."""
+
+def validate_cancel_id(cancel_id) -> str:
+    """Return cancel_id if it is usable as a marker name, else raise ValueError."""
+    if not isinstance(cancel_id, str) or not CANCEL_ID_PATTERN.match(cancel_id):
+        raise ValueError("cancel_id must be 1-64 characters of letters, digits, '.', '_' or '-'")
+    return cancel_id
+
+def _marker_path(cancel_id: str) -> str:
+    return os.path.join(CANCELLED_DIR, cancel_id)
+
+def _running_path(cancel_id: str) -> str:
+    return os.path.join(RUNNING_DIR, cancel_id)
+
+def _touch(path: str):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w'):
+        pass
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+def sweep_stale_markers(max_age: float = MARKER_TTL):
+    """Remove running and cancel markers older than max_age seconds."""
+    cutoff = time.time() - max_age
+    for directory in (RUNNING_DIR, CANCELLED_DIR):
+        try:
+            names = os.listdir(directory)
+        except FileNotFoundError:
+            continue
+        for name in names:
+            path = os.path.join(directory, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except FileNotFoundError:
+                pass
+
+def is_running(cancel_id: str) -> bool:
+    """Whether a request that owns cancel_id is in flight in any server process."""
+    return os.path.exists(_running_path(validate_cancel_id(cancel_id)))
+
+def request_cancel(cancel_id: str) -> bool:
+    """
+    Mark cancel_id as cancelled for every process polling it.
+    Returns False, writing nothing, when no request with that id is running.
+    """
+    sweep_stale_markers()
+    if not is_running(cancel_id):
+        return False
+    _touch(_marker_path(cancel_id))
+    return True
+
+def connection_closed(sock) -> bool:
+    """
+    True if the peer of a (plain TCP) socket has closed the connection.
+
+    The request body has already been read, so a readable socket with no
+    data waiting means EOF. TLS sockets cannot be peeked and are reported
+    as open.
+    """
+    if sock is None or hasattr(sock, 'cipher'):
+        return False
+    try:
+        readable, _, _ = select.select([sock], [], [], 0)
+        if not readable:
+            return False
+        return sock.recv(1, 0x2) == b''  # MSG_PEEK
+    except (OSError, ValueError):
+        return True
+
+class CancellationToken:
+    """
+    Flag checked cooperatively by the optimization loops.
+
+    External sources (client disconnect, cancel marker) are polled at most
+    every poll_interval seconds, so check() is cheap enough for inner loops.
+    """
+
+    def __init__(self, cancel_id: Optional[str] = None, poll_interval: float = 0.05):
+        """
+        Args:
+            cancel_id: Id that POST /cancel-optimization can target
+            poll_interval: Minimum seconds between polls of external sources
+        """
+        self.cancel_id = validate_cancel_id(cancel_id) if cancel_id is not None else None
+        self.poll_interval = poll_interval
+        self.reason: Optional[str] = None
+        self._checks: List[Callable[[], Optional[str]]] = []
+        self._last_poll = 0.0
+        # Set on the request's own token, which marks the id running and releases it
+        self._owner = False
+
+    @classmethod
+    def for_request(cls, environ: dict, cancel_id: Optional[str] = None) -> 'CancellationToken':
+        """
+        Token for a werkzeug request, tripped when its client disconnects.
+        The request owns cancel_id until release(): it is marked running,
+        and a cancel marker left over from an earlier request is cleared.
+        """
+        token = cls(cancel_id)
+        if token.cancel_id is not None:
+            sweep_stale_markers()
+            _remove(_marker_path(token.cancel_id))
+            _touch(_running_path(token.cancel_id))
+            token._owner = True
+        sock = environ.get('werkzeug.socket')
+        if sock is not None:
+            token.add_check(lambda: 'client disconnected' if connection_closed(sock) else None)
+        return token
+
+    def add_check(self, check: Callable[[], Optional[str]]):
+        """Add a poll function returning a cancel reason, or None to keep going."""
+        self._checks.append(check)
+
+    def cancel(self, reason: str = 'cancelled'):
+        """Trip the token, and its cancel id for other processes."""
+        if self.reason is None:
+            self.reason = reason
+            print(f"DEBUG: Optimization cancelled ({reason})")
+            if self.cancel_id is not None:
+                _touch(_marker_path(self.cancel_id))
+
+    @property
+    def cancelled(self) -> bool:
+        if self.reason is not None:
+            return True
+        now = time.time()
+        if now - self._last_poll < self.poll_interval:
+            return False
+        self._last_poll = now
+
+        if self.cancel_id is not None and os.path.exists(_marker_path(self.cancel_id)):
+            self.reason = 'cancel requested'
+            print(f"DEBUG: Optimization cancelled ({self.reason})")
+            return True
+        for check in self._checks:
+            reason = check()
+            if reason:
+                self.cancel(reason)
+                return True
+        return False
+
+    def check(self):
+        """Raise OptimizationCancelled if the token has tripped."""
+        if self.cancelled:
+            raise OptimizationCancelled(self.reason)
+
+    def release(self):
+        """Remove this token's running and cancel markers once the request is finished."""
+        if self.cancel_id is not None and self._owner:
+            _remove(_running_path(self.cancel_id))
+            _remove(_marker_path(self.cancel_id))
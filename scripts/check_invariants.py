@@ -0,0 +1,423 @@
+#!/usr/bin/env python3
+"""
+Randomised checks of the invariants the search relies on.
+
+The layout checks draw seeded random layouts in several rooms and compare
+a fast or incremental component against the plain scalar code it stands in
+for; single_flight replays fixed thread interleavings:
+
+    score_bounds   score_upper_bounds() is never below an actual score
+    symmetry       layouts that share a canonical_key() share their score, and
+                   validity is preserved by the symmetries claimed exact for it
+    validity       ValidityTracker agrees with is_position_valid and
+                   check_object_collision through moves, undo and rollback
+    batch_scoring  BatchScorer matches the scalar scorer, component by
+                   component, under the default and perturbed penalty weights
+    single_flight  when a SingleFlight leader is cancelled its followers
+                   restart and still get a result; cancelled followers and
+                   failing leaders behave as documented
+
+Failures are printed with the layout that broke the invariant and the script
+exits with status 1, so it can run in CI or before merging a change to the
+scorer or the request handling.
+
+    python check_invariants.py
+    python check_invariants.py score_bounds --seed 7 --layouts 2000
+"""
+
+import argparse
+import contextlib
+import copy
+import io
+import sys
+import threading
+import time
+from typing import Callable, Dict, List, Set, Tuple
+import numpy as np
+from batch_scoring import BatchScorer
+from cancellation import CancellationToken, OptimizationCancelled
+from feng_shui_optimizer import FengShuiOptimizer
+from helpers import add_occupied_positions, check_object_collision, is_position_valid
+from layout import Layout, intern_type, TYPE_DIMENSIONS, TYPE_IS_BOUNDARY, TYPE_SPANS
+from random_layouts import sample_random_layouts
+from score_bounds import score_upper_bounds
+from single_flight import SingleFlight
+from symmetry import SYMMETRIES, canonical_key, exact_symmetries, transform_layout
+from validity import ValidityTracker
+
+# (grid_width, grid_height) of the rooms checked; the small ones crowd the furniture against the walls
+GRIDS = [(96, 96), (144, 144), (120, 90), (100, 160)]
+
+OBJECT_SETS = [
+    ['bed'],
+    ['desk', 'desk'],
+    ['bed', 'door'],
+    ['door', 'window'],
+    ['bed', 'desk', 'door', 'window'],
+    ['bed', 'desk', 'desk', 'door', 'window', 'window'],
+]
+
+# Slack for floating-point sums taken in a different order
+TOLERANCE = 1e-6
+
+def _rooms():
+    for grid_width, grid_height in GRIDS:
+        for objects in OBJECT_SETS:
+            yield FengShuiOptimizer(grid_width, grid_height), objects
+
+def _describe(optimizer, layout) -> str:
+    placements = ', '.join(f"{p['type']}@({p['x']},{p['y']})" for p in layout.to_placements())
+    return f"{optimizer.grid_width}x{optimizer.grid_height} [{placements}]"
+
+def _random_anchor(rng: np.random.Generator, type_id: int, grid_width: int, grid_height: int) -> Tuple[int, int]:
+    """An anchor near the grid, valid or not: openings mostly on a wall, furniture partly outside."""
+    if TYPE_IS_BOUNDARY[type_id] and rng.random() < 0.75:
+        span = TYPE_SPANS[type_id]
+        wall = int(rng.integers(4))
+        if wall < 2:
+            return (0 if wall == 0 else grid_width - 1), int(rng.integers(-2, grid_height - span + 3))
+        return int(rng.integers(-2, grid_width - span + 3)), (0 if wall == 2 else grid_height - 1)
+    width, height = TYPE_DIMENSIONS[type_id]
+    return (int(rng.integers(-2, grid_width - width + 3)),
+            int(rng.integers(-2, grid_height - height + 3)))
+
+def _random_layouts(rng: np.random.Generator, optimizer, objects: List[str], count: int) -> List[Layout]:
+    """count random valid layouts (fewer in crowded rooms) and count arbitrary ones."""
+    scorer, xs, ys, _ = sample_random_layouts(optimizer, objects, count, rng=rng)
+    layouts = [scorer.to_layout(x_row, y_row) for x_row, y_row in zip(xs, ys)]
+    type_ids = tuple(intern_type(obj_type) for obj_type in objects)
+    for _ in range(count):
+        anchors = [_random_anchor(rng, type_id, optimizer.grid_width, optimizer.grid_height)
+                   for type_id in type_ids]
+        layouts.append(Layout(type_ids, [x for x, _ in anchors], [y for _, y in anchors]))
+    return layouts
+
+def _reference_is_valid(layout: Layout, grid_width: int, grid_height: int) -> bool:
+    """Validity by is_position_valid and check_object_collision, placing the objects one by one."""
+    occupied: Set[Tuple[int, int]] = set()
+    for placement in layout.to_placements():
+        x, y, obj_type = placement['x'], placement['y'], placement['type']
+        if (not is_position_valid(x, y, obj_type, occupied, grid_width, grid_height) or
+                check_object_collision(x, y, obj_type, occupied)):
+            return False
+        add_occupied_positions(x, y, obj_type, occupied)
+    return True
+
+def check_score_bounds(rng: np.random.Generator, layouts: int) -> List[str]:
+    """
+    Random valid layouts and optimized layouts never score above the total
+    bound. The component bounds assume a valid layout (overlapping furniture
+    can earn more chi flow, but scores -10000), so only valid ones are
+    compared component by component.
+    """
+    failures = []
+    for optimizer, objects in _rooms():
+        bounds = score_upper_bounds(optimizer, objects)
+        scorer, xs, ys, _ = sample_random_layouts(optimizer, objects, layouts, rng=rng)
+        candidates = [scorer.to_layout(x_row, y_row) for x_row, y_row in zip(xs, ys)]
+        for seed in range(2):
+            best, _ = optimizer.optimize_layout(objects, 'annealing', {'max_iterations': 200},
+                                                seed=int(rng.integers(1 << 31)) + seed)
+            candidates.append(best)
+
+        for layout in candidates:
+            score = optimizer._calculate_layout_score(layout)
+            if score > bounds['total'] + TOLERANCE:
+                failures.append(f"score {score:.3f} > bound {bounds['total']:.3f}: {_describe(optimizer, layout)}")
+            if optimizer._check_invalid_configurations(layout) < -1000:
+                continue
+            for name, value in optimizer.get_score_breakdown(layout).items():
+                if value > bounds['components'][name] + TOLERANCE:
+                    failures.append(f"{name} {value:.3f} > bound {bounds['components'][name]:.3f}: "
+                                    f"{_describe(optimizer, layout)}")
+    return failures
+
+def _shuffle_within_types(rng: np.random.Generator, layout: Layout) -> Layout:
+    """The same objects with the positions of each type in a random order."""
+    xs, ys = list(layout.xs), list(layout.ys)
+    for type_id in set(layout.types):
+        indices = [index for index, t in enumerate(layout.types) if t == type_id]
+        order = rng.permutation(indices)
+        for index, source in zip(indices, order):
+            xs[index], ys[index] = layout.xs[source], layout.ys[source]
+    return Layout(layout.types, xs, ys)
+
+def check_symmetry(rng: np.random.Generator, layouts: int) -> List[str]:
+    """
+    Every image of a layout under any grid symmetry, and every reordering of
+    same-type objects, that gets the layout's canonical_key() under the
+    'score' symmetries has exactly its score. The 'validity' symmetries map
+    valid layouts to valid ones and invalid to invalid.
+    """
+    failures = []
+    for optimizer, objects in _rooms():
+        grid_width, grid_height = optimizer.grid_width, optimizer.grid_height
+        type_ids = [intern_type(obj_type) for obj_type in objects]
+        score_symmetries = exact_symmetries(optimizer, type_ids, 'score')
+        validity_symmetries = exact_symmetries(optimizer, type_ids, 'validity')
+
+        # Up to eight images each, checked cell by cell
+        for layout in _random_layouts(rng, optimizer, objects, layouts // 8):
+            key = canonical_key(layout, grid_width, grid_height, score_symmetries)
+            score = optimizer._calculate_layout_score(layout)
+            variants = [("shuffled", _shuffle_within_types(rng, layout))]
+            variants += [(symmetry, transform_layout(layout, symmetry, grid_width, grid_height))
+                         for symmetry in SYMMETRIES if symmetry in validity_symmetries]
+            for name, variant in variants:
+                if variant is None or canonical_key(variant, grid_width, grid_height, score_symmetries) != key:
+                    continue
+                variant_score = optimizer._calculate_layout_score(variant)
+                if abs(variant_score - score) > TOLERANCE:
+                    failures.append(f"{name} image scores {variant_score:.3f}, not {score:.3f}, "
+                                    f"with the same key: {_describe(optimizer, layout)}")
+
+            valid = _reference_is_valid(layout, grid_width, grid_height)
+            for symmetry in validity_symmetries:
+                image = transform_layout(layout, symmetry, grid_width, grid_height)
+                if image is not None and _reference_is_valid(image, grid_width, grid_height) != valid:
+                    failures.append(f"{symmetry} changes validity ({valid}): {_describe(optimizer, layout)}")
+    return failures
+
+def _tracker_state(tracker: ValidityTracker) -> Tuple:
+    return tracker.rule_ok, tracker.overlaps, tracker.rule_violations, tracker.overlap_pairs
+
+def _compare_tracker(optimizer, tracker: ValidityTracker, expected: Layout, step: str) -> List[str]:
+    """Differences between a tracker and the reference checks on the layout it should hold."""
+    layout, grid_width, grid_height = tracker.layout, optimizer.grid_width, optimizer.grid_height
+    if layout.key() != expected.key():
+        return [f"after {step} the layout is {_describe(optimizer, layout)}, not {_describe(optimizer, expected)}"]
+    failures = []
+    for index, placement in enumerate(layout.to_placements()):
+        rule_ok = is_position_valid(placement['x'], placement['y'], placement['type'], set(), grid_width, grid_height)
+        if tracker.rule_ok[index] != rule_ok:
+            failures.append(f"after {step} object {index} rule_ok is {tracker.rule_ok[index]}: "
+                            f"{_describe(optimizer, layout)}")
+    if tracker.is_valid != _reference_is_valid(layout, grid_width, grid_height):
+        failures.append(f"after {step} is_valid is {tracker.is_valid}: {_describe(optimizer, layout)}")
+    fresh = ValidityTracker(layout.copy(), grid_width, grid_height, tracker.bucket_size)
+    if _tracker_state(tracker) != _tracker_state(fresh):
+        failures.append(f"after {step} the counts differ from a new tracker's: {_describe(optimizer, layout)}")
+    return failures
+
+def check_validity(rng: np.random.Generator, layouts: int) -> List[str]:
+    """
+    Random appends, moves (long jumps and small steps), undos and rollbacks
+    on a ValidityTracker, compared after every step with the reference
+    checks and with a tracker built from scratch on the same layout.
+    """
+    failures = []
+    for optimizer, objects in _rooms():
+        grid_width, grid_height = optimizer.grid_width, optimizer.grid_height
+        for start in _random_layouts(rng, optimizer, objects, 2):
+            # Start from a prefix so appends are covered; small buckets give objects many of them
+            prefix = int(rng.integers(0, len(start) + 1))
+            bucket_size = int(rng.choice([4, 16, 64]))
+            tracker = ValidityTracker(start.prefix(prefix), grid_width, grid_height, bucket_size)
+            history: List[Layout] = []
+            marks: List[Tuple[int, int]] = []
+            for index in range(prefix, len(start)):
+                tracker.append(start.types[index], start.xs[index], start.ys[index])
+            failures += _compare_tracker(optimizer, tracker, start, 'append')
+
+            for _ in range(layouts // 5):
+                action = rng.random()
+                if action < 0.6 or not history:
+                    history.append(tracker.layout.copy())
+                    index = int(rng.integers(len(start)))
+                    type_id = start.types[index]
+                    if rng.random() < 0.5:
+                        x, y = _random_anchor(rng, type_id, grid_width, grid_height)
+                    else:
+                        x = tracker.layout.xs[index] + int(rng.integers(-3, 4))
+                        y = tracker.layout.ys[index] + int(rng.integers(-3, 4))
+                    expected = history[-1].copy()
+                    expected.move(index, x, y)
+                    tracker.move(index, x, y)
+                    step = 'move'
+                elif action < 0.8:
+                    tracker.undo()
+                    expected = history.pop()
+                    step = 'undo'
+                elif action < 0.9 or not marks:
+                    marks.append((tracker.mark(), len(history)))
+                    continue
+                else:
+                    mark, depth = marks.pop()
+                    marks = [m for m in marks if m[1] <= depth]
+                    tracker.rollback(mark)
+                    expected = history[depth] if depth < len(history) else tracker.layout.copy()
+                    del history[depth:]
+                    step = 'rollback'
+                failures += _compare_tracker(optimizer, tracker, expected, step)
+    return failures
+
+def check_batch_scoring(rng: np.random.Generator, layouts: int) -> List[str]:
+    """
+    BatchScorer.score, components, validity and placement_validity equal
+    _calculate_layout_score, get_score_breakdown, the reference validity and
+    is_position_valid on random valid and arbitrary layouts.
+    """
+    failures = []
+    for optimizer, objects in _rooms():
+        perturbed = FengShuiOptimizer(optimizer.grid_width, optimizer.grid_height, copy.deepcopy(optimizer.config))
+        penalties = perturbed.config['feng_shui_penalties']
+        for name in penalties:
+            penalties[name] *= float(rng.uniform(0.5, 2.0))
+
+        for scored in (optimizer, perturbed):
+            grid_width, grid_height = scored.grid_width, scored.grid_height
+            batch = _random_layouts(rng, scored, objects, layouts // 2)
+            scorer = BatchScorer(scored, objects)
+            xs, ys = scorer.to_arrays(batch)
+            scores = scorer.score(xs, ys)
+            components = scorer.components(xs, ys)
+            validity = scorer.validity(xs, ys)
+            placement_validity = scorer.placement_validity(xs, ys)
+            # The cell-by-cell reference validity is slow; a sample of the batch is enough
+            reference_rows = set(rng.choice(len(batch), size=min(len(batch), layouts // 10), replace=False).tolist())
+
+            for row, layout in enumerate(batch):
+                expected = scored._calculate_layout_score(layout)
+                if abs(scores[row] - expected) > TOLERANCE * max(1.0, abs(expected)):
+                    failures.append(f"score {scores[row]:.3f} != {expected:.3f}: {_describe(scored, layout)}")
+                for name, value in scored.get_score_breakdown(layout).items():
+                    if abs(components[name][row] - value) > TOLERANCE * max(1.0, abs(value)):
+                        failures.append(f"{name} {components[name][row]:.3f} != {value:.3f}: "
+                                        f"{_describe(scored, layout)}")
+                for index, placement in enumerate(layout.to_placements()):
+                    if placement_validity[row, index] != is_position_valid(
+                            placement['x'], placement['y'], placement['type'], set(), grid_width, grid_height):
+                        failures.append(f"placement_validity of object {index} is "
+                                        f"{placement_validity[row, index]}: {_describe(scored, layout)}")
+                if row in reference_rows and validity[row] != _reference_is_valid(layout, grid_width, grid_height):
+                    failures.append(f"validity is {validity[row]}: {_describe(scored, layout)}")
+    return failures
+
+# Seconds for follower threads to start waiting on a flight
+SETTLE_TIME = 0.2
+
+def _start(target, *args) -> threading.Thread:
+    thread = threading.Thread(target=target, args=args, daemon=True)
+    thread.start()
+    return thread
+
+def _flight_scenario(leader_error: BaseException, cancel_follower: bool) -> Tuple[Dict, List, Dict]:
+    """
+    One leader and two followers of the same key. The leader's compute blocks
+    until both followers wait, then raises leader_error; later computes take
+    SETTLE_TIME. With cancel_follower
+    the first follower's token is tripped while it waits.
+
+    Returns:
+        The flight counts, each caller's (result, shared) or exception, and
+        the number of compute() calls
+    """
+    flights = SingleFlight(poll_interval=0.01)
+    release = threading.Event()
+    calls = {'count': 0}
+    lock = threading.Lock()
+
+    def compute():
+        with lock:
+            calls['count'] += 1
+            first = calls['count'] == 1
+        if first:
+            release.wait(5)
+            raise leader_error
+        time.sleep(SETTLE_TIME)  # Long enough for the other follower to join the new flight
+        return {'layout': [], 'computed_by': threading.current_thread().name}
+
+    outcomes: List = [None] * 3
+    tokens = [CancellationToken(poll_interval=0.0) for _ in range(3)]
+
+    def call(slot: int):
+        try:
+            outcomes[slot] = flights.run('key', compute, tokens[slot])
+        except BaseException as e:
+            outcomes[slot] = e
+
+    threads = [_start(call, 0)]
+    time.sleep(SETTLE_TIME)
+    threads += [_start(call, 1), _start(call, 2)]
+    time.sleep(SETTLE_TIME)
+    if cancel_follower:
+        tokens[1].cancel('client disconnected')
+        time.sleep(SETTLE_TIME)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    return flights.to_dict(), outcomes, calls
+
+def check_single_flight(rng: np.random.Generator, layouts: int) -> List[str]:
+    """
+    A cancelled leader makes its followers restart, one of them computing
+    again and the other sharing that result; a cancelled follower gives up
+    alone; any other leader error reaches the followers unchanged.
+    """
+    failures = []
+
+    counts, outcomes, calls = _flight_scenario(OptimizationCancelled('client disconnected'), False)
+    if not isinstance(outcomes[0], OptimizationCancelled):
+        failures.append(f"cancelled leader returned {outcomes[0]!r}")
+    followers = outcomes[1:]
+    if any(not isinstance(outcome, tuple) for outcome in followers):
+        failures.append(f"followers of a cancelled leader got {followers!r}")
+    else:
+        if sorted(shared for _, shared in followers) != [False, True]:
+            failures.append(f"one restarted follower should compute and one share, got {followers!r}")
+        if followers[0][0] is followers[1][0] or followers[0][0] != followers[1][0]:
+            failures.append("followers should get equal, separate copies of the result")
+    if calls['count'] != 2 or counts['restarted'] != 2 or counts['in_flight'] != 0:
+        failures.append(f"cancelled leader: {calls['count']} computes, counts {counts}")
+
+    counts, outcomes, calls = _flight_scenario(OptimizationCancelled('client disconnected'), True)
+    if not isinstance(outcomes[1], OptimizationCancelled) or counts['abandoned'] != 1:
+        failures.append(f"cancelled follower got {outcomes[1]!r}, counts {counts}")
+    if not isinstance(outcomes[2], tuple) or outcomes[2][1] or calls['count'] != 2:
+        failures.append(f"remaining follower got {outcomes[2]!r} after {calls['count']} computes")
+
+    counts, outcomes, calls = _flight_scenario(ValueError('bad request'), False)
+    if not all(isinstance(outcome, ValueError) for outcome in outcomes):
+        failures.append(f"a failing leader's error should reach every caller, got {outcomes!r}")
+    if calls['count'] != 1 or counts['restarted'] != 0 or counts['in_flight'] != 0:
+        failures.append(f"failing leader: {calls['count']} computes, counts {counts}")
+    return failures
+
+CHECKS: Dict[str, Callable[[np.random.Generator, int], List[str]]] = {
+    'score_bounds': check_score_bounds,
+    'symmetry': check_symmetry,
+    'validity': check_validity,
+    'batch_scoring': check_batch_scoring,
+    'single_flight': check_single_flight,
+}
+
+def run_checks(names: List[str], seed: int, layouts: int) -> Dict[str, List[str]]:
+    """Failures of each named check, with the scorers' debug output discarded."""
+    results = {}
+    for name in names:
+        rng = np.random.default_rng(seed)
+        with contextlib.redirect_stdout(io.StringIO()):
+            results[name] = CHECKS[name](rng, layouts)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the search invariants on random layouts")
+    parser.add_argument('checks', nargs='*', metavar='CHECK',
+                        help=f"Checks to run (default: all): {', '.join(CHECKS)}")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--layouts', type=int, default=300, help="Random layouts per room")
+    parser.add_argument('--show', type=int, default=5, help="Failures printed per check")
+    args = parser.parse_args()
+    unknown = [name for name in args.checks if name not in CHECKS]
+    if unknown:
+        parser.error(f"Unknown checks: {', '.join(unknown)}")
+
+    results = run_checks(args.checks or list(CHECKS), args.seed, args.layouts)
+    for name, failures in results.items():
+        print(f"{name:<20}{'ok' if not failures else f'{len(failures)} failures'}")
+        for failure in failures[:args.show]:
+            print(f"    {failure}")
+    sys.exit(1 if any(results.values()) else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""
+Low-overhead search diagnostics.
+
+A SearchDiagnostics object collects, for one optimize_layout call:
+  * proposals rejected as invalid,
+  * acceptance counts per temperature band (decades of the temperature),
+  * time spent proposing moves, validating them and scoring layouts
+    (and ranking them with a surrogate model, when one is loaded).
+
+When disabled every hook is a no-op (timer() hands back one shared null
+context manager), so the hooks stay in the hot loops permanently and the
+server can switch diagnostics on for a sample of requests.
+"""
+
+import contextlib
+import math
+import time
+from typing import Dict, Optional
+
+_NULL_TIMER = contextlib.nullcontext()
+
+class _Timer:
+    __slots__ = ('diagnostics', 'name', 'start')
+
+    def __init__(self, diagnostics: 'SearchDiagnostics', name: str):
+        self.diagnostics = diagnostics
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        timings = self.diagnostics.timings
+        timings[self.name] = timings.get(self.name, 0.0) + time.perf_counter() - self.start
+        return False
+
+def temperature_band(temperature: Optional[float]) -> str:
+    """Decade label of a temperature, e.g. '10-100'."""
+    if temperature is None:
+        return 'greedy'
+    if temperature < 1.0:
+        return '<1'
+    decade = int(math.floor(math.log10(temperature)))
+    return f"{10 ** decade}-{10 ** (decade + 1)}"
+
+class SearchDiagnostics:
+    """
+    Counters and timers filled in by the strategies and mutation code.
+    """
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self.rejected_invalid = 0
+        self.timings: Dict[str, float] = {}
+        self.bands: Dict[str, Dict[str, int]] = {}
+
+    def timer(self, name: str):
+        """Context manager adding its elapsed time to timings[name]."""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, name)
+
+    def reject(self, count: int = 1):
+        """Count proposals thrown away because they broke the layout rules."""
+        if self.enabled:
+            self.rejected_invalid += count
+
+    def record_acceptance(self, temperature: Optional[float], worse: bool, accepted: bool):
+        """Count one scored proposal in its temperature band."""
+        if not self.enabled:
+            return
+        band = self.bands.get(temperature_band(temperature))
+        if band is None:
+            band = self.bands[temperature_band(temperature)] = {
+                'proposals': 0, 'accepted': 0, 'worse': 0, 'worse_accepted': 0}
+        band['proposals'] += 1
+        band['accepted'] += accepted
+        band['worse'] += worse
+        band['worse_accepted'] += worse and accepted
+
+    def to_dict(self, wall_time: float) -> Dict:
+        # Validation runs inside proposal; report the two exclusively
+        validation = self.timings.get('validation', 0.0)
+        proposal = max(0.0, self.timings.get('proposal', 0.0) - validation)
+        scoring = self.timings.get('scoring', 0.0)
+        time_split = {'proposal': proposal, 'validation': validation, 'scoring': scoring}
+        if 'surrogate' in self.timings:
+            time_split['surrogate'] = self.timings['surrogate']
+        return {
+            'rejected_invalid': self.rejected_invalid,
+            'time': {
+                **time_split,
+                'other': max(0.0, wall_time - sum(time_split.values()))
+            },
+            'acceptance_by_temperature': {
+                band: {**counts,
+                       'accept_rate': counts['accepted'] / counts['proposals'] if counts['proposals'] else 0.0,
+                       'worse_accept_rate': counts['worse_accepted'] / counts['worse'] if counts['worse'] else 0.0}
+                for band, counts in self.bands.items()
+            }
+        }
+
+    def summary(self, wall_time: float) -> str:
+        """One-line summary for the logs."""
+        report = self.to_dict(wall_time)
+        times = ', '.join(f"{name} {seconds * 1000:.1f}ms" for name, seconds in report['time'].items())
+        rates = ', '.join(f"{band}: {counts['accept_rate']:.2f}"
+                          for band, counts in report['acceptance_by_temperature'].items())
+        return f"rejected {self.rejected_invalid}; {times}; acceptance {rates or 'n/a'}"
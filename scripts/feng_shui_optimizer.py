@@ -1,22 +1,87 @@
+import os
 import random
 import math
 import time
 from typing import List, Dict, Tuple, Optional
+import numpy as np
 from helpers import (
     is_position_valid,
-    check_object_collision,
-    add_occupied_positions,
     get_boundary_span,
-    get_object_grid_dimensions,
     OBJECT_DIMENSIONS
 )
+from layout import (
+    Layout,
+    as_layout,
+    intern_type,
+    TYPE_NAMES,
+    TYPE_DIMENSIONS,
+    TYPE_IS_KNOWN,
+    TYPE_BAGUA_PREFERENCES,
+    BED,
+    DESK,
+    DOOR,
+    WINDOW,
+    FURNITURE_IDS,
+    WALL_OPENING_IDS
+)
+from strategies import get_strategy, SearchStats
+from cancellation import CancellationToken
+from moves import MoveSelector, MOVE_OPERATORS, random_feasible_position
+from validity import ValidityTracker
+from diagnostics import SearchDiagnostics
+from proposals import PositionSampler
+from symmetry import ScoreCache, exact_symmetries
+from heatmap import BAGUA_ZONE_NAMES, bagua_zone_raster
+from grid_tables import compute_grid_tables, default_tables_dir, load_grid_tables, pin_grid_tables
+from surrogate import SurrogateRanker, load_surrogate
+from score_bounds import score_upper_bounds
+
+def resolve_seed(seed: Optional[int] = None) -> int:
+    """
+    Validate a client-supplied seed, or draw a fresh one when it is None.
+    Drawn seeds fit in 32 bits so they survive a round trip through JSON.
+    """
+    if seed is None:
+        return random.SystemRandom().getrandbits(32)
+    if isinstance(seed, bool) or not isinstance(seed, int) or seed < 0:
+        raise ValueError(f"Seed must be a non-negative integer, got {seed!r}")
+    return seed
+
+# Grid sides a request may ask for; per-grid rasters and caches grow with the area
+MIN_GRID_SIZE = 3
+MAX_GRID_SIZE = int(os.environ.get('FENG_SHUI_MAX_GRID_SIZE', '1000'))
+
+def resolve_grid_size(grid_width=144, grid_height=144) -> Tuple[int, int]:
+    """Validate a client-supplied grid size (144x144 when not given)."""
+    for name, value in (('grid_width', grid_width), ('grid_height', grid_height)):
+        if (isinstance(value, bool) or not isinstance(value, int) or
+                not MIN_GRID_SIZE <= value <= MAX_GRID_SIZE):
+            raise ValueError(f"{name} must be an integer from {MIN_GRID_SIZE} to {MAX_GRID_SIZE}, got {value!r}")
+    return grid_width, grid_height
+
+def warm_grid_cache(grid_sizes: List[Tuple[int, int]], tables_dir: Optional[str] = None):
+    """
+    Precompute the per-grid tables (heatmap.py, proposals.py) for each
+    (grid_width, grid_height). Sizes with tables written by
+    precompute_tables.py under tables_dir (default: $FENG_SHUI_GRID_TABLES)
+    are memory-mapped instead. Either way the tables are pinned in the
+    caches. Worker processes forked afterwards inherit the tables;
+    processes mapping the same files share their pages.
+    """
+    tables_dir = tables_dir or default_tables_dir()
+    for grid_width, grid_height in grid_sizes:
+        optimizer = FengShuiOptimizer(grid_width, grid_height)
+        if tables_dir and load_grid_tables(tables_dir, optimizer):
+            continue
+        pin_grid_tables(optimizer, compute_grid_tables(optimizer))
 
 class FengShuiOptimizer:
     """
     Hill-climbing algorithm for optimizing furniture layouts based on Feng Shui principles.
     """
     
-    def __init__(self, grid_width: int, grid_height: int, config: Optional[Dict] = None):
+    def __init__(self, grid_width: int, grid_height: int, config: Optional[Dict] = None,
+                 seed: Optional[int] = None):
         """
         Initialize the Feng Shui optimizer.
         
@@ -24,6 +89,7 @@ class FengShuiOptimizer:
             grid_width: Width of the grid in cells
             grid_height: Height of the grid in cells
             config: Configuration dictionary for Feng Shui parameters
+            seed: Seed of the optimizer's random streams (drawn fresh if None)
         """
         self.grid_width = grid_width
         self.grid_height = grid_height
@@ -96,126 +162,160 @@ class FengShuiOptimizer:
                 'door_window_overlap': 2500.0     # Extremely harsh penalty for overlapping doors and windows
             },
             
-            # Algorithm parameters
+            # Algorithm parameters (see strategies.py for each strategy's budgets)
             'algorithm': {
-                'max_iterations': 1000,
-                'max_no_improvement': 100,
-                'temperature': 1.0,
+                'strategy': 'annealing',
+                'max_iterations': 200,
+                'max_no_improvement': 50,
+                'temperature': 100.0,
                 'cooling_rate': 0.95,
-                'mutation_rate': 0.3
+                'mutation_rate': 0.3,
+                'time_limit': 20.0,
+                'time_budget': 20.0,   # Whole request, including repair stages
+                'search_share': 0.7,   # Part of the budget for the main search
+                'diagnostics': False,  # Collect search diagnostics (see diagnostics.py)
+                'guided_proposals': True,     # Sample new positions from the position scores (see proposals.py)
+                'proposal_temperature': 50.0, # Score scale of the guided distribution
+                'uniform_mix': 0.2,           # Share of guided proposals replaced by uniform ones
+                'score_cache_size': 50000,    # Layout scores memoised per run by canonical form (see symmetry.py)
+                'surrogate_path': None,       # Experimental, slower here: trained surrogate ranking proposals before exact scoring (see surrogate.py)
+                'surrogate_candidates': 8,    # Proposals ranked per iteration when a surrogate is loaded
+                'surrogate_top_fraction': 0.25, # Share of them scored exactly
+                'bound_tolerance': 0.0        # Stop once the best score is this close to its upper bound (see score_bounds.py); None never stops
             }
         }
         
         # Initialize bagua map
         self.bagua_map = self._create_bagua_map()
-    
-    def _create_bagua_map(self) -> Dict[Tuple[int, int], str]:
-        """
-        Create a bagua map overlay for the grid.
-        Returns a dictionary mapping grid positions to bagua zones.
-        """
-        bagua_map = {}
         
-        # Calculate zone sizes
-        zone_width = self.grid_width // 3
-        zone_height = self.grid_height // 3
+        # Disabled until optimize_layout asks for diagnostics
+        self.diagnostics = SearchDiagnostics()
         
-        # Define bagua zones (3x3 grid)
-        zones = [
-            ['career', 'knowledge', 'family'],
-            ['helpful_people', 'health', 'wealth'],
-            ['children', 'relationships', 'fame']
-        ]
+        # Normalized preference weight per interned type id
+        self._type_weights: Dict[int, float] = {}
+        
+        # Initial placements, jumps and relaxation draw positions from here
+        self.position_sampler = self._make_position_sampler(self.config.get('algorithm', {}))
         
-        # Map each grid position to its bagua zone
-        for y in range(self.grid_height):
-            for x in range(self.grid_width):
-                zone_x = min(x // zone_width, 2)
-                zone_y = min(y // zone_height, 2)
-                bagua_map[(x, y)] = zones[zone_y][zone_x]
+        # Scores of layouts the search loops have already seen
+        self.score_cache = ScoreCache(self._calculate_layout_score, grid_width, grid_height,
+                                      max_entries=self.config.get('algorithm', {}).get('score_cache_size', 50000))
         
-        return bagua_map
+        # Set by optimize_layout when algorithm 'surrogate_path' names a model
+        self.surrogate: Optional[SurrogateRanker] = None
+        
+        # Strategies stop once their best score reaches this (set by optimize_layout)
+        self.stop_score = float('inf')
+        
+        # Every random draw of this optimizer and its strategies comes from these
+        # streams, never from the global random modules, so concurrent requests
+        # do not share state and a seed replays a run
+        self.reseed(seed)
+    
+    def reseed(self, seed: Optional[int] = None) -> int:
+        """
+        Restart the random streams from `seed` (a fresh seed if None).
+        self.rng (random.Random) serves the move operators, proposals and
+        acceptance tests; self.np_rng (numpy Generator) the vectorised
+        strategies. Returns the seed.
+        """
+        self.seed = resolve_seed(seed)
+        self.rng = random.Random(self.seed)
+        self.np_rng = np.random.default_rng(self.seed)
+        return self.seed
+    
+    def _create_bagua_map(self) -> np.ndarray:
+        """
+        Create a bagua map overlay for the grid.
+        Returns a (grid_height, grid_width) raster of indices into
+        BAGUA_ZONE_NAMES. The map only depends on the grid size, so it is
+        built once per size (or mapped from grid_tables.py files).
+        """
+        return bagua_zone_raster(self.grid_width, self.grid_height)
     
     def _get_bagua_zone(self, x: int, y: int) -> str:
         """Get the bagua zone for a given position."""
-        return self.bagua_map.get((x, y), 'health')
-    
-    def _calculate_bagua_score(self, placement: Dict) -> float:
-        """Calculate Bagua score for a placement."""
-        x, y = placement['x'], placement['y']
-        obj_type = placement['type']
-        
+        if 0 <= x < self.grid_width and 0 <= y < self.grid_height:
+            return BAGUA_ZONE_NAMES[self.bagua_map[y, x]]
+        return 'health'
+
+    def _type_weight(self, type_id: int) -> float:
+        """Normalized furniture preference weight for a type id."""
+        weight = self._type_weights.get(type_id)
+        if weight is None:
+            weight = self.config['furniture_preferences'].get(
+                TYPE_NAMES[type_id], {}).get('weight', 1) / 10.0
+            self._type_weights[type_id] = weight
+        return weight
+
+    def _calculate_bagua_score(self, layout: Layout, index: int) -> float:
+        """Calculate Bagua score for the object at `index`."""
+        x, y = layout.xs[index], layout.ys[index]
+        type_id = layout.types[index]
+
         # Get object dimensions
-        obj_width, obj_height = get_object_grid_dimensions(obj_type)
-        
+        obj_width, obj_height = TYPE_DIMENSIONS[type_id]
+
         # Calculate center of object
         center_x = x + obj_width / 2
         center_y = y + obj_height / 2
-        
+
         # Map to Bagua zones (3x3 grid)
         zone_x = int((center_x / self.grid_width) * 3)
         zone_y = int((center_y / self.grid_height) * 3)
         zone_x = min(2, max(0, zone_x))
         zone_y = min(2, max(0, zone_y))
-        
-        # Bagua zone preferences for different objects
-        bagua_preferences = {
-            'bed': [8, 7, 6, 5, 4, 3, 2, 1, 0],  # Prefer back zones
-            'desk': [6, 7, 8, 3, 4, 5, 0, 1, 2],  # Prefer front zones
-            'door': [6, 3, 0, 7, 4, 1, 8, 5, 2],  # Prefer left zones
-            'window': [2, 5, 8, 1, 4, 7, 0, 3, 6],  # Prefer right zones
-        }
-        
+
         zone_index = zone_y * 3 + zone_x
-        preferences = bagua_preferences.get(obj_type, [4, 4, 4, 4, 4, 4, 4, 4, 4])
-        zone_score = preferences[zone_index]
-        
+        zone_score = TYPE_BAGUA_PREFERENCES[type_id][zone_index]
+
         return zone_score * 8.0  # Reduced from 15.0
 
-    def _calculate_command_position_score(self, placements: List[Dict]) -> float:
+    def _find_last(self, layout: Layout, type_id: int) -> Optional[int]:
+        """Index of the last object of a type (later placements win)."""
+        types = layout.types
+        for index in range(len(types) - 1, -1, -1):
+            if types[index] == type_id:
+                return index
+        return None
+
+    def _calculate_command_position_score(self, placements) -> float:
         """Calculate command position score (bed should face door)."""
-        bed_placement = None
-        door_placement = None
-        
-        for placement in placements:
-            if placement['type'] == 'bed':
-                bed_placement = placement
-            elif placement['type'] == 'door':
-                door_placement = placement
-        
-        if not bed_placement or not door_placement:
+        layout = as_layout(placements)
+        bed = self._find_last(layout, BED)
+        door = self._find_last(layout, DOOR)
+
+        if bed is None or door is None:
             return 0.0
-        
+
         # Calculate distance between bed and door
-        bed_x, bed_y = bed_placement['x'], bed_placement['y']
-        door_x, door_y = door_placement['x'], door_placement['y']
-        
+        bed_x, bed_y = layout.xs[bed], layout.ys[bed]
+        door_x, door_y = layout.xs[door], layout.ys[door]
+
         distance = math.sqrt((bed_x - door_x)**2 + (bed_y - door_y)**2)
-        
+
         # Optimal distance is moderate (not too close, not too far)
         optimal_distance = min(self.grid_width, self.grid_height) * 0.3
         distance_score = max(0, 30 - abs(distance - optimal_distance))
-        
+
         return distance_score * 1.0  # Reduced from 2.0
 
-    def _calculate_chi_flow_score(self, placements: List[Dict]) -> float:
+    def _calculate_chi_flow_score(self, placements) -> float:
         """Calculate chi flow score (energy flow through space)."""
-        if len(placements) < 2:
+        layout = as_layout(placements)
+        count = len(layout)
+        if count < 2:
             return 0.0
-        
+
+        xs, ys = layout.xs, layout.ys
         total_score = 0.0
-        
+
         # Check spacing between objects
-        for i, placement1 in enumerate(placements):
-            for j, placement2 in enumerate(placements):
-                if i >= j:
-                    continue
-                
-                x1, y1 = placement1['x'], placement1['y']
-                x2, y2 = placement2['x'], placement2['y']
-                
-                distance = math.sqrt((x1 - x2)**2 + (y1 - y2)**2)
-                
+        for i in range(count):
+            x1, y1 = xs[i], ys[i]
+            for j in range(i + 1, count):
+                distance = math.sqrt((x1 - xs[j])**2 + (y1 - ys[j])**2)
+
                 # Optimal spacing is moderate
                 if 5 <= distance <= 20:
                     total_score += 10.0  # Reduced from 20.0
@@ -223,769 +323,869 @@ class FengShuiOptimizer:
                     total_score -= 15.0  # Increased penalty for too close
                 else:
                     total_score += 2.0  # Reduced bonus for far apart
-        
+
         # Bonus for balanced layout (objects not all clustered)
-        if len(placements) > 2:
+        if count > 2:
             # Calculate center of mass
-            center_x = sum(p['x'] for p in placements) / len(placements)
-            center_y = sum(p['y'] for p in placements) / len(placements)
-            
+            center_x = sum(xs) / count
+            center_y = sum(ys) / count
+
             # Calculate spread
-            spread = sum(math.sqrt((p['x'] - center_x)**2 + (p['y'] - center_y)**2) for p in placements)
-            spread_score = min(25, spread / len(placements))
+            spread = sum(math.sqrt((x - center_x)**2 + (y - center_y)**2) for x, y in zip(xs, ys))
+            spread_score = min(25, spread / count)
             total_score += spread_score
-        
+
         return total_score
 
-    def _calculate_feng_shui_penalties(self, placements: List[Dict]) -> float:
+    def _calculate_feng_shui_penalties(self, placements) -> float:
         """
         Calculate penalties for specific Feng Shui violations.
         """
+        layout = as_layout(placements)
+        types, xs, ys = layout.types, layout.xs, layout.ys
+        penalties = self.config['feng_shui_penalties']
         penalty_score = 0.0
-        
+
         # Find bed, door, and window placements
-        bed_placement = None
-        door_placement = None
-        window_placement = None
-        
-        for placement in placements:
-            if placement['type'] == 'bed':
-                bed_placement = placement
-            elif placement['type'] == 'door':
-                door_placement = placement
-            elif placement['type'] == 'window':
-                window_placement = placement
-        
+        bed = self._find_last(layout, BED)
+        door = self._find_last(layout, DOOR)
+        window = self._find_last(layout, WINDOW)
+
         # Improved wall detection and furniture placement scoring
-        for placement in placements:
-            x, y = placement['x'], placement['y']
-            obj_type = placement['type']
-            
-            if obj_type in ['bed', 'desk']:  # Only apply to furniture
-                obj_width, obj_height = get_object_grid_dimensions(obj_type)
-                
+        for index, type_id in enumerate(types):
+            if type_id in FURNITURE_IDS:  # Only apply to furniture
+                x, y = xs[index], ys[index]
+                obj_type = TYPE_NAMES[type_id]
+                obj_width, obj_height = TYPE_DIMENSIONS[type_id]
+
                 # Calculate distance to nearest wall
                 distance_to_left_wall = x
                 distance_to_right_wall = self.grid_width - (x + obj_width)
                 distance_to_top_wall = y
                 distance_to_bottom_wall = self.grid_height - (y + obj_height)
-                
-                min_distance_to_wall = min(distance_to_left_wall, distance_to_right_wall, 
+
+                min_distance_to_wall = min(distance_to_left_wall, distance_to_right_wall,
                                          distance_to_top_wall, distance_to_bottom_wall)
-                
+
                 # Bonus for being against a wall (distance = 0)
                 if min_distance_to_wall == 0:
-                    bonus_weight = self.config['feng_shui_penalties']['wall_placement_bonus']
+                    bonus_weight = penalties['wall_placement_bonus']
                     penalty_score += bonus_weight
                     print(f"DEBUG: {obj_type} bonus - against wall at ({x}, {y})")
-                    
+
                     # Extra bonus for corner placement (against two walls)
                     walls_touched = 0
                     if distance_to_left_wall == 0 or distance_to_right_wall == 0:
                         walls_touched += 1
                     if distance_to_top_wall == 0 or distance_to_bottom_wall == 0:
                         walls_touched += 1
-                    
+
                     if walls_touched >= 2:
-                        corner_bonus = self.config['feng_shui_penalties']['corner_placement_bonus']
+                        corner_bonus = penalties['corner_placement_bonus']
                         penalty_score += corner_bonus
                         print(f"DEBUG: {obj_type} corner bonus - against multiple walls at ({x}, {y})")
-                    
+
                     # Special scoring for beds: corner placement is actually worse than single wall
-                    if obj_type == 'bed' and walls_touched >= 2:
+                    if type_id == BED and walls_touched >= 2:
                         penalty_score -= 75.0  # Penalty for bed in corner (too restrictive)
                         print(f"DEBUG: {obj_type} corner penalty - bed in corner is too restrictive")
-                
+
                 # Harsh penalty for being too far from walls (floating in middle)
                 elif min_distance_to_wall > 6:
-                    penalty_weight = self.config['feng_shui_penalties']['furniture_floating']
+                    penalty_weight = penalties['furniture_floating']
                     penalty_score -= penalty_weight
                     print(f"DEBUG: {obj_type} penalty - floating in middle, min wall distance: {min_distance_to_wall}")
-                
+
                 # Moderate penalty for being somewhat far from walls
                 elif min_distance_to_wall > 3:
                     penalty_score -= 100.0
                     print(f"DEBUG: {obj_type} moderate penalty - somewhat far from wall, distance: {min_distance_to_wall}")
-                
+
                 # Small penalty for being slightly far from walls
                 elif min_distance_to_wall > 1:
                     penalty_score -= 50.0
                     print(f"DEBUG: {obj_type} minor penalty - slightly far from wall, distance: {min_distance_to_wall}")
-        
+
+        bed_width, bed_height = TYPE_DIMENSIONS[BED]
+
         # Penalty 2: Door across the foot of the bed (door should not be at foot of bed)
-        if bed_placement and door_placement:
-            bed_x, bed_y = bed_placement['x'], bed_placement['y']
-            door_x, door_y = door_placement['x'], door_placement['y']
-            bed_width, bed_height = get_object_grid_dimensions('bed')
-            
+        if bed is not None and door is not None:
+            bed_x, bed_y = xs[bed], ys[bed]
+            door_x, door_y = xs[door], ys[door]
+
             # Calculate bed foot position (assuming bed head is at the top)
             bed_foot_x = bed_x + bed_width // 2  # Center of bed foot
             bed_foot_y = bed_y + bed_height  # Bottom of bed
-            
+
             # Check if door is near the foot of the bed
             distance_to_foot = math.sqrt((door_x - bed_foot_x)**2 + (door_y - bed_foot_y)**2)
-            
+
             if distance_to_foot < 8:  # Door too close to bed foot
-                penalty_weight = self.config['feng_shui_penalties']['door_at_bed_foot']
+                penalty_weight = penalties['door_at_bed_foot']
                 penalty_score -= penalty_weight
                 print(f"DEBUG: Door penalty - too close to bed foot, distance: {distance_to_foot:.2f}")
-        
+
         # Penalty 3: Window directly next to door (should have some separation)
-        if door_placement and window_placement:
-            door_x, door_y = door_placement['x'], door_placement['y']
-            window_x, window_y = window_placement['x'], window_placement['y']
-            
+        if door is not None and window is not None:
+            door_x, door_y = xs[door], ys[door]
+            window_x, window_y = xs[window], ys[window]
+
             # Calculate distance between door and window
             door_window_distance = math.sqrt((door_x - window_x)**2 + (door_y - window_y)**2)
-            
+
             if door_window_distance < 6:  # Window too close to door
-                penalty_weight = self.config['feng_shui_penalties']['window_next_to_door']
+                penalty_weight = penalties['window_next_to_door']
                 penalty_score -= penalty_weight
                 print(f"DEBUG: Window penalty - too close to door, distance: {door_window_distance:.2f}")
-            
+
             # Additional penalty if door and window are on the same wall
-            door_on_wall = (door_x == 0 or door_x == self.grid_width - 1 or 
+            door_on_wall = (door_x == 0 or door_x == self.grid_width - 1 or
                            door_y == 0 or door_y == self.grid_height - 1)
-            window_on_wall = (window_x == 0 or window_x == self.grid_width - 1 or 
+            window_on_wall = (window_x == 0 or window_x == self.grid_width - 1 or
                              window_y == 0 or window_y == self.grid_height - 1)
-            
+
             if door_on_wall and window_on_wall:
                 # Check if they're on the same wall side
-                same_wall = ((door_x == 0 and window_x == 0) or 
+                same_wall = ((door_x == 0 and window_x == 0) or
                             (door_x == self.grid_width - 1 and window_x == self.grid_width - 1) or
-                            (door_y == 0 and window_y == 0) or 
+                            (door_y == 0 and window_y == 0) or
                             (door_y == self.grid_height - 1 and window_y == self.grid_height - 1))
-                
+
                 if same_wall and door_window_distance < 12:
-                    penalty_weight = self.config['feng_shui_penalties']['same_wall_door_window']
+                    penalty_weight = penalties['same_wall_door_window']
                     penalty_score -= penalty_weight
                     print(f"DEBUG: Same wall penalty - door and window on same wall, distance: {door_window_distance:.2f}")
-        
+
         # Penalty 4: Bed directly under window (bed should not be under window)
-        if bed_placement and window_placement:
-            bed_x, bed_y = bed_placement['x'], bed_placement['y']
-            window_x, window_y = window_placement['x'], window_placement['y']
-            bed_width, bed_height = get_object_grid_dimensions('bed')
-            
+        if bed is not None and window is not None:
+            bed_x, bed_y = xs[bed], ys[bed]
+            window_x, window_y = xs[window], ys[window]
+
             # Check if bed is positioned under or very close to window
             bed_center_x = bed_x + bed_width // 2
             bed_center_y = bed_y + bed_height // 2
-            
+
             distance_to_window = math.sqrt((bed_center_x - window_x)**2 + (bed_center_y - window_y)**2)
-            
+
             if distance_to_window < 10:  # Bed too close to window
-                penalty_weight = self.config['feng_shui_penalties']['bed_under_window']
+                penalty_weight = penalties['bed_under_window']
                 penalty_score -= penalty_weight
                 print(f"DEBUG: Bed under window penalty - distance: {distance_to_window:.2f}")
-        
+
         # Penalty 5: Door facing bed directly (door should not directly face bed)
-        if bed_placement and door_placement:
-            bed_x, bed_y = bed_placement['x'], bed_placement['y']
-            door_x, door_y = door_placement['x'], door_placement['y']
-            bed_width, bed_height = get_object_grid_dimensions('bed')
-            
+        if bed is not None and door is not None:
+            bed_x, bed_y = xs[bed], ys[bed]
+            door_x, door_y = xs[door], ys[door]
+
             # Calculate bed center
             bed_center_x = bed_x + bed_width // 2
             bed_center_y = bed_y + bed_height // 2
-            
+
             # Check if door directly faces bed center
             door_to_bed_distance = math.sqrt((door_x - bed_center_x)**2 + (door_y - bed_center_y)**2)
-            
+
             if door_to_bed_distance < 15:  # Door too close to bed center
-                penalty_weight = self.config['feng_shui_penalties']['door_facing_bed']
+                penalty_weight = penalties['door_facing_bed']
                 penalty_score -= penalty_weight
                 print(f"DEBUG: Door facing bed penalty - distance: {door_to_bed_distance:.2f}")
-        
+
         # Penalty 6: Small gaps between doors and furniture (should be at least 2 units)
-        door_placements = [p for p in placements if p['type'] == 'door']
-        furniture_placements = [p for p in placements if p['type'] in ['bed', 'desk']]
-        
-        for door_placement in door_placements:
-            door_x, door_y = door_placement['x'], door_placement['y']
-            
-            for furniture_placement in furniture_placements:
-                furniture_x, furniture_y = furniture_placement['x'], furniture_placement['y']
-                furniture_type = furniture_placement['type']
-                furniture_width, furniture_height = get_object_grid_dimensions(furniture_type)
-                
+        for door_index, door_type in enumerate(types):
+            if door_type != DOOR:
+                continue
+            door_x, door_y = xs[door_index], ys[door_index]
+
+            for furniture_index, furniture_type in enumerate(types):
+                if furniture_type not in FURNITURE_IDS:
+                    continue
+                furniture_x, furniture_y = xs[furniture_index], ys[furniture_index]
+                furniture_width, furniture_height = TYPE_DIMENSIONS[furniture_type]
+
                 # Calculate distance from door to furniture center
                 furniture_center_x = furniture_x + furniture_width // 2
                 furniture_center_y = furniture_y + furniture_height // 2
                 door_furniture_distance = math.sqrt((door_x - furniture_center_x)**2 + (door_y - furniture_center_y)**2)
-                
+
                 # Penalty for furniture too close to door (less than 3 units)
                 if door_furniture_distance < 3:
-                    penalty_weight = self.config['feng_shui_penalties']['door_furniture_gap']
+                    penalty_weight = penalties['door_furniture_gap']
                     penalty_score -= penalty_weight
-                    print(f"DEBUG: Door-furniture gap penalty - {furniture_type} too close to door, distance: {door_furniture_distance:.2f}")
-        
+                    print(f"DEBUG: Door-furniture gap penalty - {TYPE_NAMES[furniture_type]} too close to door, distance: {door_furniture_distance:.2f}")
+
         # Penalty 7: Overlapping doors and windows (should have separation)
-        if door_placement and window_placement:
-            door_x, door_y = door_placement['x'], door_placement['y']
-            window_x, window_y = window_placement['x'], window_placement['y']
-            
+        if door is not None and window is not None:
+            door_x, door_y = xs[door], ys[door]
+            window_x, window_y = xs[window], ys[window]
+
             # Calculate distance between door and window
             door_window_distance = math.sqrt((door_x - window_x)**2 + (door_y - window_y)**2)
-            
+
             if door_window_distance < 6: # Door and window too close
-                penalty_weight = self.config['feng_shui_penalties']['door_window_overlap']
+                penalty_weight = penalties['door_window_overlap']
                 penalty_score -= penalty_weight
                 print(f"DEBUG: Door-window overlap penalty - distance: {door_window_distance:.2f}")
-        
+
         return penalty_score
 
-    def _check_door_blocked(self, placements: List[Dict]) -> float:
+    def _door_is_blocked(self, layout: Layout, door_index: int, furniture_index: int) -> bool:
+        """Door is considered blocked if furniture is within 2 units of the door."""
+        door_x, door_y = layout.xs[door_index], layout.ys[door_index]
+        furniture_x, furniture_y = layout.xs[furniture_index], layout.ys[furniture_index]
+        furniture_width, furniture_height = TYPE_DIMENSIONS[layout.types[furniture_index]]
+        return (furniture_x <= door_x + 2 and
+                furniture_x + furniture_width >= door_x - 2 and
+                furniture_y <= door_y + 2 and
+                furniture_y + furniture_height >= door_y - 2)
+
+    def _check_door_blocked(self, placements) -> float:
         """
         Check if doors are blocked by furniture and return penalty.
         """
+        layout = as_layout(placements)
         penalty_score = 0.0
-        
+
         # Find door and furniture placements
-        door_placements = [p for p in placements if p['type'] == 'door']
-        furniture_placements = [p for p in placements if p['type'] in ['bed', 'desk']]
-        
-        for door_placement in door_placements:
-            door_x, door_y = door_placement['x'], door_placement['y']
-            
-            for furniture_placement in furniture_placements:
-                furniture_x, furniture_y = furniture_placement['x'], furniture_placement['y']
-                furniture_type = furniture_placement['type']
-                furniture_width, furniture_height = get_object_grid_dimensions(furniture_type)
-                
-                # Check if furniture blocks the door
-                # Door is considered blocked if furniture is within 2 units of the door
-                door_blocked = False
-                
-                # Check horizontal blocking (furniture in front of door)
-                if (furniture_x <= door_x + 2 and 
-                    furniture_x + furniture_width >= door_x - 2 and
-                    furniture_y <= door_y + 2 and 
-                    furniture_y + furniture_height >= door_y - 2):
-                    door_blocked = True
-                
-                if door_blocked:
+        door_indices = [i for i, t in enumerate(layout.types) if t == DOOR]
+        furniture_indices = [i for i, t in enumerate(layout.types) if t in FURNITURE_IDS]
+
+        for door_index in door_indices:
+            for furniture_index in furniture_indices:
+                if self._door_is_blocked(layout, door_index, furniture_index):
+                    furniture_type = layout.types[furniture_index]
                     penalty_weight = self.config['feng_shui_penalties']['door_blocked']
                     penalty_score -= penalty_weight
-                    print(f"DEBUG: Door blocked by {furniture_type} at ({furniture_x}, {furniture_y})")
-                    
+                    print(f"DEBUG: Door blocked by {TYPE_NAMES[furniture_type]} at ({layout.xs[furniture_index]}, {layout.ys[furniture_index]})")
+
                     # Additional penalty for desks blocking doors (more severe)
-                    if furniture_type == 'desk':
+                    if furniture_type == DESK:
                         penalty_score -= 500.0  # Extra penalty for desk blocking door
                         print(f"DEBUG: Extra penalty for desk blocking door")
-        
+
         return penalty_score
 
-    def _check_door_window_overlap(self, placements: List[Dict]) -> float:
+    def _check_door_window_overlap(self, placements) -> float:
         """
         Check for overlapping doors and windows and return penalty.
         """
+        layout = as_layout(placements)
         penalty_score = 0.0
-        
-        door_placements = [p for p in placements if p['type'] == 'door']
-        window_placements = [p for p in placements if p['type'] == 'window']
-        
-        for door_placement in door_placements:
-            door_x, door_y = door_placement['x'], door_placement['y']
-            
-            for window_placement in window_placements:
-                window_x, window_y = window_placement['x'], window_placement['y']
-                
+
+        door_indices = [i for i, t in enumerate(layout.types) if t == DOOR]
+        window_indices = [i for i, t in enumerate(layout.types) if t == WINDOW]
+
+        for door_index in door_indices:
+            door_x, door_y = layout.xs[door_index], layout.ys[door_index]
+
+            for window_index in window_indices:
+                window_x, window_y = layout.xs[window_index], layout.ys[window_index]
+
                 # Check if door and window overlap or are too close
                 door_window_distance = math.sqrt((door_x - window_x)**2 + (door_y - window_y)**2)
-                
+
                 if door_window_distance < 3:  # Door and window too close or overlapping
                     penalty_weight = self.config['feng_shui_penalties']['door_window_overlap']
                     penalty_score -= penalty_weight
                     print(f"DEBUG: Door-window overlap penalty - distance: {door_window_distance:.2f}")
-        
+
         return penalty_score
 
-    def _check_furniture_overlap(self, placements: List[Dict]) -> float:
+    def _check_furniture_overlap(self, placements) -> float:
         """
         Check for overlapping furniture and return penalty.
         """
+        layout = as_layout(placements)
         penalty_score = 0.0
-        
-        furniture_placements = [p for p in placements if p['type'] in ['bed', 'desk']]
-        
-        for i, placement1 in enumerate(furniture_placements):
-            for j, placement2 in enumerate(furniture_placements):
-                if i >= j:  # Skip self-comparison and duplicate comparisons
-                    continue
-                
-                if self._objects_overlap(placement1, placement2):
+
+        furniture_indices = [i for i, t in enumerate(layout.types) if t in FURNITURE_IDS]
+
+        for position, index1 in enumerate(furniture_indices):
+            for index2 in furniture_indices[position + 1:]:
+                if self._objects_overlap(layout, index1, index2):
                     penalty_weight = self.config['feng_shui_penalties']['furniture_overlap']
                     penalty_score -= penalty_weight
-                    print(f"DEBUG: Overlap detected between {placement1['type']} at ({placement1['x']}, {placement1['y']}) and {placement2['type']} at ({placement2['x']}, {placement2['y']})")
-        
+                    print(f"DEBUG: Overlap detected between {layout.type_name(index1)} at ({layout.xs[index1]}, {layout.ys[index1]}) and {layout.type_name(index2)} at ({layout.xs[index2]}, {layout.ys[index2]})")
+
         return penalty_score
 
-    def _calculate_layout_score(self, placements: List[Dict]) -> float:
+    def _calculate_layout_score(self, placements) -> float:
         """
         Calculate the overall Feng Shui score for a layout.
         """
-        if not placements:
+        layout = as_layout(placements)
+        if not len(layout):
             return 0.0
-        
+
         total_score = 0.0
-        
+
         # Check for invalid configurations first - extremely negative scores
-        invalid_score = self._check_invalid_configurations(placements)
+        invalid_score = self._check_invalid_configurations(layout)
         if invalid_score < -1000:  # If there are invalid configurations
             return invalid_score
-        
+
         # Bagua scores
-        for placement in placements:
-            bagua_score = self._calculate_bagua_score(placement)
+        for index, type_id in enumerate(layout.types):
+            bagua_score = self._calculate_bagua_score(layout, index)
             # Apply small weight based on object importance
-            weight = self.config['furniture_preferences'].get(
-                placement['type'], {}).get('weight', 1)
-            total_score += bagua_score * (weight / 10.0)  # Normalize weights
-        
+            total_score += bagua_score * self._type_weight(type_id)  # Normalize weights
+
         # Command position score
-        command_score = self._calculate_command_position_score(placements)
+        command_score = self._calculate_command_position_score(layout)
         total_score += command_score
-        
+
         # Chi flow score
-        chi_score = self._calculate_chi_flow_score(placements)
+        chi_score = self._calculate_chi_flow_score(layout)
         total_score += chi_score
-        
+
         # Bonus for having all required objects
-        total_score += len(placements) * 10.0  # Reduced bonus for complete layouts
-        
+        total_score += len(layout) * 10.0  # Reduced bonus for complete layouts
+
         # Bonus for wall placement of boundaries
-        for placement in placements:
-            if placement['type'] in ['door', 'window']:
-                x, y = placement['x'], placement['y']
-                if (x == 0 or x == self.grid_width - 1 or 
-                    y == 0 or y == self.grid_height - 1):
-                    total_score += 15.0  # Reduced bonus for wall placement
-        
+        total_score += self._calculate_wall_bonus(layout)
+
         # Apply Feng Shui penalties
-        feng_shui_penalties = self._calculate_feng_shui_penalties(placements)
+        feng_shui_penalties = self._calculate_feng_shui_penalties(layout)
         total_score += feng_shui_penalties
-        
+
         # Apply extremely harsh penalties for fundamental violations
-        door_blocked_penalty = self._check_door_blocked(placements)
-        furniture_overlap_penalty = self._check_furniture_overlap(placements)
-        door_window_overlap_penalty = self._check_door_window_overlap(placements)
+        door_blocked_penalty = self._check_door_blocked(layout)
+        furniture_overlap_penalty = self._check_furniture_overlap(layout)
+        door_window_overlap_penalty = self._check_door_window_overlap(layout)
         total_score += door_blocked_penalty + furniture_overlap_penalty + door_window_overlap_penalty
-        
+
         return total_score
-    
-    def _check_invalid_configurations(self, placements: List[Dict]) -> float:
+
+    def _calculate_wall_bonus(self, placements) -> float:
+        """Bonus for doors and windows placed on a wall."""
+        layout = as_layout(placements)
+        wall_bonus = 0.0
+        for type_id, x, y in zip(layout.types, layout.xs, layout.ys):
+            if type_id in WALL_OPENING_IDS:
+                if (x == 0 or x == self.grid_width - 1 or
+                    y == 0 or y == self.grid_height - 1):
+                    wall_bonus += 15.0  # Reduced bonus for wall placement
+        return wall_bonus
+
+    def get_score_breakdown(self, placements) -> Dict:
+        """
+        Score components of a layout, as reported by the live-score endpoint.
+        """
+        layout = as_layout(placements)
+        return {
+            'bagua_scores': sum((self._calculate_bagua_score(layout, index) * self._type_weight(type_id)
+                                 for index, type_id in enumerate(layout.types)), 0.0),
+            'command_position': self._calculate_command_position_score(layout),
+            'chi_flow': self._calculate_chi_flow_score(layout),
+            'layout_bonus': len(layout) * 10.0,
+            'wall_bonuses': self._calculate_wall_bonus(layout),
+            'feng_shui_penalties': self._calculate_feng_shui_penalties(layout),
+            'door_blocked': self._check_door_blocked(layout),
+            'furniture_overlap': self._check_furniture_overlap(layout),
+        }
+
+    def _check_invalid_configurations(self, placements) -> float:
         """
         Check for invalid configurations and return extremely negative scores.
         """
+        layout = as_layout(placements)
+        types, xs, ys = layout.types, layout.xs, layout.ys
         score = 0.0
-        
+
+        furniture_indices = [i for i, t in enumerate(types) if t in FURNITURE_IDS]
+
         # Check each placement for bounds violations
-        for placement in placements:
-            x, y = placement['x'], placement['y']
-            obj_type = placement['type']
-            
-            # Get object dimensions
-            if obj_type in ['bed', 'desk']:
-                obj_width, obj_height = get_object_grid_dimensions(obj_type)
-                
-                # Check if object extends beyond grid bounds
-                if (x < 0 or y < 0 or 
-                    x + obj_width > self.grid_width or 
-                    y + obj_height > self.grid_height):
-                    print(f"DEBUG: {obj_type} at ({x}, {y}) extends beyond grid bounds")
-                    score -= 10000  # Extremely negative score for out-of-bounds
-                    return score
-        
+        for index in furniture_indices:
+            x, y = xs[index], ys[index]
+            obj_width, obj_height = TYPE_DIMENSIONS[types[index]]
+
+            # Check if object extends beyond grid bounds
+            if (x < 0 or y < 0 or
+                x + obj_width > self.grid_width or
+                y + obj_height > self.grid_height):
+                print(f"DEBUG: {layout.type_name(index)} at ({x}, {y}) extends beyond grid bounds")
+                score -= 10000  # Extremely negative score for out-of-bounds
+                return score
+
         # Check for overlapping objects (bed and desk) - use new harsh penalty
-        furniture_placements = [p for p in placements if p['type'] in ['bed', 'desk']]
-        
-        for i, placement1 in enumerate(furniture_placements):
-            for j, placement2 in enumerate(furniture_placements):
-                if i >= j:  # Skip self-comparison and duplicate comparisons
-                    continue
-                
+        for position, index1 in enumerate(furniture_indices):
+            for index2 in furniture_indices[position + 1:]:
                 # Check if these objects overlap
-                if self._objects_overlap(placement1, placement2):
-                    print(f"DEBUG: {placement1['type']} and {placement2['type']} overlap")
+                if self._objects_overlap(layout, index1, index2):
+                    print(f"DEBUG: {layout.type_name(index1)} and {layout.type_name(index2)} overlap")
                     overlap_penalty = self.config['feng_shui_penalties']['furniture_overlap']
                     score -= overlap_penalty
                     return score
-        
+
         # Check for blocked doors - use new harsh penalty
-        door_placements = [p for p in placements if p['type'] == 'door']
-        for door_placement in door_placements:
-            door_x, door_y = door_placement['x'], door_placement['y']
-            
-            for furniture_placement in furniture_placements:
-                furniture_x, furniture_y = furniture_placement['x'], furniture_placement['y']
-                furniture_type = furniture_placement['type']
-                furniture_width, furniture_height = get_object_grid_dimensions(furniture_type)
-                
-                # Check if furniture blocks the door
-                if (furniture_x <= door_x + 2 and 
-                    furniture_x + furniture_width >= door_x - 2 and
-                    furniture_y <= door_y + 2 and 
-                    furniture_y + furniture_height >= door_y - 2):
-                    print(f"DEBUG: Door blocked by {furniture_type}")
+        door_indices = [i for i, t in enumerate(types) if t == DOOR]
+        for door_index in door_indices:
+            for furniture_index in furniture_indices:
+                if self._door_is_blocked(layout, door_index, furniture_index):
+                    print(f"DEBUG: Door blocked by {layout.type_name(furniture_index)}")
                     door_blocked_penalty = self.config['feng_shui_penalties']['door_blocked']
                     score -= door_blocked_penalty
                     return score
-        
+
         # Check for overlapping doors and windows - use new harsh penalty
-        window_placements = [p for p in placements if p['type'] == 'window']
-        for door_placement in door_placements:
-            door_x, door_y = door_placement['x'], door_placement['y']
-            
-            for window_placement in window_placements:
-                window_x, window_y = window_placement['x'], window_placement['y']
-                
+        window_indices = [i for i, t in enumerate(types) if t == WINDOW]
+        for door_index in door_indices:
+            door_x, door_y = xs[door_index], ys[door_index]
+
+            for window_index in window_indices:
+                window_x, window_y = xs[window_index], ys[window_index]
+
                 # Check if door and window overlap or are too close
                 door_window_distance = math.sqrt((door_x - window_x)**2 + (door_y - window_y)**2)
-                
+
                 if door_window_distance < 3:  # Door and window too close or overlapping
                     print(f"DEBUG: Door and window overlap - distance: {door_window_distance:.2f}")
                     door_window_overlap_penalty = self.config['feng_shui_penalties']['door_window_overlap']
                     score -= door_window_overlap_penalty
                     return score
-        
+
         return score
-    
-    def _objects_overlap(self, placement1: Dict, placement2: Dict) -> bool:
+
+    def _objects_overlap(self, layout: Layout, index1: int, index2: int) -> bool:
         """
-        Check if two objects overlap.
+        Check if two objects of a layout overlap.
         """
-        x1, y1 = placement1['x'], placement1['y']
-        x2, y2 = placement2['x'], placement2['y']
-        type1, type2 = placement1['type'], placement2['type']
-        
+        x1, y1 = layout.xs[index1], layout.ys[index1]
+        x2, y2 = layout.xs[index2], layout.ys[index2]
+
         # Get dimensions
-        width1, height1 = get_object_grid_dimensions(type1)
-        width2, height2 = get_object_grid_dimensions(type2)
-        
+        width1, height1 = TYPE_DIMENSIONS[layout.types[index1]]
+        width2, height2 = TYPE_DIMENSIONS[layout.types[index2]]
+
         # Check for overlap using bounding box intersection
-        return not (x1 + width1 <= x2 or x2 + width2 <= x1 or 
+        return not (x1 + width1 <= x2 or x2 + width2 <= x1 or
                    y1 + height1 <= y2 or y2 + height2 <= y1)
-    
-    def _generate_random_placement(self, obj_type: str) -> Dict:
-        """Generate a random valid placement for an object."""
-        max_attempts = 1000  # Increased attempts
-        
-        for attempt in range(max_attempts):
-            # Generate random position
-            x = random.randint(0, self.grid_width - 1)
-            y = random.randint(0, self.grid_height - 1)
-            
-            # Check if position is valid
-            if is_position_valid(x, y, obj_type, set(), self.grid_width, self.grid_height):
-                return {'type': obj_type, 'x': x, 'y': y}
-        
-        # If no valid position found, return a safe default
-        print(f"WARNING: Could not find valid position for {obj_type}, using origin")
-        return {'type': obj_type, 'x': 0, 'y': 0}
 
-    def _generate_initial_layout(self, objects_to_place: List[str]) -> List[Dict]:
+    def _make_position_sampler(self, params: Dict) -> Optional[PositionSampler]:
+        """Score-guided sampler configured by algorithm params, or None for uniform positions."""
+        if not params.get('guided_proposals', False):
+            return None
+        return PositionSampler(self, float(params.get('proposal_temperature', 50.0)),
+                               float(params.get('uniform_mix', 0.2)))
+
+    def _make_surrogate_ranker(self, params: Dict, objects_to_place: List[str]) -> Optional[SurrogateRanker]:
+        """Surrogate ranker configured by algorithm params, or None to score every proposal."""
+        path = params.get('surrogate_path')
+        if not path:
+            return None
+        model = load_surrogate(path)
+        if sorted(model.object_types) != sorted(objects_to_place):
+            print(f"WARNING: Surrogate {path} was trained for {model.object_types}, "
+                  f"not {objects_to_place}; scoring every proposal")
+            return None
+        return SurrogateRanker(model, self.grid_width, self.grid_height,
+                               int(params.get('surrogate_candidates', 8)),
+                               float(params.get('surrogate_top_fraction', 0.25)))
+
+    def _sample_position(self, type_id: int) -> Optional[Tuple[int, int]]:
+        """Position satisfying the type's placement rule, score-guided when enabled."""
+        if self.position_sampler is None:
+            return random_feasible_position(self, type_id)
+        return self.position_sampler.sample(type_id)
+
+    def _generate_random_placement(self, obj_type: str) -> Tuple[int, int]:
+        """Generate a random valid position for an object."""
+        position = self._sample_position(intern_type(obj_type))
+        if position is None:
+            # If no valid position exists, return a safe default
+            print(f"WARNING: Could not find valid position for {obj_type}, using origin")
+            return 0, 0
+        return position
+
+    def _generate_initial_layout(self, objects_to_place: List[str]) -> Layout:
         """Generate an initial random layout with all objects placed."""
-        placements = []
-        occupied_positions = set()
-        
+        layout = Layout((), [], [])
+        tracker = ValidityTracker(layout, self.grid_width, self.grid_height)
+
         print(f"DEBUG: Starting initial layout generation for objects: {objects_to_place}")
-        
+
         # Sort objects to prioritize desk placement
         sorted_objects = sorted(objects_to_place, key=lambda x: (x != 'desk', x))  # Put desk first
         print(f"DEBUG: Sorted objects for placement: {sorted_objects}")
-        
+
         # Try to place each object with multiple attempts
         for obj_type in sorted_objects:
-            placement = None
-            max_attempts = 1000  # Increased attempts
+            index = len(layout)
+            type_id = intern_type(obj_type)
+            tracker.append(type_id, 0, 0)
+            placed = False
+            fallback = None
+            max_attempts = 1000 if TYPE_IS_KNOWN[type_id] else 0  # Unknown types have no valid position
             print(f"DEBUG: Attempting to place {obj_type}...")
-            
+
             for attempt in range(max_attempts):
-                temp_placement = self._generate_random_placement(obj_type)
-                
-                # Check if this placement is valid and doesn't collide
-                is_valid = is_position_valid(temp_placement['x'], temp_placement['y'], obj_type, occupied_positions, self.grid_width, self.grid_height)
-                no_collision = not check_object_collision(temp_placement['x'], temp_placement['y'], obj_type, occupied_positions)
-                
-                if is_valid and no_collision:
-                    placement = temp_placement
-                    print(f"DEBUG: Successfully placed {obj_type} at ({temp_placement['x']}, {temp_placement['y']}) on attempt {attempt + 1}")
-                    break
-                elif attempt % 200 == 0:  # Log every 200th attempt
-                    print(f"DEBUG: {obj_type} attempt {attempt + 1}: valid={is_valid}, no_collision={no_collision}")
-            
+                x, y = self._generate_random_placement(obj_type)
+                tracker.move(index, x, y)
+
+                # Check that the placement is valid and doesn't collide
+                if tracker.object_is_valid(index):
+                    # Guided positions crowd the walls; avoid blocking doors from the start
+                    if self._check_invalid_configurations(layout) >= -1000:
+                        placed = True
+                        print(f"DEBUG: Successfully placed {obj_type} at ({x}, {y}) on attempt {attempt + 1}")
+                        break
+                    if fallback is None:
+                        fallback = (x, y)
+                tracker.undo()
+
+            if not placed and fallback is not None:
+                tracker.move(index, fallback[0], fallback[1])
+                print(f"WARNING: Placed {obj_type} at ({fallback[0]}, {fallback[1]}) despite an invalid configuration")
             # If we couldn't find a valid placement, force place it at origin
-            if placement is None:
+            elif not placed:
                 print(f"WARNING: Could not find valid placement for {obj_type}, placing at origin")
-                placement = {'type': obj_type, 'x': 0, 'y': 0}
-            
-            # Add the placement and update occupied positions
-            placements.append(placement)
-            add_occupied_positions(placement['x'], placement['y'], obj_type, occupied_positions)
-            print(f"DEBUG: Added {obj_type} to layout at ({placement['x']}, {placement['y']})")
-        
-        print(f"DEBUG: Initial layout generated with {len(placements)} objects: {[p['type'] for p in placements]}")
-        return placements
-    
-    def _mutate_placement(self, placement: Dict) -> Dict:
-        """Create a mutated version of a placement."""
-        new_placement = placement.copy()
-        
+
+            print(f"DEBUG: Added {obj_type} to layout at ({layout.xs[index]}, {layout.ys[index]})")
+
+        print(f"DEBUG: Initial layout generated with {len(layout)} objects: {layout.type_names()}")
+        return layout
+
+    def _mutate_placement(self, layout: Layout, index: int) -> Tuple[int, int]:
+        """Propose a mutated position for the object at `index`."""
         # Randomly adjust position with larger range for better exploration
-        x, y = placement['x'], placement['y']
-        obj_type = placement['type']
-        
+        x, y = layout.xs[index], layout.ys[index]
+
         # Get object dimensions for bounds checking
-        obj_width, obj_height = get_object_grid_dimensions(obj_type)
-        
+        obj_width, obj_height = TYPE_DIMENSIONS[layout.types[index]]
+
         # Larger random adjustment for better exploration
-        dx = random.randint(-8, 8)  # Increased from -3,3
-        dy = random.randint(-8, 8)  # Increased from -3,3
-        
+        dx = self.rng.randint(-8, 8)  # Increased from -3,3
+        dy = self.rng.randint(-8, 8)  # Increased from -3,3
+
         # Calculate new position with bounds checking
         new_x = max(0, min(self.grid_width - obj_width, x + dx))
         new_y = max(0, min(self.grid_height - obj_height, y + dy))
-        
-        new_placement['x'] = new_x
-        new_placement['y'] = new_y
-        
-        return new_placement
-    
-    def _is_valid_layout(self, placements: List[Dict]) -> bool:
-        """Check if a layout is valid (no collisions, within bounds)."""
-        occupied_positions = set()
-        
-        for placement in placements:
-            x, y = placement['x'], placement['y']
-            obj_type = placement['type']
-            
-            # Check bounds and collisions
-            if not is_position_valid(x, y, obj_type, occupied_positions, self.grid_width, self.grid_height):
-                print(f"DEBUG: Invalid position for {obj_type} at ({x}, {y})")
-                return False
-            
-            if check_object_collision(x, y, obj_type, occupied_positions):
-                print(f"DEBUG: Collision detected for {obj_type} at ({x}, {y})")
-                return False
-            
-            add_occupied_positions(x, y, obj_type, occupied_positions)
-        
-        # Additional check for overlapping furniture objects
-        furniture_placements = [p for p in placements if p['type'] in ['bed', 'desk']]
-        for i, placement1 in enumerate(furniture_placements):
-            for j, placement2 in enumerate(furniture_placements):
-                if i >= j:  # Skip self-comparison and duplicate comparisons
-                    continue
-                
-                if self._objects_overlap(placement1, placement2):
-                    print(f"DEBUG: Overlap detected between {placement1['type']} and {placement2['type']}")
-                    return False
-        
-        return True
 
-    def _generate_valid_mutation(self, current_layout: List[Dict], objects_to_place: List[str]) -> List[Dict]:
+        return new_x, new_y
+
+    def _is_valid_layout(self, placements, count: Optional[int] = None) -> bool:
+        """Check if a layout (or its first `count` objects) is valid (no collisions, within bounds)."""
+        layout = as_layout(placements)
+        if count is not None and count < len(layout):
+            layout = layout.prefix(count)
+
+        tracker = ValidityTracker(layout, self.grid_width, self.grid_height)
+        if not tracker.is_valid:
+            for reason in tracker.violations():
+                print(f"DEBUG: {reason}")
+        return tracker.is_valid
+
+    def _generate_valid_mutation(self, current_layout: Layout, objects_to_place: List[str],
+                                 mutation_rate: float = 0.3,
+                                 cancel_token: Optional[CancellationToken] = None) -> Layout:
         """Generate a valid mutated layout that doesn't have overlaps."""
         max_attempts = 50  # Limit attempts to avoid infinite loops
-        
+
+        # Ensure all objects are present
+        mutated_layout = current_layout.copy()
+        placed_types = set(mutated_layout.types)
+        for obj_type in objects_to_place:
+            type_id = intern_type(obj_type)
+            if type_id not in placed_types:
+                print(f"WARNING: Adding missing {obj_type} to mutated layout")
+                mutated_layout.append(type_id, 0, 0)
+                placed_types.add(type_id)
+
+        tracker = ValidityTracker(mutated_layout, self.grid_width, self.grid_height)
         for attempt in range(max_attempts):
-            mutated_layout = []
-            
+            if cancel_token is not None:
+                cancel_token.check()
+            tracker.rollback()
+
             # Try to mutate each placement
-            for placement in current_layout:
-                if random.random() < 0.3:  # 30% chance to mutate each placement
+            for index in range(len(current_layout)):
+                if self.rng.random() < mutation_rate:  # Chance to mutate each placement
                     # Try to find a valid mutation
-                    valid_mutation = None
                     for mutation_attempt in range(20):
-                        mutated_placement = self._mutate_placement(placement)
-                        
-                        # Create a temporary layout with this mutation to check validity
-                        temp_layout = mutated_layout + [mutated_placement]
-                        
-                        # Check if this mutation creates a valid layout
-                        if self._is_valid_layout(temp_layout):
-                            valid_mutation = mutated_placement
-                            break
-                    
-                    if valid_mutation is not None:
-                        mutated_layout.append(valid_mutation)
-                    else:
-                        # Keep original placement if no valid mutation found
-                        mutated_layout.append(placement.copy())
-                else:
-                    mutated_layout.append(placement.copy())
-            
-            # Ensure all objects are present
-            placed_types = [p['type'] for p in mutated_layout]
-            for obj_type in objects_to_place:
-                if obj_type not in placed_types:
-                    print(f"WARNING: Adding missing {obj_type} to mutated layout")
-                    mutated_layout.append({'type': obj_type, 'x': 0, 'y': 0})
-            
+                        new_x, new_y = self._mutate_placement(current_layout, index)
+                        with self.diagnostics.timer('validation'):
+                            tracker.move(index, new_x, new_y)
+
+                            # Check the moved object against its placement rule and its neighbours
+                            if tracker.object_is_valid(index):
+                                break
+                            # Keep original placement if no valid mutation found
+                            tracker.undo()
+                        self.diagnostics.reject()
+
             # Final validation
-            if self._is_valid_layout(mutated_layout):
+            if tracker.is_valid:
                 return mutated_layout
-        
+            self.diagnostics.reject()
+
         # If we couldn't generate a valid mutation, return the original layout
         print("WARNING: Could not generate valid mutation, keeping original layout")
         return current_layout.copy()
-    
-    def optimize_layout(self, objects_to_place: List[str]) -> Tuple[List[Dict], float]:
-        """Optimize layout using hill climbing with simulated annealing."""
-        print(f"DEBUG: Starting optimization for {len(objects_to_place)} objects")
-        
-        # Generate initial layout
-        current_layout = self._generate_initial_layout(objects_to_place)
-        current_score = self._calculate_layout_score(current_layout)
-        
-        print(f"DEBUG: Initial layout score: {current_score:.2f}")
-        self._print_detailed_score_breakdown(current_layout, current_score)
-        
-        best_layout = current_layout.copy()
-        best_score = current_score
-        
-        # Hill climbing parameters
-        max_iterations = 200  # Increased from 100
-        temperature = 100.0  # Starting temperature for simulated annealing
-        cooling_rate = 0.95  # Cooling rate
-        
-        no_improvement_count = 0
-        max_no_improvement = 50  # Increased patience
+
+    def _propose_move(self, current_layout: Layout, selector: MoveSelector,
+                      cancel_token: Optional[CancellationToken] = None,
+                      max_attempts: int = 10) -> Tuple[Layout, Optional[str]]:
+        """
+        Apply a move operator chosen by `selector` (see moves.py).
         
-        # Fallback tracking
-        fallback_attempts = 0
-        max_fallback_attempts = 3
-        original_objects = objects_to_place.copy()
+        Returns the moved layout and the operator name, or a copy of the
+        current layout and None if no valid move was found. The caller
+        reports the scored outcome with selector.record_result().
+        """
+        for attempt in range(max_attempts):
+            if cancel_token is not None:
+                cancel_token.check()
+            name = selector.choose(self.rng)
+            moves = MOVE_OPERATORS[name](self, current_layout)
+            if not moves:
+                selector.record_invalid(name, applicable=False)
+                continue
+
+            moved_layout = current_layout.copy()
+            with self.diagnostics.timer('validation'):
+                tracker = ValidityTracker(moved_layout, self.grid_width, self.grid_height)
+                for index, new_x, new_y in moves:
+                    tracker.move(index, new_x, new_y)
+                valid = moved_layout != current_layout and all(
+                    tracker.object_is_valid(index) for index, _, _ in moves)
+            if valid:
+                return moved_layout, name
+            selector.record_invalid(name)
+            self.diagnostics.reject()
+
+        return current_layout.copy(), None
+
+    def _algorithm_params(self, overrides: Optional[Dict] = None) -> Dict:
+        """Merge the config['algorithm'] block with per-request overrides."""
+        params = dict(self.config.get('algorithm', {}))
+        params.update(overrides or {})
+        return params
+
+    def _run_stage(self, strategy_name: str, algorithm: Dict, objects_to_place: List[str],
+                   time_limit: float, cancel_token: Optional[CancellationToken] = None,
+                   initial_layout: Optional[Layout] = None) -> Tuple[Layout, float, SearchStats]:
+        """One strategy run of optimize_layout with its own share of the time budget."""
+        search = get_strategy(strategy_name, {**algorithm, 'time_limit': max(0.0, time_limit)})
+        layout, score = search.run(self, objects_to_place, cancel_token, initial_layout)
+        return layout, score, search.stats
+
+    def _relax_layout(self, layout: Layout, attempts: int = 100) -> Layout:
+        """Move each object that breaks the layout rules to a random position where it fits."""
+        layout = layout.copy()
+        tracker = ValidityTracker(layout, self.grid_width, self.grid_height)
+        for index in range(len(layout)):
+            if tracker.object_is_valid(index):
+                continue
+            for attempt in range(attempts):
+                position = self._sample_position(layout.types[index])
+                if position is None:
+                    break
+                tracker.move(index, position[0], position[1])
+                if tracker.object_is_valid(index):
+                    print(f"DEBUG: Relaxed {layout.type_name(index)} to {position}")
+                    break
+                tracker.undo()
+        return layout
+
+    def _complete_layout(self, layout: Layout, objects_to_place: List[str]) -> Layout:
+        """Add objects missing from a reduced layout where they fit."""
+        layout = layout.copy()
+        placed_types = set(layout.types)
+        for obj_type in objects_to_place:
+            type_id = intern_type(obj_type)
+            if type_id not in placed_types:
+                layout.append(type_id, 0, 0)
+                placed_types.add(type_id)
+        return self._relax_layout(layout)
+
+    def optimize_layout(self, objects_to_place: List[str], strategy: Optional[str] = None,
+                        params: Optional[Dict] = None,
+                        cancel_token: Optional[CancellationToken] = None,
+                        seed: Optional[int] = None) -> Tuple[Layout, float]:
+        """
+        Optimize layout with a registered search strategy.
+        Returns the best Layout and its score; callers convert it with
+        to_placements() when building a response.
+        
+        The whole call shares one time budget (algorithm 'time_budget',
+        default the strategy's time_limit). The main search gets
+        'search_share' of it. If the result is still poor, the rest is split
+        across repair stages: 'relax' moves the objects that break the layout
+        rules and searches again from there, 'drop' searches without the last
+        objects and adds them back where they fit, and a simple fallback
+        layout is the last resort.
         
+        Args:
+            objects_to_place: Object types to place
+            strategy: Strategy name; defaults to config['algorithm']['strategy']
+            params: Algorithm parameters overriding config['algorithm']
+            cancel_token: Checked throughout the search, including the repair stages;
+                raises cancellation.OptimizationCancelled once tripped
+            seed: Seed the random streams are restarted from (drawn fresh if None)
+        
+        Statistics of the run (a strategies.SearchStats) are left in
+        self.search_stats, with per-stage timings under extras['latency'].
+        With algorithm 'diagnostics' set, extras['diagnostics'] also holds
+        the invalid-proposal count, acceptance rates per temperature band
+        and the proposal/validation/scoring time split. With a surrogate
+        loaded, extras['surrogate'] counts the proposals it screened out.
+        extras['score_bound'] holds the score upper bound of the objects
+        (see score_bounds.py); the search stops early once the best score is
+        within algorithm 'bound_tolerance' of it.
+        extras['seed'] is the seed of the run: passing it back replays the
+        same search, as long as the iteration budgets rather than the time
+        limits end it.
+        """
         start_time = time.time()
-        for iteration in range(max_iterations):
-            # Check for timeout
-            if time.time() - start_time > 20: # 20 seconds timeout
-                print(f"DEBUG: Optimization timed out after {time.time() - start_time:.2f} seconds.")
+        self.reseed(seed)
+        algorithm = self._algorithm_params(params)
+        self.diagnostics = SearchDiagnostics(enabled=bool(algorithm.get('diagnostics', False)))
+        self.position_sampler = self._make_position_sampler(algorithm)
+        symmetries = exact_symmetries(self, [intern_type(obj_type) for obj_type in objects_to_place])
+        self.score_cache = ScoreCache(self._calculate_layout_score, self.grid_width, self.grid_height,
+                                      symmetries, int(algorithm.get('score_cache_size', 50000)))
+        self.surrogate = self._make_surrogate_ranker(algorithm, objects_to_place)
+        strategy_name = strategy or algorithm.get('strategy', 'annealing')
+        algorithm.pop('strategy', None)
+        search = get_strategy(strategy_name, algorithm)
+        bounds = score_upper_bounds(self, objects_to_place)
+        bound_tolerance = algorithm.get('bound_tolerance', 0.0)
+        self.stop_score = (bounds['total'] - float(bound_tolerance)
+                           if bound_tolerance is not None else float('inf'))
+        
+        time_budget = float(algorithm.get('time_budget') or search.params['time_limit'])
+        search_share = float(algorithm.get('search_share', 0.7))
+        deadline = start_time + time_budget
+        stages = []
+        
+        def record_stage(stage: str, stage_start: float, time_limit: Optional[float], score: float, objects: int):
+            stages.append({'stage': stage, 'time_limit': time_limit, 'elapsed': time.time() - stage_start,
+                           'score': score, 'objects': objects})
+        
+        print(f"DEBUG: Starting optimization for {len(objects_to_place)} objects with {strategy_name}, "
+              f"time budget {time_budget:.1f}s")
+        
+        stage_start = time.time()
+        time_limit = min(search.params['time_limit'], time_budget * search_share)
+        best_layout, best_score, stats = self._run_stage(
+            strategy_name, algorithm, objects_to_place, time_limit, cancel_token)
+        record_stage('search', stage_start, time_limit, best_score, len(objects_to_place))
+        
+        # Repair stages share whatever is left of the budget
+        repairs = ['relax', 'drop']
+        max_dropped = 3
+        if best_score < -500:
+            print(f"WARNING: Poor optimization result ({best_score:.2f}), trying repairs {repairs}")
+        for position, stage in enumerate(repairs):
+            if best_score >= -500:
                 break
-
-            # Generate a valid mutated version of the current layout
-            mutated_layout = self._generate_valid_mutation(current_layout, objects_to_place)
-            
-            # Calculate score for mutated layout
-            mutated_score = self._calculate_layout_score(mutated_layout)
-            
-            # Accept better solutions or worse solutions with probability (simulated annealing)
-            accept = False
-            if mutated_score > current_score:
-                accept = True
-                print(f"DEBUG: Accepting better score: {mutated_score:.2f} > {current_score:.2f}")
-            elif temperature > 0.1:  # Only accept worse solutions when temperature is high
-                acceptance_probability = math.exp((mutated_score - current_score) / temperature)
-                if random.random() < acceptance_probability:
-                    accept = True
-                    print(f"DEBUG: Accepting worse score with probability: {mutated_score:.2f} < {current_score:.2f}")
-            
-            if accept:
-                current_layout = mutated_layout
-                current_score = mutated_score
-                
-                # Update best solution if this is better
-                if current_score > best_score:
-                    best_layout = current_layout.copy()
-                    best_score = current_score
-                    no_improvement_count = 0
-                    print(f"DEBUG: New best score: {best_score:.2f}")
-                    self._print_detailed_score_breakdown(best_layout, best_score)
-                else:
-                    no_improvement_count += 1
-            else:
-                no_improvement_count += 1
-            
-            # Additional safeguard: always check if current is better than best
-            if current_score > best_score:
-                best_layout = current_layout.copy()
-                best_score = current_score
-                print(f"DEBUG: Updated best score to {best_score:.2f} (safeguard)")
-            
-            # Cool down temperature
-            temperature *= cooling_rate
-            
-            # Early stopping if no improvement for too long
-            if no_improvement_count >= max_no_improvement:
-                print(f"DEBUG: No improvement for {max_no_improvement} iterations, stopping early")
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                print(f"WARNING: Time budget exhausted before repair stage {stage}")
                 break
+            if cancel_token is not None:
+                cancel_token.check()
+            time_limit = remaining / (len(repairs) - position)
+            stage_start = time.time()
             
-            if iteration % 20 == 0:
-                print(f"DEBUG: Iteration {iteration}, current score: {current_score:.2f}, best score: {best_score:.2f}, temperature: {temperature:.2f}")
-            
-            # Always keep track of the best layout seen, regardless of acceptance
-            if mutated_score > best_score:
-                best_layout = mutated_layout.copy()
-                best_score = mutated_score
-                print(f"DEBUG: New best score found: {best_score:.2f} (even though not accepted)")
-        
-        # Fallback mechanism: if score is still very poor, try with fewer objects
-        if best_score < -500 and fallback_attempts < max_fallback_attempts:
-            print(f"WARNING: Poor optimization result ({best_score:.2f}), trying fallback {fallback_attempts + 1}/{max_fallback_attempts}")
-            fallback_attempts += 1
+            if stage == 'relax':
+                relaxed_layout = self._relax_layout(best_layout)
+                layout, score, stage_stats = self._run_stage(
+                    strategy_name, algorithm, objects_to_place, time_limit, cancel_token, relaxed_layout)
+                stats.merge(stage_stats)
+            else:
+                # Drop objects from the end one at a time while the result stays poor
+                layout, score = best_layout, best_score
+                reduced_objects = list(objects_to_place)
+                while (score < -500 and len(reduced_objects) > 2 and
+                       len(objects_to_place) - len(reduced_objects) < max_dropped):
+                    level_limit = min(time_limit, deadline - time.time())
+                    if level_limit <= 0:
+                        break
+                    reduced_objects = reduced_objects[:-1]
+                    print(f"DEBUG: Trying fallback with reduced objects: {reduced_objects}")
+                    reduced_layout, _, stage_stats = self._run_stage(
+                        strategy_name, algorithm, reduced_objects, level_limit, cancel_token)
+                    stats.merge(stage_stats)
+                    layout = self._complete_layout(reduced_layout, objects_to_place)
+                    score = self._calculate_layout_score(layout)
+                    stats.evaluations += 1
             
-            # Try with fewer objects (remove the most problematic ones)
-            if len(objects_to_place) > 2:
-                # Remove the object that's causing the most problems
-                reduced_objects = objects_to_place[:-1]  # Remove last object
-                print(f"DEBUG: Trying fallback with reduced objects: {reduced_objects}")
-                
-                # Recursive call with fewer objects
-                fallback_layout, fallback_score = self.optimize_layout(reduced_objects)
-                
-                # If fallback is better, use it
-                if fallback_score > best_score:
-                    print(f"DEBUG: Fallback improved score from {best_score:.2f} to {fallback_score:.2f}")
-                    best_layout = fallback_layout
-                    best_score = fallback_score
-                else:
-                    print(f"DEBUG: Fallback did not improve score ({fallback_score:.2f} vs {best_score:.2f})")
+            record_stage(stage, stage_start, time_limit, score, len(objects_to_place))
+            if score > best_score:
+                print(f"DEBUG: Repair stage {stage} improved score from {best_score:.2f} to {score:.2f}")
+                best_layout, best_score = layout, score
+            else:
+                print(f"DEBUG: Repair stage {stage} did not improve score ({score:.2f} vs {best_score:.2f})")
         
         # Final fallback: if still very poor, generate a simple valid layout
-        if best_score < -1000 and fallback_attempts >= max_fallback_attempts:
+        if best_score < -1000:
             print("WARNING: All optimization attempts failed, generating simple fallback layout")
-            best_layout = self._generate_simple_fallback_layout(original_objects)
-            best_score = self._calculate_layout_score(best_layout)
-            print(f"DEBUG: Fallback layout score: {best_score:.2f}")
+            stage_start = time.time()
+            fallback_layout = self._generate_simple_fallback_layout(objects_to_place)
+            fallback_score = self._calculate_layout_score(fallback_layout)
+            stats.evaluations += 1
+            record_stage('fallback_layout', stage_start, None, fallback_score, len(objects_to_place))
+            print(f"DEBUG: Fallback layout score: {fallback_score:.2f}")
+            if fallback_score > best_score:
+                best_layout, best_score = fallback_layout, fallback_score
         
         # Final validation and cleanup
+        best_layout = best_layout.copy()
         if len(best_layout) != len(objects_to_place):
             print(f"WARNING: Best layout has {len(best_layout)} objects, expected {len(objects_to_place)}")
-            print(f"DEBUG: Best layout objects: {[p['type'] for p in best_layout]}")
+            print(f"DEBUG: Best layout objects: {best_layout.type_names()}")
             print(f"DEBUG: Expected objects: {objects_to_place}")
             
-            # Add missing objects at origin if needed
-            placed_types = [p['type'] for p in best_layout]
+            # Add missing objects at origin if needed (by id: names past MAX_TYPES share UNKNOWN)
             for obj_type in objects_to_place:
-                if obj_type not in placed_types:
+                if intern_type(obj_type) not in best_layout.types:
                     print(f"Adding missing {obj_type} at origin")
-                    best_layout.append({'type': obj_type, 'x': 0, 'y': 0})
+                    best_layout.append(intern_type(obj_type), 0, 0)
         
         # Final verification that all objects are present
-        final_types = [p['type'] for p in best_layout]
-        print(f"DEBUG: Final layout objects: {final_types}")
+        print(f"DEBUG: Final layout objects: {best_layout.type_names()}")
         for obj_type in objects_to_place:
-            if obj_type not in final_types:
+            if intern_type(obj_type) not in best_layout.types:
                 print(f"ERROR: {obj_type} still missing from final layout!")
-                best_layout.append({'type': obj_type, 'x': 0, 'y': 0})
+                best_layout.append(intern_type(obj_type), 0, 0)
         
         # Final validation of best layout
         if not self._is_valid_layout(best_layout):
             print("ERROR: Best layout is invalid! Checking for overlaps...")
-            furniture_placements = [p for p in best_layout if p['type'] in ['bed', 'desk']]
-            for i, placement1 in enumerate(furniture_placements):
-                for j, placement2 in enumerate(furniture_placements):
-                    if i >= j:
-                        continue
-                    if self._objects_overlap(placement1, placement2):
-                        print(f"ERROR: Overlap detected between {placement1['type']} at ({placement1['x']}, {placement1['y']}) and {placement2['type']} at ({placement2['x']}, {placement2['y']})")
+            furniture_indices = [i for i, t in enumerate(best_layout.types) if t in FURNITURE_IDS]
+            for position, index1 in enumerate(furniture_indices):
+                for index2 in furniture_indices[position + 1:]:
+                    if self._objects_overlap(best_layout, index1, index2):
+                        print(f"ERROR: Overlap detected between {best_layout.type_name(index1)} at ({best_layout.xs[index1]}, {best_layout.ys[index1]}) and {best_layout.type_name(index2)} at ({best_layout.xs[index2]}, {best_layout.ys[index2]})")
                         # Try to fix by moving one object
-                        placement2['x'] = max(0, placement2['x'] + 10)
-                        placement2['y'] = max(0, placement2['y'] + 10)
-                        print(f"Fixed by moving {placement2['type']} to ({placement2['x']}, {placement2['y']})")
+                        best_layout.move(index2, max(0, best_layout.xs[index2] + 10), max(0, best_layout.ys[index2] + 10))
+                        print(f"Fixed by moving {best_layout.type_name(index2)} to ({best_layout.xs[index2]}, {best_layout.ys[index2]})")
         
         # Recalculate final score to ensure accuracy
         final_score = self._calculate_layout_score(best_layout)
+        stats.evaluations += 1
+        stats.finish()
+        elapsed = time.time() - start_time
+        stats.extras['latency'] = {
+            'time_budget': time_budget,
+            'elapsed': elapsed,
+            'stages': stages
+        }
+        stats.extras['score_cache'] = self.score_cache.to_dict()
+        stats.extras['seed'] = self.seed
+        stats.extras['score_bound'] = {
+            'upper_bound': bounds['total'],
+            'position': bounds['position'],
+            'components': bounds['components'],
+            'tolerance': bound_tolerance,
+            'gap': bounds['total'] - final_score,
+            'reached': final_score >= self.stop_score
+        }
+        if self.surrogate is not None:
+            stats.extras['surrogate'] = self.surrogate.to_dict()
+        if self.diagnostics.enabled:
+            stats.extras['diagnostics'] = self.diagnostics.to_dict(elapsed)
+            print(f"DEBUG: Diagnostics: {self.diagnostics.summary(elapsed)}")
+        self.search_stats = stats
         print(f"Final best score: {final_score:.2f} (was {best_score:.2f})")
         
         # Print final detailed breakdown
@@ -993,13 +1193,13 @@ class FengShuiOptimizer:
         
         return best_layout, final_score
 
-    def _generate_simple_fallback_layout(self, objects_to_place: List[str]) -> List[Dict]:
+    def _generate_simple_fallback_layout(self, objects_to_place: List[str]) -> Layout:
         """
         Generate a simple fallback layout when optimization fails.
         Places objects in a basic pattern that should be valid.
         """
         print("DEBUG: Generating simple fallback layout")
-        fallback_layout = []
+        fallback_layout = Layout((), [], [])
         
         # Simple placement strategy: place objects in corners and edges
         positions = [
@@ -1020,11 +1220,7 @@ class FengShuiOptimizer:
                     
                 # Check if this position is valid for this object
                 if is_position_valid(x, y, obj_type, set(), self.grid_width, self.grid_height):
-                    fallback_layout.append({
-                        'type': obj_type,
-                        'x': x,
-                        'y': y
-                    })
+                    fallback_layout.append(intern_type(obj_type), x, y)
                     placed = True
                     print(f"DEBUG: Placed {obj_type} at ({x}, {y}) in fallback layout")
                     break
@@ -1036,28 +1232,21 @@ class FengShuiOptimizer:
                 center_y = self.grid_height // 2
                 
                 if is_position_valid(center_x, center_y, obj_type, set(), self.grid_width, self.grid_height):
-                    fallback_layout.append({
-                        'type': obj_type,
-                        'x': center_x,
-                        'y': center_y
-                    })
+                    fallback_layout.append(intern_type(obj_type), center_x, center_y)
                     print(f"DEBUG: Placed {obj_type} at center ({center_x}, {center_y}) in fallback layout")
                 else:
                     # Last resort: place at origin
-                    fallback_layout.append({
-                        'type': obj_type,
-                        'x': 0,
-                        'y': 0
-                    })
+                    fallback_layout.append(intern_type(obj_type), 0, 0)
                     print(f"DEBUG: Placed {obj_type} at origin (0, 0) in fallback layout")
         
         print(f"DEBUG: Generated fallback layout with {len(fallback_layout)} objects")
         return fallback_layout
 
-    def get_layout_analysis(self, placements: List[Dict]) -> Dict:
+    def get_layout_analysis(self, placements) -> Dict:
         """
         Get detailed analysis of a layout's Feng Shui properties.
         """
+        placements = as_layout(placements)
         analysis = {
             'total_score': self._calculate_layout_score(placements),
             'bagua_analysis': {},
@@ -1071,8 +1260,8 @@ class FengShuiOptimizer:
         
         # Analyze each bagua zone
         zone_counts = {}
-        for placement in placements:
-            zone = self._get_bagua_zone(placement['x'], placement['y'])
+        for x, y in zip(placements.xs, placements.ys):
+            zone = self._get_bagua_zone(x, y)
             zone_counts[zone] = zone_counts.get(zone, 0) + 1
         
         for zone, count in zone_counts.items():
@@ -1098,34 +1287,34 @@ class FengShuiOptimizer:
         
         return analysis
 
-    def _print_detailed_score_breakdown(self, placements: List[Dict], score: float):
+    def _print_detailed_score_breakdown(self, placements, score: float):
         """
         Print detailed breakdown of all factors contributing to the score.
         """
+        placements = as_layout(placements)
         print(f"\n{'='*60}")
         print(f"DETAILED SCORE BREAKDOWN")
         print(f"{'='*60}")
         print(f"Final Score: {score:.2f}")
         print(f"Number of objects: {len(placements)}")
-        print(f"Objects: {[p['type'] for p in placements]}")
+        print(f"Objects: {placements.type_names()}")
         print(f"\n{'-'*60}")
         
         # 1. Bagua Scores
         print(f"1. BAGUA SCORES:")
         total_bagua = 0.0
-        for placement in placements:
-            bagua_score = self._calculate_bagua_score(placement)
-            weight = self.config['furniture_preferences'].get(
-                placement['type'], {}).get('weight', 1)
-            normalized_weight = weight / 10.0
+        for index, type_id in enumerate(placements.types):
+            bagua_score = self._calculate_bagua_score(placements, index)
+            normalized_weight = self._type_weight(type_id)
+            weight = normalized_weight * 10.0
             final_bagua = bagua_score * normalized_weight
             total_bagua += final_bagua
             
             # Get bagua zone
-            x, y = placement['x'], placement['y']
+            x, y = placements.xs[index], placements.ys[index]
             zone = self._get_bagua_zone(x, y)
             
-            print(f"   {placement['type']} at ({x}, {y}) - Zone: {zone}")
+            print(f"   {placements.type_name(index)} at ({x}, {y}) - Zone: {zone}")
             print(f"     Raw bagua score: {bagua_score:.2f}")
             print(f"     Weight: {weight}, Normalized: {normalized_weight:.2f}")
             print(f"     Final: {final_bagua:.2f}")
@@ -1147,13 +1336,13 @@ class FengShuiOptimizer:
         # 5. Wall Placement Bonuses
         print(f"\n5. WALL PLACEMENT BONUSES:")
         wall_bonus_total = 0.0
-        for placement in placements:
-            if placement['type'] in ['door', 'window']:
-                x, y = placement['x'], placement['y']
+        for index, type_id in enumerate(placements.types):
+            if type_id in WALL_OPENING_IDS:
+                x, y = placements.xs[index], placements.ys[index]
                 if (x == 0 or x == self.grid_width - 1 or 
                     y == 0 or y == self.grid_height - 1):
                     wall_bonus_total += 15.0
-                    print(f"   {placement['type']} at ({x}, {y}) - Wall bonus: +15.0")
+                    print(f"   {placements.type_name(index)} at ({x}, {y}) - Wall bonus: +15.0")
         print(f"   Total Wall Bonus: {wall_bonus_total:.2f}")
         
         # 6. Feng Shui Penalties
@@ -1210,7 +1399,7 @@ if __name__ == "__main__":
     optimized_layout, score = optimizer.optimize_layout(objects)
     
     print(f"\nOptimized Layout:")
-    for placement in optimized_layout:
+    for placement in optimized_layout.to_placements():
         zone = optimizer._get_bagua_zone(placement['x'], placement['y'])
         print(f"  {placement['type']}: ({placement['x']}, {placement['y']}) - Zone: {zone}")
     
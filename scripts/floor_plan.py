@@ -0,0 +1,193 @@
+"""
+Multi-room floor-plan optimization.
+
+A floor plan is a list of rectangular rooms, each with its own grid size and
+objects. Rooms are independent, so they are optimized concurrently: on the
+server's warm optimizer pool (optimizer_pool.py) when one is configured,
+each room taking one of its slots like any other optimization, and
+otherwise on a process pool started for the request.
+
+Cancellation reaches the pool workers through the token's cancel id: each
+room carries it and builds its own token polling the cancel marker.
+
+Each room also carries its own seed, spawned from the floor plan's seed
+unless the room names one, so the rooms draw from independent streams and
+the whole plan replays from a single seed.
+"""
+
+import os
+import time
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+from typing import List, Dict, Optional
+import numpy as np
+from feng_shui_optimizer import FengShuiOptimizer, resolve_grid_size, resolve_seed
+from strategies import STRATEGIES, sanitize_algorithm_params
+from cancellation import CancellationToken, OptimizationCancelled
+from optimizer_pool import OptimizerPool, optimizer_pool
+
+DEFAULT_OBJECTS = ['bed', 'desk', 'door', 'window']
+
+def parse_floor_plan(data: Dict, seed: Optional[int] = None,
+                     surrogate_path: Optional[str] = None) -> List[Dict]:
+    """
+    Validate a floor-plan request body and return normalized room specs.
+
+    Args:
+        data: Request body
+        seed: Floor-plan seed the room seeds are spawned from (drawn fresh if None)
+        surrogate_path: Server-configured surrogate model; replaces any
+            'surrogate_path' a room's algorithm or config names
+    """
+    rooms = data.get('rooms')
+    if not isinstance(rooms, list) or not rooms:
+        raise ValueError("Floor plan must contain a non-empty 'rooms' list")
+
+    room_seeds = np.random.SeedSequence(resolve_seed(seed)).spawn(len(rooms))
+    room_specs = []
+    for index, room in enumerate(rooms):
+        if not isinstance(room, dict):
+            raise ValueError(f"Room {index} must be an object")
+
+        try:
+            grid_width, grid_height = resolve_grid_size(room.get('grid_width', 144), room.get('grid_height', 144))
+        except ValueError as e:
+            raise ValueError(f"Room {index} {e}")
+        strategy = room.get('strategy')
+        if strategy is not None and strategy not in STRATEGIES:
+            raise ValueError(f"Room {index} has unknown strategy: {strategy}")
+
+        # Budgets are clamped like /feng-shui-optimizer's, in the room config's
+        # algorithm block too since it is merged under the room's
+        algorithm = sanitize_algorithm_params(room.get('algorithm'), f"Room {index} algorithm")
+        config = room.get('config')
+        if config is not None:
+            if not isinstance(config, dict):
+                raise ValueError(f"Room {index} config must be an object")
+            config = {**config, 'algorithm': sanitize_algorithm_params(
+                config.get('algorithm'), f"Room {index} config algorithm")}
+
+        # Model files come from the server configuration, never from the request;
+        # the algorithm block overrides the config's, so setting it here covers both
+        algorithm['surrogate_path'] = surrogate_path
+
+        room_seed = room.get('seed')
+        if room_seed is None:
+            room_seed = int(room_seeds[index].generate_state(1)[0])
+
+        room_specs.append({
+            'name': room.get('name', f'room_{index + 1}'),
+            'grid_width': grid_width,
+            'grid_height': grid_height,
+            'objects_to_place': list(room.get('objects_to_place', DEFAULT_OBJECTS)),
+            'config': config,
+            'strategy': strategy,
+            'algorithm': algorithm,
+            'seed': resolve_seed(room_seed)
+        })
+
+    return room_specs
+
+def optimize_room(room: Dict, cancel_token: Optional[CancellationToken] = None) -> Dict:
+    """Optimize a single room, in the request thread or on a pool worker."""
+    start_time = time.time()
+    if cancel_token is None and room.get('cancel_id') is not None:
+        cancel_token = CancellationToken(room['cancel_id'])
+    try:
+        optimizer = FengShuiOptimizer(room['grid_width'], room['grid_height'], room['config'])
+        layout, score = optimizer.optimize_layout(
+            room['objects_to_place'], room['strategy'], room['algorithm'], cancel_token, room.get('seed'))
+        result = {
+            'placements': layout.to_placements(),
+            'score': score,
+            'stats': optimizer.search_stats.to_dict()
+        }
+    except OptimizationCancelled as e:
+        print(f"Room {room['name']} cancelled: {e}")
+        result = {'placements': [], 'score': None, 'error': 'cancelled', 'cancelled': True}
+    except Exception as e:
+        print(f"Error optimizing room {room['name']}: {e}")
+        result = {'placements': [], 'score': None, 'error': str(e)}
+
+    result.update({
+        'name': room['name'],
+        'grid_width': room['grid_width'],
+        'grid_height': room['grid_height'],
+        'seed': room.get('seed'),
+        'elapsed_seconds': time.time() - start_time
+    })
+    return result
+
+def _run_room(pool: OptimizerPool, room: Dict, cancel_token: CancellationToken) -> Dict:
+    """Optimize one room on a pool worker; runs in a dispatch thread of the request."""
+    return pool.run({**room, 'cancel_id': cancel_token.cancel_id}, cancel_token, optimize_room)
+
+def optimize_floor_plan(rooms: List[Dict], max_workers: Optional[int] = None,
+                        cancel_token: Optional[CancellationToken] = None) -> Dict:
+    """
+    Optimize every room of a floor plan.
+    
+    With the server's optimizer pool configured (optimizer_pool.py), up to
+    max_workers rooms at a time are sent to it, so rooms share its slots,
+    queue timeout and result timeout with every other optimization and
+    PoolBusy / PoolTimeout propagate to the caller. Without one, a pool of
+    min(rooms, max_workers, CPU count) processes is started for this call
+    and shut down when it returns. A single room, a single CPU or a token
+    without a cancel id runs the rooms one after another in the calling
+    thread instead.
+    
+    Args:
+        rooms: Room specs from parse_floor_plan
+        max_workers: Rooms dispatched at once; capped at the pool size
+        cancel_token: Stops every room once tripped; needs a cancel_id to reach
+            the pool workers. Raises OptimizationCancelled.
+    """
+    start_time = time.time()
+    pool = optimizer_pool()
+    local_pool = None
+    if pool is None and cancel_token is not None and cancel_token.cancel_id is not None:
+        workers = min(len(rooms), max_workers or len(rooms), os.cpu_count() or 1)
+        if workers > 1:
+            # No result timeout, as when the rooms run in this thread
+            local_pool = pool = OptimizerPool(workers, max_pending=0, result_timeout=float('inf'))
+
+    if pool is None:
+        print(f"DEBUG: Optimizing {len(rooms)} rooms in the request thread")
+        results = []
+        for room in rooms:
+            if cancel_token is not None:
+                cancel_token.check()
+            results.append(optimize_room(room, cancel_token))
+    else:
+        if cancel_token is None or cancel_token.cancel_id is None:
+            raise ValueError("Pooled floor-plan optimization needs a cancellation token with a cancel id")
+        max_workers = max(1, min(max_workers or pool.workers, pool.workers, len(rooms)))
+        print(f"DEBUG: Optimizing {len(rooms)} rooms, {max_workers} at a time on the "
+              f"{'request' if local_pool is not None else 'optimizer'} pool")
+
+        try:
+            with ThreadPoolExecutor(max_workers=max_workers) as dispatch:
+                futures = [dispatch.submit(_run_room, pool, room, cancel_token) for room in rooms]
+                _, pending = wait(futures, return_when=FIRST_EXCEPTION)
+                if pending:
+                    # One room was rejected, timed out or cancelled: stop the others too
+                    cancel_token.cancel('floor plan room failed')
+                    wait(pending)
+        finally:
+            if local_pool is not None:
+                local_pool.shutdown()
+        errors = [future.exception() for future in futures if future.exception() is not None]
+        # Report why the plan stopped rather than the cancellations it caused
+        errors.sort(key=lambda error: isinstance(error, OptimizationCancelled))
+        if errors:
+            raise errors[0]
+        results = [future.result() for future in futures]
+
+    if cancel_token is not None:
+        cancel_token.check()
+
+    scores = [room['score'] for room in results if room['score'] is not None]
+    return {
+        'rooms': results,
+        'total_score': sum(scores),
+        'elapsed_seconds': time.time() - start_time
+    }
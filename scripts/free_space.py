@@ -0,0 +1,85 @@
+"""
+Free-space index for the random layout generators.
+
+FreeSpaceIndex keeps an occupancy grid of the cells covered by placed
+furniture and a summed-area table over it. The table gives the number of
+occupied cells under any rectangle in four lookups, so the anchors where a
+w x h object fits without collision are found for the whole grid in one
+vectorised pass. A uniformly random collision-free anchor is then a single
+draw instead of a rejection-sampling loop, and an empty set of anchors is
+a definite "does not fit".
+
+Doors and windows cover no cells (as in helpers.add_occupied_positions);
+their anchors only have to satisfy the wall placement rule.
+"""
+
+import random
+from typing import Optional, Tuple
+import numpy as np
+from heatmap import placement_mask
+from layout import TYPE_DIMENSIONS, TYPE_IS_BOUNDARY, TYPE_IS_KNOWN
+
+class FreeSpaceIndex:
+    """
+    Occupied cells of one grid, updated as objects are placed.
+    """
+
+    def __init__(self, grid_width: int, grid_height: int, rng: Optional[random.Random] = None):
+        """
+        Args:
+            grid_width: Width of the grid in cells
+            grid_height: Height of the grid in cells
+            rng: Random stream of sample() (default: a freshly seeded one)
+        """
+        self.grid_width = grid_width
+        self.grid_height = grid_height
+        self.rng = rng if rng is not None else random.Random()
+        self.occupied = np.zeros((grid_height, grid_width), dtype=bool)
+        self._table: Optional[np.ndarray] = None
+
+    def _summed_area_table(self) -> np.ndarray:
+        """table[y, x] = occupied cells in rows < y and columns < x (rebuilt after changes)."""
+        if self._table is None:
+            table = np.zeros((self.grid_height + 1, self.grid_width + 1), dtype=np.int32)
+            table[1:, 1:] = self.occupied.cumsum(axis=0).cumsum(axis=1)
+            self._table = table
+        return self._table
+
+    def free_anchors(self, type_id: int) -> np.ndarray:
+        """(grid_height, grid_width) mask of anchors where the type fits without collision."""
+        mask = placement_mask(type_id, self.grid_width, self.grid_height)
+        if TYPE_IS_BOUNDARY[type_id] or not TYPE_IS_KNOWN[type_id] or not mask.any():
+            return mask
+
+        width, height = TYPE_DIMENSIONS[type_id]
+        table = self._summed_area_table()
+        rows, cols = self.grid_height - height + 1, self.grid_width - width + 1
+        covered = (table[height:height + rows, width:width + cols] - table[:rows, width:width + cols] -
+                   table[height:height + rows, :cols] + table[:rows, :cols])
+        mask[:rows, :cols] &= covered == 0
+        return mask
+
+    def sample(self, type_id: int, region: Optional[np.ndarray] = None) -> Optional[Tuple[int, int]]:
+        """
+        Uniformly random collision-free anchor, or None if the type does not fit.
+
+        Args:
+            type_id: Interned type of the object
+            region: Optional mask of anchors to restrict the draw to
+        """
+        mask = self.free_anchors(type_id)
+        if region is not None:
+            mask &= region
+        anchors = np.flatnonzero(mask)
+        if not len(anchors):
+            return None
+        anchor = int(anchors[self.rng.randrange(len(anchors))])
+        return anchor % self.grid_width, anchor // self.grid_width
+
+    def occupy(self, type_id: int, x: int, y: int):
+        """Mark the cells covered by an object placed at (x, y)."""
+        if TYPE_IS_BOUNDARY[type_id]:
+            return
+        width, height = TYPE_DIMENSIONS[type_id] if TYPE_IS_KNOWN[type_id] else (1, 1)
+        self.occupied[max(0, y):y + height, max(0, x):x + width] = True
+        self._table = None
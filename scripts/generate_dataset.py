@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Generate a dataset of scored random layouts for training approximate scorers.
+
+Each grid size is split into chunks of random valid layouts
+(random_layouts.sample_random_layouts). Chunks are drawn and scored by
+worker processes and written one file per chunk, so memory use stays at
+one chunk per worker whatever the dataset size:
+
+    <out>/manifest.json
+    <out>/<W>x<H>/chunk_00000.npy    (--format npy)
+    <out>/<W>x<H>/chunk_00000.jsonl  (--format jsonl)
+
+A .npy chunk is a structured array with one record per layout: the x and
+y of every object (in --objects order), the score and every component of
+the score breakdown. np.load(path, mmap_mode='r') maps it without reading
+it; load_chunks() maps all chunks of a grid. A .jsonl chunk holds one
+{"placements", "score", "breakdown"} object per line.
+
+Every chunk is seeded from (--seed, grid, chunk index) and written to a
+temporary file that is renamed once complete. Re-running the same command
+after an interruption skips the finished chunks and produces the same
+dataset as an uninterrupted run.
+
+    python generate_dataset.py --out data/layouts --grid 144x144 --grid 96x120 --layouts 1000000
+    python generate_dataset.py --out data/layouts --format jsonl --objects bed desk door --workers 8
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import time
+from typing import Dict, List, Tuple
+import numpy as np
+from batch_scoring import BatchScorer
+from feng_shui_optimizer import FengShuiOptimizer
+from random_layouts import MAX_RANDOM_LAYOUTS, sample_random_layouts, layouts_to_placements
+from run_server import parse_grid_size
+
+MANIFEST_NAME = 'manifest.json'
+DATASET_FORMATS = ('npy', 'jsonl')
+
+# Manifest fields that must match when resuming into an existing directory
+RESUME_FIELDS = ('objects', 'chunk_size', 'format', 'seed')
+
+def breakdown_fields(objects: List[str]) -> List[str]:
+    """Names of the score components, in BatchScorer.components order."""
+    optimizer = FengShuiOptimizer(3, 3)
+    empty = np.zeros((0, len(objects)), dtype=np.int64)
+    return list(BatchScorer(optimizer, objects).components(empty, empty.copy()))
+
+def record_dtype(num_objects: int, fields: List[str]) -> np.dtype:
+    """Structured dtype of one layout record of a .npy chunk."""
+    return np.dtype([('x', np.int32, (num_objects,)), ('y', np.int32, (num_objects,)),
+                     ('score', np.float64)] + [(field, np.float64) for field in fields])
+
+def chunk_path(out_dir: str, grid: Tuple[int, int], index: int, dataset_format: str) -> str:
+    return os.path.join(out_dir, f"{grid[0]}x{grid[1]}", f"chunk_{index:05d}.{dataset_format}")
+
+def _write_npy(path: str, scorer: BatchScorer, xs: np.ndarray, ys: np.ndarray,
+               scores: np.ndarray, components: Dict[str, np.ndarray]):
+    records = np.lib.format.open_memmap(path, mode='w+', shape=(len(scores),),
+                                        dtype=record_dtype(scorer.num_objects, list(components)))
+    records['x'], records['y'], records['score'] = xs, ys, scores
+    for field, values in components.items():
+        records[field] = values
+    records.flush()
+    del records
+
+def _write_jsonl(path: str, scorer: BatchScorer, xs: np.ndarray, ys: np.ndarray,
+                 scores: np.ndarray, components: Dict[str, np.ndarray]):
+    with open(path, 'w') as f:
+        for row, placements in enumerate(layouts_to_placements(scorer, xs, ys)):
+            breakdown = {field: float(values[row]) for field, values in components.items()}
+            f.write(json.dumps({'placements': placements, 'score': float(scores[row]),
+                                'breakdown': breakdown}, separators=(',', ':')) + '\n')
+
+def generate_chunk(task: Tuple) -> Tuple[str, int, float]:
+    """
+    Draw, score and write one chunk (runs in a worker process).
+
+    Args:
+        task: (out_dir, grid, chunk index, layouts, objects, format, seed)
+
+    Returns:
+        The chunk path, the number of layouts written and the seconds taken
+    """
+    out_dir, grid, index, count, objects, dataset_format, seed = task
+    start = time.time()
+    rng = np.random.default_rng([seed, grid[0], grid[1], index])
+    with contextlib.redirect_stdout(io.StringIO()):
+        optimizer = FengShuiOptimizer(*grid)
+        scorer, xs, ys, scores = sample_random_layouts(optimizer, objects, count, rng)
+        components = scorer.components(xs, ys)
+
+    path = chunk_path(out_dir, grid, index, dataset_format)
+    temporary = f"{path}.tmp"
+    write = _write_npy if dataset_format == 'npy' else _write_jsonl
+    write(temporary, scorer, xs, ys, scores, components)
+    os.replace(temporary, path)
+    return path, len(scores), time.time() - start
+
+def load_chunks(out_dir: str, grid: Tuple[int, int]) -> List[np.ndarray]:
+    """Memory-mapped record arrays of every finished .npy chunk of a grid, in chunk order."""
+    directory = os.path.join(out_dir, f"{grid[0]}x{grid[1]}")
+    if not os.path.isdir(directory):
+        return []
+    names = sorted(name for name in os.listdir(directory) if name.endswith('.npy'))
+    return [np.load(os.path.join(directory, name), mmap_mode='r') for name in names]
+
+def _check_manifest(out_dir: str, manifest: Dict):
+    """Write the manifest, or make sure an existing one describes the same dataset."""
+    path = os.path.join(out_dir, MANIFEST_NAME)
+    if os.path.exists(path):
+        with open(path) as f:
+            existing = json.load(f)
+        mismatched = [field for field in RESUME_FIELDS if existing.get(field) != manifest.get(field)]
+        if mismatched:
+            raise ValueError(f"{out_dir} holds a dataset with different {', '.join(mismatched)}; "
+                             f"use another --out directory")
+        manifest['grids'] = sorted({tuple(grid) for grid in existing.get('grids', []) + manifest['grids']})
+        manifest['layouts_per_grid'] = max(existing.get('layouts_per_grid', 0), manifest['layouts_per_grid'])
+    with open(f"{path}.tmp", 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(f"{path}.tmp", path)
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate scored random layouts for training")
+    parser.add_argument('--out', required=True, help="Output directory (created if missing)")
+    parser.add_argument('--grid', type=parse_grid_size, action='append', default=None, metavar='WxH')
+    parser.add_argument('--objects', nargs='+', default=['bed', 'desk', 'door', 'window'])
+    parser.add_argument('--layouts', type=int, default=100000, help="Layouts to draw per grid")
+    parser.add_argument('--chunk-size', type=int, default=10000, help="Layouts per chunk file")
+    parser.add_argument('--format', choices=DATASET_FORMATS, default='npy')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    if not 1 <= args.chunk_size <= MAX_RANDOM_LAYOUTS:
+        parser.error(f"--chunk-size must be between 1 and {MAX_RANDOM_LAYOUTS}")
+    if args.layouts < 0:
+        parser.error("--layouts must not be negative")
+
+    grids = args.grid or [(144, 144)]
+    fields = breakdown_fields(args.objects)
+    manifest = {
+        'objects': args.objects,
+        'chunk_size': args.chunk_size,
+        'format': args.format,
+        'seed': args.seed,
+        'grids': [list(grid) for grid in grids],
+        'layouts_per_grid': args.layouts,
+        'breakdown_fields': fields,
+        'dtype': record_dtype(len(args.objects), fields).descr if args.format == 'npy' else None
+    }
+    os.makedirs(args.out, exist_ok=True)
+    try:
+        _check_manifest(args.out, manifest)
+    except ValueError as e:
+        parser.error(str(e))
+
+    tasks, skipped = [], 0
+    for grid in grids:
+        os.makedirs(os.path.dirname(chunk_path(args.out, grid, 0, args.format)), exist_ok=True)
+        for index, start in enumerate(range(0, args.layouts, args.chunk_size)):
+            if os.path.exists(chunk_path(args.out, grid, index, args.format)):
+                skipped += 1
+                continue
+            count = min(args.chunk_size, args.layouts - start)
+            tasks.append((args.out, grid, index, count, args.objects, args.format, args.seed))
+
+    print(f"{len(tasks)} chunks to generate, {skipped} already done, {args.workers} workers")
+    start, written = time.time(), 0
+    with multiprocessing.Pool(max(1, args.workers)) as pool:
+        for done, (path, count, seconds) in enumerate(pool.imap_unordered(generate_chunk, tasks), 1):
+            written += count
+            print(f"[{done}/{len(tasks)}] {path}: {count} layouts in {seconds:.2f}s")
+    elapsed = time.time() - start
+    print(f"Wrote {written} layouts in {elapsed:.1f}s"
+          f"{f' ({written / elapsed:.0f} layouts/s)' if elapsed > 0 and written else ''}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,208 @@
+"""
+Population-based genetic search for Feng Shui layouts.
+
+The population is held as two (population_size, num_objects) coordinate
+arrays so selection, crossover, mutation and fitness all run as whole-array
+operations, with fitness coming from one BatchScorer pass per generation.
+"""
+
+import time
+from typing import List, Dict, Tuple, Optional
+import numpy as np
+from batch_scoring import BatchScorer
+from layout import Layout
+from cancellation import CancellationToken
+
+class GeneticOptimizer:
+    """
+    Genetic algorithm over layouts of a fixed list of objects.
+    """
+
+    def __init__(self, optimizer, objects_to_place: List[str],
+                 population_size: int = 40, generations: int = 60,
+                 tournament_size: int = 3, elite_count: int = 2,
+                 mutation_rate: Optional[float] = None, time_limit: float = 20.0,
+                 rng: Optional[np.random.Generator] = None,
+                 cancel_token: Optional[CancellationToken] = None):
+        """
+        Args:
+            optimizer: FengShuiOptimizer providing the grid, config and scoring
+            objects_to_place: Object types; one column of genes per object
+            population_size: Number of layouts per generation
+            generations: Generation budget
+            tournament_size: Candidates drawn per tournament selection
+            elite_count: Best layouts copied unchanged into the next generation
+            mutation_rate: Per-object mutation probability (config default if None)
+            time_limit: Wall-clock limit in seconds
+            rng: NumPy random generator
+            cancel_token: Checked once per generation
+        """
+        self.optimizer = optimizer
+        self.objects_to_place = list(objects_to_place)
+        self.population_size = max(2, population_size)
+        self.generations = max(0, generations)
+        self.tournament_size = max(1, tournament_size)
+        self.elite_count = min(max(0, elite_count), self.population_size - 1)
+        self.time_limit = time_limit
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.cancel_token = cancel_token
+        if mutation_rate is None:
+            mutation_rate = optimizer.config.get('algorithm', {}).get('mutation_rate', 0.3)
+        self.mutation_rate = mutation_rate
+
+        self.scorer = BatchScorer(optimizer, self.objects_to_place)
+        self.grid_width = optimizer.grid_width
+        self.grid_height = optimizer.grid_height
+
+        # _mutate_placement clamps anchors so the object stays inside the grid
+        self.max_x = np.maximum(0, self.grid_width - self.scorer.widths)
+        self.max_y = np.maximum(0, self.grid_height - self.scorer.heights)
+
+    def _random_population(self, count: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Sample anchors uniformly, boundaries directly on a wall; with the
+        optimizer's score-guided sampler, most anchors come from it instead.
+        """
+        W, H = self.grid_width, self.grid_height
+        shape = (count, self.scorer.num_objects)
+        xs = self.rng.integers(0, self.max_x + 1, size=shape)
+        ys = self.rng.integers(0, self.max_y + 1, size=shape)
+
+        spans = self.scorer.spans
+        along_x = self.rng.integers(0, np.maximum(0, W - spans) + 1, size=shape)
+        along_y = self.rng.integers(0, np.maximum(0, H - spans) + 1, size=shape)
+        wall = self.rng.integers(0, 4, size=shape)
+        wall_x = np.select([wall == 0, wall == 1, wall == 2], [0, W - 1, along_x], along_x)
+        wall_y = np.select([wall == 0, wall == 1, wall == 2], [along_y, along_y, 0], H - 1)
+
+        boundary = self.scorer.boundary_mask
+        xs, ys = np.where(boundary, wall_x, xs), np.where(boundary, wall_y, ys)
+
+        sampler = self.optimizer.position_sampler
+        if sampler is not None:
+            for column, type_id in enumerate(self.scorer.type_ids):
+                guided = sampler.sample_many(type_id, count, self.rng)
+                if guided is not None:
+                    use_guided = self.rng.random(count) >= sampler.uniform_mix
+                    xs[:, column] = np.where(use_guided, guided[0], xs[:, column])
+                    ys[:, column] = np.where(use_guided, guided[1], ys[:, column])
+        return xs, ys
+
+    def _initial_population(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Random valid layouts, resampling invalid ones a bounded number of times."""
+        xs, ys = self._random_population(self.population_size)
+        for _ in range(50):
+            invalid = ~self.scorer.validity(xs, ys)
+            if not invalid.any():
+                break
+            new_xs, new_ys = self._random_population(int(invalid.sum()))
+            xs[invalid], ys[invalid] = new_xs, new_ys
+        return xs, ys
+
+    def _fitness(self, xs: np.ndarray, ys: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Batched score; invalid layouts can never be selected over valid ones."""
+        scores = self.scorer.score(xs, ys)
+        return np.where(self.scorer.validity(xs, ys), scores, -np.inf), scores
+
+    def _tournament(self, fitness: np.ndarray, count: int) -> np.ndarray:
+        """Indices of the winners of `count` tournaments."""
+        entrants = self.rng.integers(0, len(fitness), size=(count, self.tournament_size))
+        winners = np.argmax(fitness[entrants], axis=1)
+        return entrants[np.arange(count), winners]
+
+    def _crossover(self, xs, ys, parents_a, parents_b):
+        """Uniform crossover that swaps whole object placements between parents."""
+        take_a = self.rng.random((len(parents_a), self.scorer.num_objects)) < 0.5
+        child_xs = np.where(take_a, xs[parents_a], xs[parents_b])
+        child_ys = np.where(take_a, ys[parents_a], ys[parents_b])
+        return child_xs, child_ys
+
+    def _mutate(self, xs, ys):
+        """Vectorised _mutate_placement: ±8 jitter, clamped into the grid."""
+        mutate = self.rng.random(xs.shape) < self.mutation_rate
+        dx = self.rng.integers(-8, 9, size=xs.shape)
+        dy = self.rng.integers(-8, 9, size=xs.shape)
+        new_xs = np.where(mutate, np.clip(xs + dx, 0, self.max_x), xs)
+        new_ys = np.where(mutate, np.clip(ys + dy, 0, self.max_y), ys)
+
+        # Like _generate_valid_mutation, keep the original placement when a
+        # moved object lands somewhere invalid, then the original layout when
+        # the moves collide with each other
+        diagnostics = self.optimizer.diagnostics
+        with diagnostics.timer('validation'):
+            placement_ok = self.scorer.placement_validity(new_xs, new_ys)
+            new_xs = np.where(placement_ok, new_xs, xs)
+            new_ys = np.where(placement_ok, new_ys, ys)
+            valid = self.scorer.validity(new_xs, new_ys)
+        diagnostics.reject(int((mutate & ~placement_ok).sum() + (~valid).sum()))
+        return np.where(valid[:, None], new_xs, xs), np.where(valid[:, None], new_ys, ys)
+
+    def run(self) -> Tuple[Layout, float, Dict]:
+        """
+        Evolve the population and return (best layout, score, stats).
+        """
+        start_time = time.time()
+        print(f"DEBUG: Starting genetic optimization: population {self.population_size}, "
+              f"{self.generations} generations, {len(self.objects_to_place)} objects")
+
+        xs, ys = self._initial_population()
+        fitness, scores = self._fitness(xs, ys)
+        evaluations = len(fitness)
+        valid_children = 0
+        generations_run = 0
+        best_trace = []
+        if np.isfinite(fitness).any():
+            best_trace.append((evaluations, time.time() - start_time, float(fitness.max())))
+
+        children_count = self.population_size - self.elite_count
+        diagnostics = self.optimizer.diagnostics
+        for generation in range(self.generations):
+            if self.cancel_token is not None:
+                self.cancel_token.check()
+            if time.time() - start_time > self.time_limit:
+                print(f"DEBUG: Genetic optimization timed out after {generation} generations")
+                break
+            if fitness.max() >= self.optimizer.stop_score:
+                print(f"DEBUG: Genetic optimization reached the score upper bound after {generation} generations")
+                break
+
+            elite = np.argsort(-fitness, kind='stable')[:self.elite_count]
+            parents_a = self._tournament(fitness, children_count)
+            parents_b = self._tournament(fitness, children_count)
+            with diagnostics.timer('proposal'):
+                child_xs, child_ys = self._crossover(xs, ys, parents_a, parents_b)
+                child_xs, child_ys = self._mutate(child_xs, child_ys)
+            with diagnostics.timer('scoring'):
+                child_fitness, child_scores = self._fitness(child_xs, child_ys)
+            evaluations += children_count
+            valid_children += int(np.isfinite(child_fitness).sum())
+
+            xs = np.concatenate([xs[elite], child_xs])
+            ys = np.concatenate([ys[elite], child_ys])
+            fitness = np.concatenate([fitness[elite], child_fitness])
+            scores = np.concatenate([scores[elite], child_scores])
+            generations_run += 1
+            if np.isfinite(fitness).any() and (not best_trace or fitness.max() > best_trace[-1][2]):
+                best_trace.append((evaluations, time.time() - start_time, float(fitness.max())))
+
+            if generation % 10 == 0:
+                print(f"DEBUG: Generation {generation}, best fitness: {fitness.max():.2f}")
+
+        # Fall back to the raw score if no individual is valid
+        best = int(np.argmax(fitness)) if np.isfinite(fitness).any() else int(np.argmax(scores))
+        best_layout = self.scorer.to_layout(xs[best], ys[best])
+        best_score = self.optimizer._calculate_layout_score(best_layout)
+
+        wall_time = time.time() - start_time
+        stats = {
+            'evaluations': evaluations,
+            'valid_children': valid_children,
+            'generations': generations_run,
+            'population_size': self.population_size,
+            'wall_time': wall_time,
+            'evaluations_per_second': evaluations / wall_time if wall_time > 0 else 0.0,
+            'best_trace': best_trace
+        }
+        print(f"DEBUG: Genetic optimization finished with score {best_score:.2f}, "
+              f"{stats['evaluations_per_second']:.0f} evaluations/s")
+        return best_layout, best_score, stats
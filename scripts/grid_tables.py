@@ -0,0 +1,162 @@
+"""
+Precomputed per-grid tables in memory-mapped files.
+
+The per-grid tables of a process (heatmap placement masks, position
+rasters and bagua zone rasters, proposals' guided distributions) depend
+only on the grid size, the object definitions and the scoring config.
+write_grid_tables() saves them as .npy files:
+
+    <root>/<version>/<W>x<H>/tables.json
+    <root>/<version>/<W>x<H>/bagua_zones.npy
+    <root>/<version>/<W>x<H>/<type>.mask.npy
+    <root>/<version>/<W>x<H>/<type>.position.npy
+    <root>/<version>/<W>x<H>/<type>.anchors.npy
+    <root>/<version>/<W>x<H>/<type>.cumulative.npy
+
+load_grid_tables() maps them read-only into those caches, so every process
+mapping the same files shares their pages instead of computing its own
+copy. Tables loaded this way, and preloaded ones, are pinned: the size-bounded
+caches never evict them. The version hashes config/objects.json, the scoring config and
+TABLES_FORMAT, so tables from other object definitions or weights are
+never picked up; they just sit in another version directory.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+from typing import Dict, Optional
+import numpy as np
+import heatmap
+import proposals
+from heatmap import bagua_zone_raster, placement_mask, position_scores, position_scoring_key
+from helpers import OBJECT_CONFIG, OBJECT_CONFIG_PATH
+from layout import TYPE_IDS, TYPE_NAMES, TYPE_IS_KNOWN
+from proposals import PositionSampler
+
+# Bump when the files or the way the tables are computed change
+TABLES_FORMAT = 1
+
+TABLES_ENV = 'FENG_SHUI_GRID_TABLES'
+
+def default_tables_dir() -> Optional[str]:
+    """Table root configured for this process, if any."""
+    return os.environ.get(TABLES_ENV) or None
+
+def objects_config_hash() -> str:
+    """SHA-256 of config/objects.json (of the built-in fallback when the file is missing)."""
+    try:
+        with open(OBJECT_CONFIG_PATH, 'rb') as f:
+            content = f.read()
+    except FileNotFoundError:
+        content = json.dumps(OBJECT_CONFIG, sort_keys=True).encode()
+    return hashlib.sha256(content).hexdigest()
+
+def _proposal_temperature(optimizer) -> float:
+    return float(optimizer.config.get('algorithm', {}).get('proposal_temperature', 50.0))
+
+def tables_version(optimizer) -> str:
+    """Version directory name for the object definitions and scoring config of an optimizer."""
+    scoring = {
+        'furniture_preferences': optimizer.config['furniture_preferences'],
+        'feng_shui_penalties': optimizer.config['feng_shui_penalties'],
+        'proposal_temperature': _proposal_temperature(optimizer)
+    }
+    digest = hashlib.sha256()
+    digest.update(f"{TABLES_FORMAT}\n{objects_config_hash()}\n".encode())
+    digest.update(json.dumps(scoring, sort_keys=True).encode())
+    return digest.hexdigest()[:16]
+
+def grid_tables_path(root: str, optimizer) -> str:
+    return os.path.join(root, tables_version(optimizer), f"{optimizer.grid_width}x{optimizer.grid_height}")
+
+def compute_grid_tables(optimizer) -> Dict[str, Dict[str, np.ndarray]]:
+    """
+    Compute (or fetch from the caches) every table of the optimizer's grid.
+
+    Returns:
+        type name -> table name -> array, plus '' -> {'bagua_zones': raster}
+    """
+    grid_width, grid_height = optimizer.grid_width, optimizer.grid_height
+    sampler = PositionSampler(optimizer, _proposal_temperature(optimizer))
+    tables = {'': {'bagua_zones': bagua_zone_raster(grid_width, grid_height)}}
+    for type_id, name in enumerate(TYPE_NAMES):
+        if not TYPE_IS_KNOWN[type_id]:
+            continue
+        tables[name] = {
+            'mask': placement_mask(type_id, grid_width, grid_height),
+            'position': position_scores(optimizer, type_id)
+        }
+        distribution = sampler.distribution(type_id)
+        if distribution is not None:
+            tables[name]['anchors'], tables[name]['cumulative'] = distribution
+    return tables
+
+def write_grid_tables(root: str, optimizer) -> str:
+    """
+    Write the tables of the optimizer's grid under root, replacing any
+    previous copy in one rename. Returns the grid's table directory.
+    """
+    path = grid_tables_path(root, optimizer)
+    temporary = f"{path}.tmp-{os.getpid()}"
+    shutil.rmtree(temporary, ignore_errors=True)
+    os.makedirs(temporary)
+
+    tables = compute_grid_tables(optimizer)
+    np.save(os.path.join(temporary, 'bagua_zones.npy'), tables.pop('')['bagua_zones'])
+    for name, type_tables in tables.items():
+        for table, values in type_tables.items():
+            np.save(os.path.join(temporary, f"{name}.{table}.npy"), np.asarray(values))
+    with open(os.path.join(temporary, 'tables.json'), 'w') as f:
+        json.dump({'format': TABLES_FORMAT, 'grid': [optimizer.grid_width, optimizer.grid_height],
+                   'proposal_temperature': _proposal_temperature(optimizer),
+                   'types': {name: sorted(type_tables) for name, type_tables in tables.items()}}, f, indent=2)
+
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(temporary, path)
+    return path
+
+def pin_grid_tables(optimizer, tables: Dict[str, Dict[str, np.ndarray]], temperature: Optional[float] = None):
+    """
+    Keep the tables of the optimizer's grid (laid out as compute_grid_tables()
+    returns them) in the heatmap and proposals caches for the life of the
+    process, so requests for other grid sizes never evict them.
+    """
+    grid_width, grid_height = optimizer.grid_width, optimizer.grid_height
+    temperature = _proposal_temperature(optimizer) if temperature is None else temperature
+    heatmap._BAGUA_ZONE_CACHE.pin((grid_width, grid_height), tables['']['bagua_zones'])
+    for name, type_tables in tables.items():
+        type_id = TYPE_IDS.get(name)
+        if type_id is None or not TYPE_IS_KNOWN[type_id]:
+            # Written for an object config this process does not have
+            continue
+        scoring_key = position_scoring_key(optimizer, type_id)
+        heatmap._MASK_CACHE.pin((grid_width, grid_height, type_id), type_tables['mask'])
+        heatmap._POSITION_CACHE.pin((grid_width, grid_height, type_id, scoring_key), type_tables['position'])
+        distribution = None
+        if 'anchors' in type_tables:
+            distribution = (type_tables['anchors'], type_tables['cumulative'])
+        proposals._DISTRIBUTION_CACHE.pin((grid_width, grid_height, type_id, temperature, scoring_key), distribution)
+
+def load_grid_tables(root: str, optimizer) -> bool:
+    """
+    Map the tables of the optimizer's grid from root into the heatmap and
+    proposals caches (see pin_grid_tables). Returns False (leaving the caches
+    alone) when no tables exist for this grid, object definitions and
+    scoring config.
+    """
+    path = grid_tables_path(root, optimizer)
+    try:
+        with open(os.path.join(path, 'tables.json')) as f:
+            index = json.load(f)
+    except FileNotFoundError:
+        return False
+
+    def mapped(name: str) -> np.ndarray:
+        return np.load(os.path.join(path, f"{name}.npy"), mmap_mode='r')
+
+    tables = {'': {'bagua_zones': mapped('bagua_zones')}}
+    for name, table_names in index['types'].items():
+        tables[name] = {table: mapped(f"{name}.{table}") for table in table_names}
+    pin_grid_tables(optimizer, tables, float(index['proposal_temperature']))
+    return True
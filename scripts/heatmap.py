@@ -0,0 +1,244 @@
+"""
+Score heatmaps: the score of an object at every anchor position of the grid.
+
+Two kinds of raster, both (grid_height, grid_width) arrays indexed [y, x]
+with NaN where the object cannot be placed:
+
+* position_scores() keeps only the terms that depend on the object's own
+  position (bagua zone, wall distance and corner bonuses for furniture, the
+  wall bonus of doors and windows), so it needs no other objects.
+* layout_scores() is the full layout score with the object at each anchor
+  and the other objects fixed, computed in chunks with BatchScorer.
+
+downsample() reduces a raster to blocks of step x step anchors, keeping the
+best score of each block.
+
+Placement masks, position rasters and bagua zone rasters depend only on
+the grid size, the type and the scoring config, so they are memoised per
+process, up to CACHE_BYTES each (least recently used first out).
+grid_tables.py pins memory-mapped tables into these caches.
+"""
+
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from batch_scoring import BatchScorer
+from layout import (
+    Layout,
+    intern_type,
+    TYPE_NAMES,
+    TYPE_DIMENSIONS,
+    TYPE_SPANS,
+    TYPE_IS_BOUNDARY,
+    TYPE_IS_KNOWN,
+    TYPE_BAGUA_PREFERENCES,
+    BED,
+    FURNITURE_IDS,
+    WALL_OPENING_IDS
+)
+from raster_cache import MISSING, RasterCache
+
+# Anchors scored per BatchScorer call in layout_scores()
+CHUNK_SIZE = 8192
+
+HEATMAP_TERMS = ('layout', 'position')
+
+# Bagua zone names, indexed by the values of bagua_zone_raster()
+BAGUA_ZONE_NAMES = ('career', 'knowledge', 'family',
+                    'helpful_people', 'health', 'wealth',
+                    'children', 'relationships', 'fame')
+
+# Array bytes each cache keeps for grid sizes without pinned tables
+CACHE_BYTES = 32 * 2 ** 20
+
+# (grid_width, grid_height, type_id) -> placement mask
+_MASK_CACHE = RasterCache(CACHE_BYTES)
+# (grid_width, grid_height, type_id, scoring key) -> position raster
+_POSITION_CACHE = RasterCache(CACHE_BYTES)
+# (grid_width, grid_height) -> bagua zone raster
+_BAGUA_ZONE_CACHE = RasterCache(CACHE_BYTES)
+
+def _anchor_grid(grid_width: int, grid_height: int):
+    """(grid_height, grid_width) arrays of the x and y of every anchor."""
+    ys, xs = np.mgrid[0:grid_height, 0:grid_width]
+    return xs, ys
+
+def _compute_placement_mask(type_id: int, grid_width: int, grid_height: int) -> np.ndarray:
+    xs, ys = _anchor_grid(grid_width, grid_height)
+    if not TYPE_IS_KNOWN[type_id]:
+        return np.zeros(xs.shape, dtype=bool)
+    if TYPE_IS_BOUNDARY[type_id]:
+        span = TYPE_SPANS[type_id]
+        vertical_wall = (xs == 0) | (xs == grid_width - 1)
+        horizontal_wall = (ys == 0) | (ys == grid_height - 1)
+        return np.where(vertical_wall, ys + span <= grid_height,
+                        horizontal_wall & (xs + span <= grid_width))
+    width, height = TYPE_DIMENSIONS[type_id]
+    return (xs + width <= grid_width) & (ys + height <= grid_height)
+
+def placement_mask(type_id: int, grid_width: int, grid_height: int) -> np.ndarray:
+    """Anchors satisfying the type's placement rule (validity.satisfies_placement_rule); a fresh array."""
+    key = (grid_width, grid_height, type_id)
+    mask = _MASK_CACHE.get(key)
+    if mask is MISSING:
+        mask = _compute_placement_mask(type_id, grid_width, grid_height)
+        _MASK_CACHE.put(key, mask)
+    return np.array(mask)
+
+def bagua_zone_raster(grid_width: int, grid_height: int) -> np.ndarray:
+    """
+    (grid_height, grid_width) read-only raster of the bagua zone index of
+    every cell (see BAGUA_ZONE_NAMES), as FengShuiOptimizer maps cells.
+    """
+    key = (grid_width, grid_height)
+    zones = _BAGUA_ZONE_CACHE.get(key)
+    if zones is MISSING:
+        xs, ys = _anchor_grid(grid_width, grid_height)
+        zone_x = np.minimum(xs // max(1, grid_width // 3), 2)
+        zone_y = np.minimum(ys // max(1, grid_height // 3), 2)
+        zones = (zone_y * 3 + zone_x).astype(np.uint8)
+        zones.flags.writeable = False
+        _BAGUA_ZONE_CACHE.put(key, zones)
+    return zones
+
+def position_scoring_key(optimizer, type_id: int) -> Tuple:
+    """The config values position_scores() depends on."""
+    return (optimizer._type_weight(type_id),
+            tuple(sorted(optimizer.config['feng_shui_penalties'].items())))
+
+def position_scores(optimizer, type_id: int) -> np.ndarray:
+    """Position-only score terms of one object of a type at every anchor (read-only)."""
+    key = (optimizer.grid_width, optimizer.grid_height, type_id, position_scoring_key(optimizer, type_id))
+    raster = _POSITION_CACHE.get(key)
+    if raster is MISSING:
+        raster = _compute_position_scores(optimizer, type_id)
+        raster.flags.writeable = False
+        _POSITION_CACHE.put(key, raster)
+    return raster
+
+def _compute_position_scores(optimizer, type_id: int) -> np.ndarray:
+    grid_width, grid_height = optimizer.grid_width, optimizer.grid_height
+    penalties = optimizer.config['feng_shui_penalties']
+    xs, ys = _anchor_grid(grid_width, grid_height)
+    width, height = TYPE_DIMENSIONS[type_id]
+
+    # Bagua zone of the object's center, weighted like _calculate_layout_score
+    zone_x = np.clip(((xs + width / 2) / grid_width * 3).astype(np.int64), 0, 2)
+    zone_y = np.clip(((ys + height / 2) / grid_height * 3).astype(np.int64), 0, 2)
+    preferences = np.asarray(TYPE_BAGUA_PREFERENCES[type_id], dtype=np.float64)
+    scores = preferences[zone_y * 3 + zone_x] * 8.0 * optimizer._type_weight(type_id)
+
+    if type_id in FURNITURE_IDS:
+        # Wall distance bonuses and penalties of _calculate_feng_shui_penalties
+        left, right = xs, grid_width - (xs + width)
+        top, bottom = ys, grid_height - (ys + height)
+        min_distance = np.minimum(np.minimum(left, right), np.minimum(top, bottom))
+        in_corner = ((left == 0) | (right == 0)) & ((top == 0) | (bottom == 0))
+        against_wall = penalties['wall_placement_bonus'] + np.where(
+            in_corner, penalties['corner_placement_bonus'] - (75.0 if type_id == BED else 0.0), 0.0)
+        scores = scores + np.where(min_distance == 0, against_wall,
+                          np.where(min_distance > 6, -penalties['furniture_floating'],
+                          np.where(min_distance > 3, -100.0,
+                          np.where(min_distance > 1, -50.0, 0.0))))
+    elif type_id in WALL_OPENING_IDS:
+        on_wall = (xs == 0) | (xs == grid_width - 1) | (ys == 0) | (ys == grid_height - 1)
+        scores = scores + np.where(on_wall, 15.0, 0.0)
+
+    return np.where(placement_mask(type_id, grid_width, grid_height), scores, np.nan)
+
+def layout_scores(optimizer, obj_type: str, others: Layout) -> np.ndarray:
+    """
+    Full layout score with one object of obj_type at every anchor.
+
+    If `others` already holds objects of this type, the last of them (the
+    one the scorer uses) is the object being moved; otherwise the object is
+    added. Anchors where it breaks its placement rule or overlaps another
+    object are NaN.
+    """
+    grid_width, grid_height = optimizer.grid_width, optimizer.grid_height
+    type_id = intern_type(obj_type)
+    types, fixed_xs, fixed_ys = list(others.types), list(others.xs), list(others.ys)
+    if type_id in types:
+        index = len(types) - 1 - types[::-1].index(type_id)
+        del types[index], fixed_xs[index], fixed_ys[index]
+
+    scorer = BatchScorer(optimizer, [TYPE_NAMES[t] for t in types] + [obj_type])
+    moving = np.array([scorer.num_objects - 1])
+    solid_others = np.array([index for index, t in enumerate(types) if not TYPE_IS_BOUNDARY[t]],
+                            dtype=np.int64)
+
+    valid = placement_mask(type_id, grid_width, grid_height).ravel()
+    anchor_xs, anchor_ys = (axis.ravel() for axis in _anchor_grid(grid_width, grid_height))
+    anchors = np.flatnonzero(valid)
+    raster = np.full(grid_width * grid_height, np.nan)
+
+    for start in range(0, len(anchors), CHUNK_SIZE):
+        chunk = anchors[start:start + CHUNK_SIZE]
+        xs = np.empty((len(chunk), scorer.num_objects), dtype=np.int64)
+        ys = np.empty_like(xs)
+        xs[:, :-1], ys[:, :-1] = fixed_xs, fixed_ys
+        xs[:, -1], ys[:, -1] = anchor_xs[chunk], anchor_ys[chunk]
+
+        scores = scorer.score(xs, ys)
+        if len(solid_others) and not TYPE_IS_BOUNDARY[type_id]:
+            overlapping = scorer._overlaps(xs, ys, np.repeat(moving, len(solid_others)), solid_others)
+            scores = np.where(overlapping.any(axis=1), np.nan, scores)
+        raster[chunk] = scores
+
+    return raster.reshape(grid_height, grid_width)
+
+def downsample(raster: np.ndarray, step: int) -> np.ndarray:
+    """Best score of each step x step block of anchors (NaN if none is valid)."""
+    if step <= 1:
+        return raster
+    height, width = raster.shape
+    rows, cols = -(-height // step), -(-width // step)
+    padded = np.full((rows * step, cols * step), -np.inf)
+    padded[:height, :width] = np.where(np.isnan(raster), -np.inf, raster)
+    blocks = padded.reshape(rows, step, cols, step).max(axis=(1, 3))
+    return np.where(np.isneginf(blocks), np.nan, blocks)
+
+def best_anchor(raster: np.ndarray) -> Optional[Dict]:
+    """Anchor with the highest score, or None if no anchor is valid."""
+    if np.isnan(raster).all():
+        return None
+    y, x = np.unravel_index(np.nanargmax(raster), raster.shape)
+    return {'x': int(x), 'y': int(y), 'score': float(raster[y, x])}
+
+def heatmap_response(raster: np.ndarray, step: int) -> Dict:
+    """JSON-ready heatmap of one type: downsampled rows of scores, null where invalid."""
+    values = downsample(raster, step)
+    rounded = np.round(values, 2).astype(object)
+    rounded[np.isnan(values)] = None
+    return {
+        'rows': values.shape[0],
+        'cols': values.shape[1],
+        'values': rounded.tolist(),
+        'best': best_anchor(raster)
+    }
+
+def compute_heatmaps(optimizer, object_types: List[str], others: Layout, step: int = 1,
+                     terms: str = 'layout') -> Dict[str, Dict]:
+    """
+    Heatmap of each object type.
+
+    Args:
+        optimizer: FengShuiOptimizer providing the grid size and config
+        object_types: Types to compute a heatmap for
+        others: The objects already placed
+        step: Side of the blocks of anchors merged into one heatmap cell
+        terms: 'layout' for the full score given `others`, 'position' for
+            the position-only terms (ignores `others`)
+    """
+    if terms not in HEATMAP_TERMS:
+        raise ValueError(f"Unknown heatmap terms: {terms}. Available: {list(HEATMAP_TERMS)}")
+    if step < 1:
+        raise ValueError("Heatmap step must be at least 1")
+
+    heatmaps = {}
+    for obj_type in object_types:
+        if terms == 'position':
+            raster = position_scores(optimizer, intern_type(obj_type))
+        else:
+            raster = layout_scores(optimizer, obj_type, others)
+        heatmaps[obj_type] = heatmap_response(raster, step)
+    return heatmaps
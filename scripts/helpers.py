@@ -2,11 +2,12 @@ import json
 import os
 import random
 
+OBJECT_CONFIG_PATH = os.path.join(os.path.dirname(__file__), '..', 'config', 'objects.json')
+
 # Load object configurations from JSON file
 def load_object_config():
-    config_path = os.path.join(os.path.dirname(__file__), '..', 'config', 'objects.json')
     try:
-        with open(config_path, 'r') as f:
+        with open(OBJECT_CONFIG_PATH, 'r') as f:
             config = json.load(f)
         return config
     except FileNotFoundError:
@@ -27,6 +28,15 @@ OBJECT_CONFIG = load_object_config()
 OBJECT_DIMENSIONS = OBJECT_CONFIG["objects"]
 GRID_CELL_SIZE = OBJECT_CONFIG["grid_cell_size"]
 
+# Bagua zone preferences for different objects, indexed by zone_y * 3 + zone_x
+BAGUA_PREFERENCES = {
+    'bed': [8, 7, 6, 5, 4, 3, 2, 1, 0],  # Prefer back zones
+    'desk': [6, 7, 8, 3, 4, 5, 0, 1, 2],  # Prefer front zones
+    'door': [6, 3, 0, 7, 4, 1, 8, 5, 2],  # Prefer left zones
+    'window': [2, 5, 8, 1, 4, 7, 0, 3, 6],  # Prefer right zones
+}
+DEFAULT_BAGUA_PREFERENCE = [4, 4, 4, 4, 4, 4, 4, 4, 4]
+
 def is_boundary(obj_type):
     """Check if object is a boundary (door/window)"""
     return obj_type in OBJECT_DIMENSIONS and OBJECT_DIMENSIONS[obj_type]["type"] == "boundary"
@@ -0,0 +1,189 @@
+"""
+Compact internal layout representation.
+
+Object types are interned to small integer ids with per-id lookup tables
+(grid dimensions, boundary flag, bagua preferences). The configured objects
+are registered at import; other type names get their own id on first use,
+so responses keep the client's names, until MAX_TYPES ids exist. Names
+after that share the UNKNOWN id.
+
+A Layout keeps parallel lists of type ids and anchor coordinates. Copies
+share their coordinate lists until one of them is written to
+(copy-on-write), so the search loops can copy freely. Placement dicts
+({'type', 'x', 'y'}) only appear at the HTTP boundary via
+from_placements() / to_placements().
+"""
+
+import threading
+from typing import List, Dict, Tuple, Union
+from helpers import (
+    is_boundary,
+    get_boundary_span,
+    get_object_grid_dimensions,
+    OBJECT_DIMENSIONS,
+    BAGUA_PREFERENCES,
+    DEFAULT_BAGUA_PREFERENCE
+)
+
+# Interned type tables, indexed by type id
+TYPE_NAMES: List[str] = []
+TYPE_IDS: Dict[str, int] = {}
+TYPE_DIMENSIONS: List[Tuple[int, int]] = []
+TYPE_SPANS: List[int] = []
+TYPE_IS_BOUNDARY: List[bool] = []
+TYPE_IS_KNOWN: List[bool] = []
+TYPE_BAGUA_PREFERENCES: List[List[int]] = []
+_REGISTRY_LOCK = threading.Lock()
+
+# Type names missing from the object config share this id once the tables
+# are full, so client-supplied names cannot grow them without bound (unknown
+# types all score and place alike anyway)
+UNKNOWN_TYPE_NAME = 'unknown'
+
+# Most type ids a process hands out, configured types included
+MAX_TYPES = 1024
+
+def register_type(obj_type: str) -> int:
+    """Add an object type to the tables and return its id (UNKNOWN once they are full)."""
+    with _REGISTRY_LOCK:
+        type_id = TYPE_IDS.get(obj_type)
+        if type_id is None:
+            if len(TYPE_NAMES) >= MAX_TYPES:
+                return TYPE_IDS[UNKNOWN_TYPE_NAME]
+            type_id = len(TYPE_NAMES)
+            TYPE_DIMENSIONS.append(get_object_grid_dimensions(obj_type))
+            TYPE_SPANS.append(get_boundary_span(obj_type))
+            TYPE_IS_BOUNDARY.append(is_boundary(obj_type))
+            TYPE_IS_KNOWN.append(obj_type in OBJECT_DIMENSIONS)
+            TYPE_BAGUA_PREFERENCES.append(BAGUA_PREFERENCES.get(obj_type, DEFAULT_BAGUA_PREFERENCE))
+            TYPE_NAMES.append(obj_type)
+            TYPE_IDS[obj_type] = type_id
+        return type_id
+
+for _obj_type in OBJECT_DIMENSIONS:
+    register_type(_obj_type)
+
+UNKNOWN = register_type(UNKNOWN_TYPE_NAME)
+
+def intern_type(obj_type: str) -> int:
+    """Return the id of an object type, registering new names while there is room."""
+    type_id = TYPE_IDS.get(obj_type)
+    return type_id if type_id is not None else register_type(obj_type)
+
+BED = intern_type('bed')
+DESK = intern_type('desk')
+DOOR = intern_type('door')
+WINDOW = intern_type('window')
+
+# Types the scoring rules treat as furniture / wall openings
+FURNITURE_IDS = frozenset((BED, DESK))
+WALL_OPENING_IDS = frozenset((DOOR, WINDOW))
+
+class Layout:
+    """
+    Object type ids plus parallel x / y anchor lists.
+    """
+
+    __slots__ = ('types', 'xs', 'ys', '_shared')
+
+    def __init__(self, types: Tuple[int, ...], xs: List[int], ys: List[int]):
+        self.types = tuple(types)
+        self.xs = xs
+        self.ys = ys
+        self._shared = False
+
+    @classmethod
+    def from_placements(cls, placements: List[Dict]) -> 'Layout':
+        """Build a layout from JSON placement dicts."""
+        return cls(tuple(intern_type(p['type']) for p in placements),
+                   [int(p['x']) for p in placements],
+                   [int(p['y']) for p in placements])
+
+    def to_placements(self) -> List[Dict]:
+        """Convert back to JSON placement dicts."""
+        return [{'type': TYPE_NAMES[t], 'x': x, 'y': y}
+                for t, x, y in zip(self.types, self.xs, self.ys)]
+
+    def to_columns(self) -> Dict:
+        """
+        Columnar form for the compact wire format: a table of the type names
+        used, and parallel arrays of indices into it and coordinates.
+        """
+        table: Dict[int, int] = {}
+        indices = [table.setdefault(t, len(table)) for t in self.types]
+        return {'types': [TYPE_NAMES[t] for t in table], 'type': indices,
+                'x': list(self.xs), 'y': list(self.ys)}
+
+    @classmethod
+    def from_columns(cls, columns: Dict) -> 'Layout':
+        """Inverse of to_columns()."""
+        type_ids = [intern_type(name) for name in columns['types']]
+        indices, xs, ys = columns['type'], columns['x'], columns['y']
+        if not len(indices) == len(xs) == len(ys):
+            raise ValueError("Columnar placements need 'type', 'x' and 'y' arrays of the same length")
+        return cls(tuple(type_ids[index] for index in indices),
+                   [int(x) for x in xs], [int(y) for y in ys])
+
+    def __reduce__(self):
+        # Pickle by type name, so ids never have to agree between processes
+        return (Layout.from_placements, (self.to_placements(),))
+
+    def __len__(self) -> int:
+        return len(self.types)
+
+    def __repr__(self) -> str:
+        return f"Layout({self.to_placements()})"
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, Layout):
+            return NotImplemented
+        return self.types == other.types and self.xs == other.xs and self.ys == other.ys
+
+    def key(self) -> Tuple:
+        """Hashable snapshot of the layout."""
+        return (self.types, tuple(self.xs), tuple(self.ys))
+
+    def type_name(self, index: int) -> str:
+        return TYPE_NAMES[self.types[index]]
+
+    def type_names(self) -> List[str]:
+        return [TYPE_NAMES[t] for t in self.types]
+
+    def copy(self) -> 'Layout':
+        """Cheap copy; coordinates are duplicated only when either side writes."""
+        clone = Layout.__new__(Layout)
+        clone.types = self.types
+        clone.xs = self.xs
+        clone.ys = self.ys
+        clone._shared = True
+        self._shared = True
+        return clone
+
+    def _own(self):
+        if self._shared:
+            self.xs = self.xs[:]
+            self.ys = self.ys[:]
+            self._shared = False
+
+    def move(self, index: int, x: int, y: int):
+        """Move one object in place."""
+        self._own()
+        self.xs[index] = x
+        self.ys[index] = y
+
+    def append(self, type_id: int, x: int, y: int):
+        """Add an object in place."""
+        self._own()
+        self.types = self.types + (type_id,)
+        self.xs.append(x)
+        self.ys.append(y)
+
+    def prefix(self, count: int) -> 'Layout':
+        """Layout of the first `count` objects."""
+        return Layout(self.types[:count], self.xs[:count], self.ys[:count])
+
+def as_layout(placements: Union['Layout', List[Dict]]) -> Layout:
+    """Accept either a Layout or a list of placement dicts."""
+    if isinstance(placements, Layout):
+        return placements
+    return Layout.from_placements(placements)
@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""
+Load-test the scoring endpoints with concurrent clients.
+
+Each of --concurrency client threads sends requests back to back, drawing
+the endpoint from --mix and the grid size from --grid. The app is driven
+in-process through Flask's test client by default, or over HTTP with
+--url (e.g. a run_server.py instance on localhost). Throughput, latency
+percentiles and error rates per endpoint go to the console and, with
+--out, to a JSON file; --compare prints the change against an earlier one.
+
+    python load_test.py --concurrency 8 --duration 30 --out results/baseline.json
+    python load_test.py --url http://localhost:5000 --mix live=10,optimize=1 --grid 96x120
+    python load_test.py --requests 2000 --out results/new.json --compare results/baseline.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import threading
+import time
+import urllib.error
+import urllib.request
+from typing import Callable, Dict, List, Tuple
+import numpy as np
+from feng_shui_optimizer import FengShuiOptimizer
+from random_layouts import sample_random_layouts, layouts_to_placements
+from run_server import parse_grid_size
+
+# Random layouts per grid sent to the scoring endpoints
+LAYOUT_POOL_SIZE = 200
+
+PERCENTILES = (50, 95, 99)
+
+def _live_score(rng: random.Random, grid: Tuple[int, int], objects: List[str], pool: Dict, args) -> Dict:
+    return {'grid_width': grid[0], 'grid_height': grid[1], 'placements': rng.choice(pool[grid])}
+
+def _random_placer(rng: random.Random, grid: Tuple[int, int], objects: List[str], pool: Dict, args) -> Dict:
+    return {'grid_width': grid[0], 'grid_height': grid[1], 'objects_to_place': objects,
+            'seed': rng.getrandbits(32)}
+
+def _optimizer(rng: random.Random, grid: Tuple[int, int], objects: List[str], pool: Dict, args) -> Dict:
+    return {'grid_width': grid[0], 'grid_height': grid[1], 'objects_to_place': objects,
+            'algorithm': {'max_iterations': args.optimizer_iterations, 'time_budget': args.optimizer_budget},
+            'seed': rng.getrandbits(32)}
+
+def _heatmap(rng: random.Random, grid: Tuple[int, int], objects: List[str], pool: Dict, args) -> Dict:
+    placements = rng.choice(pool[grid])
+    return {'grid_width': grid[0], 'grid_height': grid[1], 'placements': placements[:-1],
+            'object_types': [placements[-1]['type']], 'step': 8}
+
+def _random_layouts(rng: random.Random, grid: Tuple[int, int], objects: List[str], pool: Dict, args) -> Dict:
+    return {'grid_width': grid[0], 'grid_height': grid[1], 'objects_to_place': objects,
+            'count': 1000, 'summary_only': True, 'seed': rng.getrandbits(32)}
+
+# Scenario name -> (endpoint, payload builder)
+SCENARIOS: Dict[str, Tuple[str, Callable]] = {
+    'live': ('/calculate-live-score', _live_score),
+    'random': ('/random-auto-placer', _random_placer),
+    'optimize': ('/feng-shui-optimizer', _optimizer),
+    'heatmap': ('/heatmap', _heatmap),
+    'random_layouts': ('/random-layouts', _random_layouts),
+}
+
+def parse_mix(value: str) -> Dict[str, float]:
+    """Parse a name=weight,... request mix."""
+    mix = {}
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in SCENARIOS:
+            raise argparse.ArgumentTypeError(f"Unknown scenario {name!r}. Available: {sorted(SCENARIOS)}")
+        try:
+            mix[name] = float(weight) if weight else 1.0
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"Weight of {name} must be a number, got {weight!r}")
+        if mix[name] < 0:
+            raise argparse.ArgumentTypeError(f"Weight of {name} must not be negative")
+    if not any(mix.values()):
+        raise argparse.ArgumentTypeError("The mix needs at least one positive weight")
+    return mix
+
+def layout_pool(grids: List[Tuple[int, int]], objects: List[str], seed: int) -> Dict:
+    """Random valid placements per grid for the endpoints that score a given layout."""
+    pool = {}
+    for grid in grids:
+        with contextlib.redirect_stdout(io.StringIO()):
+            optimizer = FengShuiOptimizer(*grid)
+            scorer, xs, ys, _ = sample_random_layouts(optimizer, objects, LAYOUT_POOL_SIZE,
+                                                      np.random.default_rng(seed))
+        if not len(xs):
+            raise ValueError(f"{objects} do not fit on a {grid[0]}x{grid[1]} grid")
+        pool[grid] = layouts_to_placements(scorer, xs, ys)
+    return pool
+
+class InProcessClient:
+    """Posts to the Flask app through one test client per thread."""
+
+    def __init__(self):
+        from app import app
+        self.app = app
+        self.local = threading.local()
+
+    def post(self, path: str, payload: Dict) -> int:
+        client = getattr(self.local, 'client', None)
+        if client is None:
+            client = self.local.client = self.app.test_client()
+        return client.post(path, json=payload).status_code
+
+class HttpClient:
+    """Posts JSON to a running server."""
+
+    def __init__(self, url: str, timeout: float):
+        self.url = url.rstrip('/')
+        self.timeout = timeout
+
+    def post(self, path: str, payload: Dict) -> int:
+        request = urllib.request.Request(self.url + path, data=json.dumps(payload).encode(),
+                                         headers={'Content-Type': 'application/json'})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as e:
+            e.read()
+            return e.code
+
+def run_load(client, args, pool: Dict) -> Tuple[List[Tuple[str, float, int]], float]:
+    """
+    Drive the clients until the request count or duration is reached.
+
+    Returns:
+        (scenario, seconds, status) per request, status 0 for a failed
+        connection, and the wall time of the run
+    """
+    names = list(args.mix)
+    weights = [args.mix[name] for name in names]
+    results: List[Tuple[str, float, int]] = []
+    lock = threading.Lock()
+    issued = [0]
+    start = time.perf_counter()
+    deadline = start + args.duration if args.duration else None
+
+    def worker(index: int):
+        rng = random.Random(args.seed * 1000 + index)
+        while True:
+            with lock:
+                if args.requests and issued[0] >= args.requests:
+                    return
+                issued[0] += 1
+            if deadline is not None and time.perf_counter() >= deadline:
+                return
+            name = rng.choices(names, weights)[0]
+            path, build = SCENARIOS[name]
+            payload = build(rng, rng.choice(args.grid), args.objects, pool, args)
+            sent = time.perf_counter()
+            try:
+                status = client.post(path, payload)
+            except Exception:
+                status = 0
+            elapsed = time.perf_counter() - sent
+            with lock:
+                results.append((name, elapsed, status))
+
+    threads = [threading.Thread(target=worker, args=(index,), daemon=True) for index in range(args.concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, time.perf_counter() - start
+
+def summarize(results: List[Tuple[str, float, int]], wall_time: float) -> Dict:
+    """Throughput, latency percentiles (ms) and error rate of a set of requests."""
+    if not results:
+        return {'requests': 0}
+    latencies = np.array([seconds for _, seconds, _ in results]) * 1000
+    statuses: Dict[str, int] = {}
+    for _, _, status in results:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    errors = sum(count for status, count in statuses.items() if int(status) == 0 or int(status) >= 400)
+    return {
+        'requests': len(results),
+        'throughput_rps': len(results) / wall_time if wall_time > 0 else 0.0,
+        'error_rate': errors / len(results),
+        'status_counts': statuses,
+        'latency_ms': {
+            'mean': float(latencies.mean()),
+            **{f"p{p}": float(v) for p, v in zip(PERCENTILES, np.percentile(latencies, PERCENTILES))},
+            'max': float(latencies.max())
+        }
+    }
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return ''
+
+def print_report(report: Dict, baseline: Dict = None):
+    print(f"\n{'endpoint':<16}{'requests':>10}{'rps':>10}{'errors':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    rows = [*report['endpoints'].items(), ('overall', report['overall'])]
+    for name, stats in rows:
+        if not stats['requests']:
+            continue
+        latency = stats['latency_ms']
+        print(f"{name:<16}{stats['requests']:>10}{stats['throughput_rps']:>10.1f}{stats['error_rate']:>9.1%}"
+              f"{latency['p50']:>10.1f}{latency['p95']:>10.1f}{latency['p99']:>10.1f}")
+        old = baseline and (baseline['overall'] if name == 'overall' else baseline['endpoints'].get(name))
+        if old and old.get('requests'):
+            changes = [('rps', stats['throughput_rps'], old['throughput_rps'])]
+            changes += [(key, latency[key], old['latency_ms'][key]) for key in ('p50', 'p95', 'p99')]
+            print(f"{'':<16}vs {baseline['meta']['revision'] or 'baseline'}: " + ', '.join(
+                f"{key} {(new - before) / before:+.1%}" for key, new, before in changes if before))
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the Feng Shui scoring endpoints")
+    parser.add_argument('--url', default=None, help="Server to load over HTTP (default: drive the app in-process)")
+    parser.add_argument('--concurrency', type=int, default=4, help="Concurrent client threads")
+    parser.add_argument('--requests', type=int, default=0, help="Total requests (0: run for --duration)")
+    parser.add_argument('--duration', type=float, default=10.0, help="Seconds to run when --requests is 0")
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix('live=8,random=3,optimize=1'),
+                        help=f"Weighted request mix name=weight,... of {sorted(SCENARIOS)}")
+    parser.add_argument('--grid', type=parse_grid_size, action='append', default=None, metavar='WxH')
+    parser.add_argument('--objects', nargs='+', default=['bed', 'desk', 'door', 'window'])
+    parser.add_argument('--optimizer-iterations', type=int, default=100)
+    parser.add_argument('--optimizer-budget', type=float, default=5.0, help="time_budget of optimizer requests")
+    parser.add_argument('--timeout', type=float, default=60.0, help="HTTP request timeout in seconds")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', default=None, help="JSON file to write the results to")
+    parser.add_argument('--compare', default=None, help="Earlier results file to compare against")
+    args = parser.parse_args()
+
+    if args.concurrency < 1:
+        parser.error("--concurrency must be at least 1")
+    if args.requests < 0 or (not args.requests and args.duration <= 0):
+        parser.error("Give a positive --requests or --duration")
+    args.grid = args.grid or [(144, 144)]
+    args.duration = None if args.requests else args.duration
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    try:
+        pool = layout_pool(args.grid, args.objects, args.seed)
+    except ValueError as e:
+        parser.error(str(e))
+    client = HttpClient(args.url, args.timeout) if args.url else InProcessClient()
+
+    target = args.url or 'in-process'
+    print(f"Loading {target} with {args.concurrency} clients, mix {args.mix}, grids {args.grid}")
+    # The in-process app logs every request to stdout; keep the report readable
+    with open(os.devnull, 'w') as devnull:
+        with contextlib.redirect_stdout(devnull) if not args.url else contextlib.nullcontext():
+            results, wall_time = run_load(client, args, pool)
+
+    report = {
+        'meta': {
+            'target': target,
+            'revision': git_revision(),
+            'started': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'python': platform.python_version(),
+            'cpus': os.cpu_count(),
+            'concurrency': args.concurrency,
+            'mix': args.mix,
+            'grids': [list(grid) for grid in args.grid],
+            'objects': args.objects,
+            'wall_time': wall_time
+        },
+        'overall': summarize(results, wall_time),
+        'endpoints': {name: summarize([r for r in results if r[0] == name], wall_time) for name in args.mix}
+    }
+    print_report(report, baseline)
+    if args.out:
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nWrote {args.out}")
+
+if __name__ == '__main__':
+    main()
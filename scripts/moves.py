@@ -0,0 +1,205 @@
+"""
+Move operators for the single-chain search strategies.
+
+Each operator proposes new positions for one or two objects of a layout,
+built to respect the placement rules up front: doors and windows stay on a
+wall, furniture stays inside the grid. The proposal is then checked for
+collisions by a validity.ValidityTracker, which looks only at the
+neighbourhood of the moved objects.
+
+MoveSelector picks operators by probability matching: an operator's chance
+follows the recent rate at which its proposals improved the current score,
+with a floor so that no operator is starved.
+"""
+
+import random
+from typing import Callable, Dict, List, Optional, Tuple
+from layout import Layout, TYPE_DIMENSIONS, TYPE_IS_BOUNDARY, TYPE_IS_KNOWN, TYPE_SPANS
+
+# A proposal: [(index, new_x, new_y), ...], or None when the operator does not apply
+Proposal = Optional[List[Tuple[int, int, int]]]
+
+MOVE_OPERATORS: Dict[str, Callable] = {}
+
+def register_move(name: str):
+    """Decorator adding a move operator to the library under `name`."""
+    def decorator(operator):
+        MOVE_OPERATORS[name] = operator
+        return operator
+    return decorator
+
+def _objects(layout: Layout, boundary: bool) -> List[int]:
+    return [index for index, type_id in enumerate(layout.types)
+            if TYPE_IS_KNOWN[type_id] and TYPE_IS_BOUNDARY[type_id] == boundary]
+
+def random_wall_position(optimizer, type_id: int) -> Tuple[int, int]:
+    """Random position on a random wall where a door/window of this type fits."""
+    span = TYPE_SPANS[type_id]
+    grid_width, grid_height = optimizer.grid_width, optimizer.grid_height
+    wall = optimizer.rng.randrange(4)
+    if wall < 2 and span <= grid_height:
+        return (0 if wall == 0 else grid_width - 1), optimizer.rng.randint(0, grid_height - span)
+    if span < grid_width:
+        return optimizer.rng.randint(1, grid_width - span), (0 if wall == 2 else grid_height - 1)
+    return 0, 0
+
+def random_feasible_position(optimizer, type_id: int) -> Optional[Tuple[int, int]]:
+    """Random position satisfying the placement rule of a known type, ignoring other objects."""
+    if not TYPE_IS_KNOWN[type_id]:
+        return None
+    if TYPE_IS_BOUNDARY[type_id]:
+        return random_wall_position(optimizer, type_id)
+    width, height = TYPE_DIMENSIONS[type_id]
+    if width > optimizer.grid_width or height > optimizer.grid_height:
+        return None
+    return (optimizer.rng.randint(0, optimizer.grid_width - width),
+            optimizer.rng.randint(0, optimizer.grid_height - height))
+
+@register_move('jitter')
+def jitter(optimizer, layout: Layout) -> Proposal:
+    """The original ±8 random step, for one piece of furniture."""
+    furniture = _objects(layout, boundary=False)
+    if not furniture:
+        return None
+    index = optimizer.rng.choice(furniture)
+    new_x, new_y = optimizer._mutate_placement(layout, index)
+    return [(index, new_x, new_y)]
+
+@register_move('slide_along_wall')
+def slide_along_wall(optimizer, layout: Layout) -> Proposal:
+    """Move a door or window along the wall it is on."""
+    boundaries = _objects(layout, boundary=True)
+    if not boundaries:
+        return None
+    index = optimizer.rng.choice(boundaries)
+    x, y = layout.xs[index], layout.ys[index]
+    span = TYPE_SPANS[layout.types[index]]
+    grid_width, grid_height = optimizer.grid_width, optimizer.grid_height
+    step = optimizer.rng.randint(-16, 16)
+
+    if x == 0 or x == grid_width - 1:
+        return [(index, x, max(0, min(grid_height - span, y + step)))]
+    if y == 0 or y == grid_height - 1:
+        # x = 0 would move the opening onto the vertical wall's rules
+        return [(index, max(1, min(grid_width - span, x + step)), y)]
+    return None
+
+@register_move('snap_to_wall')
+def snap_to_wall(optimizer, layout: Layout) -> Proposal:
+    """Push a piece of furniture flush against its nearest wall (or a random one)."""
+    furniture = _objects(layout, boundary=False)
+    if not furniture:
+        return None
+    index = optimizer.rng.choice(furniture)
+    x, y = layout.xs[index], layout.ys[index]
+    width, height = TYPE_DIMENSIONS[layout.types[index]]
+    max_x, max_y = optimizer.grid_width - width, optimizer.grid_height - height
+
+    # Walls it is not already touching, nearest first
+    walls = sorted((distance, target) for distance, target in
+                   ((x, (0, y)), (max_x - x, (max_x, y)), (y, (x, 0)), (max_y - y, (x, max_y)))
+                   if distance > 0)
+    if not walls:
+        return None
+    _, (new_x, new_y) = walls[0] if optimizer.rng.random() < 0.7 else optimizer.rng.choice(walls)
+    return [(index, new_x, new_y)]
+
+@register_move('move_to_corner')
+def move_to_corner(optimizer, layout: Layout) -> Proposal:
+    """Put a piece of furniture into a random corner of the room."""
+    furniture = _objects(layout, boundary=False)
+    if not furniture:
+        return None
+    index = optimizer.rng.choice(furniture)
+    width, height = TYPE_DIMENSIONS[layout.types[index]]
+    max_x, max_y = optimizer.grid_width - width, optimizer.grid_height - height
+    if max_x < 0 or max_y < 0:
+        return None
+    return [(index, optimizer.rng.choice((0, max_x)), optimizer.rng.choice((0, max_y)))]
+
+@register_move('swap')
+def swap(optimizer, layout: Layout) -> Proposal:
+    """Exchange the positions of two pieces of furniture, or of two openings."""
+    groups = [group for group in (_objects(layout, boundary=False), _objects(layout, boundary=True))
+              if len(group) >= 2]
+    if not groups:
+        return None
+    index1, index2 = optimizer.rng.sample(optimizer.rng.choice(groups), 2)
+    moves = []
+    for index, other in ((index1, index2), (index2, index1)):
+        x, y = layout.xs[other], layout.ys[other]
+        if not TYPE_IS_BOUNDARY[layout.types[index]]:
+            # Keep the anchor inside the grid when the sizes differ
+            width, height = TYPE_DIMENSIONS[layout.types[index]]
+            x = max(0, min(optimizer.grid_width - width, x))
+            y = max(0, min(optimizer.grid_height - height, y))
+        moves.append((index, x, y))
+    return moves
+
+@register_move('jump')
+def jump(optimizer, layout: Layout) -> Proposal:
+    """Teleport any object to a new position satisfying its placement rule (score-guided when enabled)."""
+    candidates = _objects(layout, boundary=False) + _objects(layout, boundary=True)
+    if not candidates:
+        return None
+    index = optimizer.rng.choice(candidates)
+    position = optimizer._sample_position(layout.types[index])
+    if position is None:
+        return None
+    return [(index, position[0], position[1])]
+
+class MoveSelector:
+    """
+    Adaptive choice between move operators, with per-operator statistics.
+    """
+
+    def __init__(self, operators: Optional[List[str]] = None, min_probability: float = 0.05,
+                 adaptation_rate: float = 0.1):
+        """
+        Args:
+            operators: Operator names to use (default: the whole library)
+            min_probability: Lower bound on each operator's selection probability
+            adaptation_rate: Weight of the latest outcome in an operator's success estimate
+        """
+        self.operators = list(operators or MOVE_OPERATORS)
+        unknown = [name for name in self.operators if name not in MOVE_OPERATORS]
+        if unknown:
+            raise ValueError(f"Unknown move operators: {unknown}. Available: {sorted(MOVE_OPERATORS)}")
+        self.min_probability = min(min_probability, 1.0 / len(self.operators))
+        self.adaptation_rate = adaptation_rate
+
+        self.quality = {name: 1.0 for name in self.operators}
+        self.stats = {name: {'proposals': 0, 'valid': 0, 'not_applicable': 0, 'improved': 0}
+                      for name in self.operators}
+
+    def probabilities(self) -> Dict[str, float]:
+        total = sum(self.quality.values())
+        free = 1.0 - self.min_probability * len(self.operators)
+        return {name: self.min_probability + free * (self.quality[name] / total if total > 0
+                                                      else 1.0 / len(self.operators))
+                for name in self.operators}
+
+    def choose(self, rng: random.Random) -> str:
+        probabilities = self.probabilities()
+        return rng.choices(self.operators, weights=[probabilities[name] for name in self.operators])[0]
+
+    def record_invalid(self, name: str, applicable: bool = True):
+        """An operator proposal that could not be used."""
+        stats = self.stats[name]
+        stats['proposals'] += 1
+        if not applicable:
+            stats['not_applicable'] += 1
+        self.quality[name] += self.adaptation_rate * (0.0 - self.quality[name])
+
+    def record_result(self, name: str, improved: bool):
+        """Outcome of a valid proposal once it has been scored."""
+        stats = self.stats[name]
+        stats['proposals'] += 1
+        stats['valid'] += 1
+        stats['improved'] += improved
+        self.quality[name] += self.adaptation_rate * (float(improved) - self.quality[name])
+
+    def to_dict(self) -> Dict:
+        probabilities = self.probabilities()
+        return {name: {**self.stats[name], 'probability': probabilities[name]}
+                for name in self.operators}
@@ -0,0 +1,267 @@
+"""
+Warm process pool serving optimizations for the whole server process.
+
+optimize_layout is pure-Python CPU work, so concurrent requests on the
+threaded server serialize on the GIL. With a pool configured (run_server.py
+--optimizer-workers N), /feng-shui-optimizer hands each search to one of N
+long-lived worker processes instead. Workers warm the preload grids when
+they start and keep their module caches (per-grid tables, loaded
+surrogates) from one request to the next.
+
+Back-pressure: at most workers + max_pending optimizations are admitted at
+once; the rest wait up to queue_timeout seconds for a slot and are then
+rejected with PoolBusy rather than queueing without bound. An admitted
+optimization still running after result_timeout seconds is cancelled and
+raises PoolTimeout.
+
+Workers are started from a forkserver (spawn where there is none), never
+forked from the threaded server. Cancellation reaches them through the
+cancel id marker. /floor-plan-optimizer sends each of its rooms through the
+same pool, so rooms count against the same slots and timeouts.
+"""
+
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Dict, List, Optional, Tuple
+from feng_shui_optimizer import FengShuiOptimizer, warm_grid_cache
+from cancellation import CancellationToken, OptimizationCancelled
+
+# Seconds to let a worker notice a cancel marker before the request lets go of it
+CANCEL_GRACE = 5.0
+
+class PoolBusy(Exception):
+    """Raised when no optimization slot frees up within the queue timeout."""
+
+class PoolTimeout(Exception):
+    """Raised when an admitted optimization does not finish within the result timeout."""
+
+def optimize_task(task: Dict, cancel_token: Optional[CancellationToken] = None) -> Dict:
+    """
+    Run one /feng-shui-optimizer request: placements, score and search stats.
+
+    Args:
+        task: grid_width, grid_height, objects_to_place, strategy, algorithm,
+            seed and optionally cancel_id
+        cancel_token: Token to check; built from task['cancel_id'] when None
+    """
+    if cancel_token is None and task.get('cancel_id') is not None:
+        cancel_token = CancellationToken(task['cancel_id'])
+    optimizer = FengShuiOptimizer(task['grid_width'], task['grid_height'])
+    layout, score = optimizer.optimize_layout(
+        task['objects_to_place'], task['strategy'], task['algorithm'], cancel_token, task['seed'])
+    return {
+        'placements': layout.to_placements(),
+        'score': score,
+        'stats': optimizer.search_stats.to_dict()
+    }
+
+def _run_in_worker(function: Callable[[Dict], Dict], task: Dict) -> Tuple[float, int, Dict]:
+    return time.time(), os.getpid(), function(task)
+
+def _worker_context():
+    """Start workers from a clean process rather than forking the threaded server."""
+    for method in ('forkserver', 'spawn'):
+        if method in multiprocessing.get_all_start_methods():
+            return multiprocessing.get_context(method)
+    return multiprocessing.get_context()
+
+class OptimizerPool:
+    """
+    Bounded dispatch of optimizations to a persistent ProcessPoolExecutor.
+    """
+
+    def __init__(self, workers: int, max_pending: Optional[int] = None, queue_timeout: float = 5.0,
+                 result_timeout: float = 300.0, preload_grids: Optional[List[Tuple[int, int]]] = None):
+        """
+        Args:
+            workers: Number of worker processes
+            max_pending: Optimizations allowed to wait for a free worker (default: 2 per worker)
+            queue_timeout: Seconds a request waits for a slot before PoolBusy
+            result_timeout: Seconds an admitted optimization may take before PoolTimeout
+            preload_grids: (grid_width, grid_height) sizes each worker warms when it starts
+        """
+        self.workers = max(1, workers)
+        self.max_pending = 2 * self.workers if max_pending is None else max(0, max_pending)
+        self.queue_timeout = queue_timeout
+        self.result_timeout = result_timeout
+        self.preload_grids = list(preload_grids or [])
+
+        self._slots = threading.BoundedSemaphore(self.workers + self.max_pending)
+        self._lock = threading.Lock()
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self.admitted = 0
+        self.counts = {'completed': 0, 'failed': 0, 'cancelled': 0, 'rejected': 0,
+                       'timed_out': 0, 'restarts': 0}
+        self._queue_wait = 0.0
+        self._run_time = 0.0
+
+    def _pool_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                     mp_context=_worker_context(),
+                                                     initializer=warm_grid_cache,
+                                                     initargs=(self.preload_grids,))
+            return self._executor
+
+    def _restart(self, broken: ProcessPoolExecutor):
+        """Replace an executor that lost a worker; its other futures have already failed."""
+        with self._lock:
+            if self._executor is broken:
+                print("WARNING: Optimizer pool lost a worker, restarting it")
+                self._executor = None
+                self.counts['restarts'] += 1
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def _count(self, name: str, queue_wait: float = 0.0, run_time: float = 0.0):
+        with self._lock:
+            self.counts[name] += 1
+            self._queue_wait += queue_wait
+            self._run_time += run_time
+
+    def _release(self, future):
+        with self._lock:
+            self.admitted -= 1
+        self._slots.release()
+
+    @staticmethod
+    def _stop(future):
+        """
+        Drop a queued task, or give a running one time to see the cancel
+        marker; the caller releases the marker once this returns.
+        """
+        if not future.cancel():
+            try:
+                future.exception(timeout=CANCEL_GRACE)
+            except FutureTimeoutError:
+                print(f"WARNING: Optimizer worker still running {CANCEL_GRACE}s after cancellation")
+
+    def start(self):
+        """Start the workers now rather than on the first request, and wait for them to warm up."""
+        executor = self._pool_executor()
+        for future in [executor.submit(os.getpid) for _ in range(self.workers)]:
+            future.result()
+
+    def run(self, task: Dict, cancel_token: Optional[CancellationToken] = None,
+            function: Callable[[Dict], Dict] = optimize_task) -> Dict:
+        """
+        Run function(task) on a worker and return its result, with
+        stats['pool'] holding the worker pid and the time spent queued.
+        `function` must be a module-level function so it can be pickled;
+        floor-plan rooms pass floor_plan.optimize_room.
+
+        Raises PoolBusy or PoolTimeout as described above, and
+        OptimizationCancelled when the token trips. The worker sees the
+        token only through task['cancel_id'].
+        """
+        submitted = time.time()
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            self._count('rejected')
+            raise PoolBusy(f"All {self.workers} optimizer workers and {self.max_pending} queue slots "
+                           f"stayed busy for {self.queue_timeout:.1f}s")
+        with self._lock:
+            self.admitted += 1
+        try:
+            executor = self._pool_executor()
+            try:
+                future = executor.submit(_run_in_worker, function, task)
+            except BrokenProcessPool:
+                self._restart(executor)
+                executor = self._pool_executor()
+                future = executor.submit(_run_in_worker, function, task)
+        except BaseException:
+            self._release(None)
+            raise
+        # The slot frees up when the worker is done, even if this request gave up on it
+        future.add_done_callback(self._release)
+
+        deadline = time.time() + self.result_timeout
+        try:
+            while True:
+                try:
+                    started, worker_pid, result = future.result(timeout=0.1)
+                    break
+                except FutureTimeoutError:
+                    pass
+                # Poll the token (client disconnect) while the worker runs
+                if cancel_token is not None and cancel_token.cancelled:
+                    self._stop(future)
+                    cancel_token.check()
+                if time.time() > deadline:
+                    if cancel_token is not None:
+                        cancel_token.cancel('optimizer pool timeout')
+                    self._stop(future)
+                    self._count('timed_out')
+                    raise PoolTimeout(f"Optimization did not finish within {self.result_timeout:.1f}s")
+        except OptimizationCancelled:
+            self._count('cancelled')
+            raise
+        except BrokenProcessPool:
+            self._restart(executor)
+            self._count('failed')
+            raise
+        except PoolTimeout:
+            raise
+        except Exception:
+            self._count('failed')
+            raise
+
+        self._count('completed', started - submitted, time.time() - started)
+        result.setdefault('stats', {})['pool'] = {'worker_pid': worker_pid, 'queue_wait': started - submitted}
+        return result
+
+    def to_dict(self) -> Dict:
+        with self._lock:
+            finished = self.counts['completed']
+            return {
+                'workers': self.workers,
+                'max_pending': self.max_pending,
+                'queue_timeout': self.queue_timeout,
+                'result_timeout': self.result_timeout,
+                'admitted': self.admitted,
+                **self.counts,
+                'mean_queue_wait': self._queue_wait / finished if finished else None,
+                'mean_run_time': self._run_time / finished if finished else None
+            }
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+# Server-wide pool: configured once by run_server.py, created on first use in
+# each serving process (every pre-forked worker gets its own)
+_POOL_SETTINGS: Optional[Dict] = None
+_POOL: Optional[OptimizerPool] = None
+_POOL_LOCK = threading.Lock()
+
+def configure_optimizer_pool(workers: int, **settings):
+    """
+    Serve optimizations from `workers` processes per serving process
+    (0 runs them in the request thread). `settings` are OptimizerPool
+    keyword arguments.
+    """
+    global _POOL_SETTINGS
+    with _POOL_LOCK:
+        _POOL_SETTINGS = {'workers': workers, **settings} if workers > 0 else None
+
+def optimizer_pool() -> Optional[OptimizerPool]:
+    """The serving process's pool, or None when optimizations run in the request thread."""
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None and _POOL_SETTINGS is not None:
+            _POOL = OptimizerPool(**_POOL_SETTINGS)
+        return _POOL
+
+def shutdown_optimizer_pool():
+    """Stop the serving process's pool workers, e.g. before the process exits without atexit handlers."""
+    global _POOL
+    with _POOL_LOCK:
+        pool, _POOL = _POOL, None
+    if pool is not None:
+        pool.shutdown()
@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""
+Write the per-grid tables (see grid_tables.py) for a list of grid sizes.
+
+    python precompute_tables.py --out cache/grid_tables --grid 144x144 --grid 96x120
+    FENG_SHUI_GRID_TABLES=cache/grid_tables python run_server.py --workers 4 --preload-grid 144x144
+
+Tables are written for the default scoring config; servers running it map
+them at startup (run_server.py --grid-tables, or $FENG_SHUI_GRID_TABLES).
+"""
+
+import argparse
+import contextlib
+import io
+import time
+from feng_shui_optimizer import FengShuiOptimizer
+from grid_tables import TABLES_ENV, default_tables_dir, write_grid_tables
+from run_server import parse_grid_size
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute memory-mapped per-grid tables")
+    parser.add_argument('--out', default=default_tables_dir(),
+                        help=f"Table root directory (default: ${TABLES_ENV})")
+    parser.add_argument('--grid', type=parse_grid_size, action='append', required=True, metavar='WxH')
+    args = parser.parse_args()
+    if not args.out:
+        parser.error(f"--out is required when ${TABLES_ENV} is not set")
+
+    for grid_width, grid_height in args.grid:
+        start = time.time()
+        with contextlib.redirect_stdout(io.StringIO()):
+            optimizer = FengShuiOptimizer(grid_width, grid_height)
+        path = write_grid_tables(args.out, optimizer)
+        print(f"Wrote {path} in {time.time() - start:.2f}s")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,186 @@
+"""
+Pre-forking WSGI server for running the Flask app on several cores.
+
+The parent process imports the app, warms the per-grid caches and binds the
+listening socket, then forks worker processes that inherit all of it
+copy-on-write. Each worker runs a single-threaded werkzeug server on the
+shared socket, so the kernel spreads connections across workers.
+
+Signals handled by the parent:
+    SIGHUP           recycle the workers: fork a fresh set, then let the old
+                     ones finish their current request and exit
+    SIGTERM, SIGINT  graceful shutdown
+Workers that die unexpectedly are replaced, also while old ones drain.
+
+New workers are forked from the parent, so SIGHUP does not reload anything:
+they run the code and configuration the parent imported at startup. Picking
+up changed code or settings needs a full restart of the parent.
+"""
+
+import os
+import signal
+import socket
+import threading
+import time
+from typing import Dict, List, Tuple, Optional
+from werkzeug.serving import make_server
+from feng_shui_optimizer import warm_grid_cache
+from optimizer_pool import shutdown_optimizer_pool
+
+class PreforkServer:
+    """
+    Parent process managing a pool of forked werkzeug workers.
+    """
+
+    def __init__(self, app, host: str = '0.0.0.0', port: int = 5000, workers: int = 2,
+                 preload_grids: Optional[List[Tuple[int, int]]] = None,
+                 graceful_timeout: float = 30.0, backlog: int = 128):
+        """
+        Args:
+            app: WSGI application to serve
+            host: Interface to bind
+            port: Port to bind
+            workers: Number of worker processes
+            preload_grids: (grid_width, grid_height) sizes to warm before forking
+            graceful_timeout: Seconds to wait for workers to finish before killing them
+            backlog: Listen backlog of the shared socket
+        """
+        self.app = app
+        self.host = host
+        self.port = port
+        self.workers = max(1, workers)
+        self.preload_grids = preload_grids or []
+        self.graceful_timeout = graceful_timeout
+        self.backlog = backlog
+
+        self.socket = None
+        self.worker_pids: List[int] = []
+        # Workers told to exit after their current request -> kill deadline
+        self.draining: Dict[int, float] = {}
+        self._restart = False
+        self._stopping = False
+
+    # Parent
+
+    def _bind(self):
+        family = socket.AF_INET6 if ':' in self.host else socket.AF_INET
+        self.socket = socket.socket(family, socket.SOCK_STREAM)
+        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.socket.bind((self.host, self.port))
+        self.socket.listen(self.backlog)
+        self.socket.set_inheritable(True)
+
+    def _spawn_worker(self) -> int:
+        pid = os.fork()
+        if pid == 0:
+            try:
+                self._run_worker()
+            except Exception as e:
+                print(f"Worker {os.getpid()} failed: {e}")
+                os._exit(1)
+            os._exit(0)
+        return pid
+
+    def _drain_workers(self, pids: List[int]):
+        """Ask workers to exit after their current request; _reap collects them."""
+        deadline = time.time() + self.graceful_timeout
+        for pid in pids:
+            try:
+                os.kill(pid, signal.SIGTERM)
+                self.draining[pid] = deadline
+            except ProcessLookupError:
+                pass
+
+    def _kill_overdue(self):
+        """Kill draining workers past their deadline; _reap collects them."""
+        now = time.time()
+        for pid, deadline in list(self.draining.items()):
+            if now >= deadline:
+                print(f"DEBUG: Worker {pid} did not exit in {self.graceful_timeout}s, killing it")
+                try:
+                    os.kill(pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+                self.draining[pid] = float('inf')
+
+    def _stop_workers(self, pids: List[int]):
+        """Drain workers and wait for them, killing stragglers (used on shutdown)."""
+        self._drain_workers(pids)
+        while self.draining:
+            self._kill_overdue()
+            self._reap()
+            time.sleep(0.05)
+
+    def _handle_hup(self, signum, frame):
+        self._restart = True
+
+    def _handle_stop(self, signum, frame):
+        self._stopping = True
+
+    def _reap(self):
+        """Collect exited workers: draining ones are dropped, current ones replaced."""
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            if self.draining.pop(pid, None) is not None:
+                print(f"DEBUG: Old worker {pid} exited with status {status}")
+            elif pid in self.worker_pids:
+                self.worker_pids.remove(pid)
+                if not self._stopping:
+                    print(f"DEBUG: Worker {pid} exited with status {status}, replacing it")
+                    self.worker_pids.append(self._spawn_worker())
+
+    def serve_forever(self):
+        """Preload state, bind, fork the workers and supervise them until stopped."""
+        if self.preload_grids:
+            print(f"DEBUG: Preloading grid caches for {self.preload_grids}")
+            warm_grid_cache(self.preload_grids)
+
+        self._bind()
+        signal.signal(signal.SIGHUP, self._handle_hup)
+        signal.signal(signal.SIGTERM, self._handle_stop)
+        signal.signal(signal.SIGINT, self._handle_stop)
+
+        self.worker_pids = [self._spawn_worker() for _ in range(self.workers)]
+        print(f"Serving on http://{self.host}:{self.port} with {self.workers} workers "
+              f"(parent pid {os.getpid()})")
+
+        try:
+            while not self._stopping:
+                if self._restart:
+                    self._restart = False
+                    old_pids = self.worker_pids
+                    print(f"DEBUG: Recycling workers {old_pids}")
+                    self.worker_pids = [self._spawn_worker() for _ in range(self.workers)]
+                    self._drain_workers(old_pids)
+                self._kill_overdue()
+                self._reap()
+                time.sleep(0.2)
+        finally:
+            print("Shutting down workers...")
+            self._stop_workers(self.worker_pids + list(self.draining))
+            self.socket.close()
+
+    # Worker
+
+    def _run_worker(self):
+        # Workers exit on SIGTERM after the request in flight; the parent handles the rest
+        signal.signal(signal.SIGHUP, signal.SIG_IGN)
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+        server = make_server(self.host, self.port, self.app, threaded=False,
+                             fd=self.socket.fileno())
+
+        def stop(signum, frame):
+            # shutdown() blocks until serve_forever returns, so call it off the main thread
+            threading.Thread(target=server.shutdown, daemon=True).start()
+
+        signal.signal(signal.SIGTERM, stop)
+        print(f"DEBUG: Worker {os.getpid()} started")
+        server.serve_forever()
+        # Workers leave through os._exit, so stop the optimizer pool workers here
+        shutdown_optimizer_pool()
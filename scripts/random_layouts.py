@@ -0,0 +1,109 @@
+"""
+Bulk random baselines: many random valid layouts of one room, scored together.
+
+Every object's anchor is drawn uniformly from the positions satisfying its
+placement rule, for all layouts at once. Layouts with collisions are redrawn
+as a whole, so the accepted ones are uniform over the valid layouts. Rows
+still colliding after `max_rounds` redraws (crowded rooms) are placed one
+object at a time through a FreeSpaceIndex, and dropped if that keeps
+running out of space. The kept layouts are scored in one BatchScorer pass.
+"""
+
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from batch_scoring import BatchScorer
+from free_space import FreeSpaceIndex
+from heatmap import placement_mask
+
+# Upper bound on the layouts of one request
+MAX_RANDOM_LAYOUTS = 100000
+
+DEFAULT_PERCENTILES = (5, 25, 50, 75, 95)
+
+def _draw(anchors: List[np.ndarray], count: int, grid_width: int,
+          rng: np.random.Generator) -> Tuple[np.ndarray, np.ndarray]:
+    """(count, objects) anchors drawn uniformly per object from its feasible anchors."""
+    flat = np.stack([column[rng.integers(0, len(column), size=count)] for column in anchors], axis=1)
+    return flat % grid_width, flat // grid_width
+
+def _place_sequentially(scorer: BatchScorer, rng: np.random.Generator) -> Optional[Tuple[List[int], List[int]]]:
+    """One layout placed object by object in the free space left, or None if an object does not fit."""
+    free_space = FreeSpaceIndex(scorer.grid_width, scorer.grid_height)
+    xs, ys = [], []
+    for type_id in scorer.type_ids:
+        anchors = np.flatnonzero(free_space.free_anchors(type_id))
+        if not len(anchors):
+            return None
+        anchor = int(anchors[rng.integers(0, len(anchors))])
+        x, y = anchor % scorer.grid_width, anchor // scorer.grid_width
+        free_space.occupy(type_id, x, y)
+        xs.append(x)
+        ys.append(y)
+    return xs, ys
+
+def sample_random_layouts(optimizer, objects_to_place: List[str], count: int,
+                          rng: Optional[np.random.Generator] = None,
+                          max_rounds: int = 50, sequential_attempts: int = 5) -> Tuple[BatchScorer, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Draw up to `count` random valid layouts and score them.
+
+    Args:
+        optimizer: FengShuiOptimizer providing the grid size and config
+        objects_to_place: Object types of every layout
+        count: Layouts to draw
+        rng: NumPy random generator
+        max_rounds: Whole-layout redraws before falling back to sequential placement
+        sequential_attempts: Sequential placements tried per remaining layout
+
+    Returns:
+        The BatchScorer and the xs, ys and scores of the valid layouts
+        (fewer than `count` if some could not be completed).
+    """
+    if count < 0 or count > MAX_RANDOM_LAYOUTS:
+        raise ValueError(f"count must be between 0 and {MAX_RANDOM_LAYOUTS}")
+    rng = rng if rng is not None else np.random.default_rng()
+    grid_width, grid_height = optimizer.grid_width, optimizer.grid_height
+    scorer = BatchScorer(optimizer, objects_to_place)
+    anchors = [np.flatnonzero(placement_mask(type_id, grid_width, grid_height)) for type_id in scorer.type_ids]
+
+    if any(not len(column) for column in anchors) or count == 0 or not scorer.num_objects:
+        empty = np.zeros((0, scorer.num_objects), dtype=np.int64)
+        return scorer, empty, empty.copy(), np.zeros(0)
+
+    xs, ys = _draw(anchors, count, grid_width, rng)
+    invalid = ~scorer.validity(xs, ys)
+    for _ in range(max_rounds):
+        if not invalid.any():
+            break
+        xs[invalid], ys[invalid] = _draw(anchors, int(invalid.sum()), grid_width, rng)
+        invalid = ~scorer.validity(xs, ys)
+
+    # Crowded rooms: complete the rest object by object (early objects can block later ones)
+    keep = ~invalid
+    for row in np.flatnonzero(invalid):
+        for _ in range(sequential_attempts):
+            placed = _place_sequentially(scorer, rng)
+            if placed is not None:
+                xs[row], ys[row] = placed
+                keep[row] = True
+                break
+
+    xs, ys = xs[keep], ys[keep]
+    return scorer, xs, ys, scorer.score(xs, ys)
+
+def summarize_scores(scores: np.ndarray, percentiles: Sequence[float] = DEFAULT_PERCENTILES) -> Dict:
+    """Mean, spread and percentiles of a batch of scores."""
+    if not len(scores):
+        return {'count': 0}
+    return {
+        'count': int(len(scores)),
+        'mean': float(scores.mean()),
+        'std': float(scores.std()),
+        'min': float(scores.min()),
+        'max': float(scores.max()),
+        'percentiles': {str(p): float(v) for p, v in zip(percentiles, np.percentile(scores, percentiles))}
+    }
+
+def layouts_to_placements(scorer: BatchScorer, xs: np.ndarray, ys: np.ndarray) -> List[List[Dict]]:
+    """Placement dicts of every layout in the batch."""
+    return [scorer.to_layout(row_xs, row_ys).to_placements() for row_xs, row_ys in zip(xs, ys)]
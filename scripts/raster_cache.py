@@ -0,0 +1,73 @@
+"""
+Size-bounded memo for per-grid rasters.
+
+The heatmap and proposal caches are keyed by the grid size of a request, so
+each one keeps at most `max_bytes` of arrays and evicts the least recently
+used entries beyond that. Entries added with pin() (the tables
+grid_tables.py maps from disk) are never evicted and not counted.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable
+import numpy as np
+
+# Returned by get() for a key that is not cached (None is a valid value)
+MISSING = object()
+
+def _nbytes(value) -> int:
+    """Memory held by a cached array, tuple of arrays or None."""
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, tuple):
+        return sum(_nbytes(item) for item in value)
+    return 0
+
+class RasterCache:
+    """
+    Least-recently-used cache of arrays, bounded by their total size.
+    """
+
+    def __init__(self, max_bytes: int):
+        """
+        Args:
+            max_bytes: Size of the unpinned entries kept; the newest entry is
+                kept even if it is larger on its own
+        """
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self._entries: 'OrderedDict[Hashable, Any]' = OrderedDict()
+        self._pinned: Dict[Hashable, Any] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default=MISSING):
+        with self._lock:
+            if key in self._pinned:
+                return self._pinned[key]
+            if key not in self._entries:
+                return default
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def put(self, key: Hashable, value):
+        """Cache a value, evicting the least recently used entries over max_bytes."""
+        with self._lock:
+            if key in self._pinned:
+                return
+            if key in self._entries:
+                self.nbytes -= _nbytes(self._entries.pop(key))
+            self._entries[key] = value
+            self.nbytes += _nbytes(value)
+            while self.nbytes > self.max_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self.nbytes -= _nbytes(evicted)
+
+    def pin(self, key: Hashable, value):
+        """Cache a value for the life of the process."""
+        with self._lock:
+            if key in self._entries:
+                self.nbytes -= _nbytes(self._entries.pop(key))
+            self._pinned[key] = value
+
+    def __len__(self) -> int:
+        return len(self._entries) + len(self._pinned)
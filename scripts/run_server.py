@@ -1,16 +1,106 @@
 #!/usr/bin/env python3
 """
 Simple script to run the Flask server for live Feng Shui scoring.
+
+By default this starts Flask's development server with the reloader. Pass
+--workers N to run the pre-forking server instead (see prefork.py), e.g.
+
+    python run_server.py --workers 4 --preload-grid 144x144 --preload-grid 96x120
+
+With --grid-tables (or $FENG_SHUI_GRID_TABLES) the preloaded grids map the
+tables written by precompute_tables.py instead of computing them.
+
+With --optimizer-workers M, /feng-shui-optimizer and the rooms of
+/floor-plan-optimizer run on a pool of M warm worker processes (see
+optimizer_pool.py), so concurrent optimizations use M cores even on the
+threaded development server. Without it /feng-shui-optimizer runs in the
+request thread, and each floor plan starts a process pool of its own for
+the duration of the request. Every serving process starts its own pool on
+the first optimization.
+
+    python run_server.py --optimizer-workers 4 --optimizer-queue 8 --preload-grid 144x144
+
+Send SIGHUP to the parent to recycle the workers (code changes need a full
+restart), SIGTERM to stop.
 """
 
+import argparse
+import os
 from app import app
+from feng_shui_optimizer import resolve_grid_size
+from grid_tables import TABLES_ENV
+from optimizer_pool import configure_optimizer_pool
+
+def parse_grid_size(value: str):
+    """Parse a WIDTHxHEIGHT grid size argument."""
+    try:
+        width, height = (int(part) for part in value.lower().split('x'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Grid size must look like 144x144, got {value!r}")
+    try:
+        return resolve_grid_size(width, height)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run the Feng Shui scoring server")
+    parser.add_argument('--host', default='0.0.0.0', help="Interface to bind (default: 0.0.0.0)")
+    parser.add_argument('--port', type=int, default=5000, help="Port to bind (default: 5000)")
+    parser.add_argument('--workers', type=int, default=0,
+                        help="Number of pre-forked worker processes; 0 runs the development server "
+                             f"(this machine has {os.cpu_count()} CPUs)")
+    parser.add_argument('--preload-grid', type=parse_grid_size, action='append', default=None,
+                        metavar='WxH', help="Grid size to warm before forking (repeatable, default: 144x144)")
+    parser.add_argument('--graceful-timeout', type=float, default=30.0,
+                        help="Seconds to let workers finish in-flight requests on restart/stop")
+    parser.add_argument('--backlog', type=int, default=128, help="Listen backlog of the shared socket")
+    parser.add_argument('--grid-tables', default=None, metavar='DIR',
+                        help="Directory of precompute_tables.py output to map at startup")
+    parser.add_argument('--optimizer-workers', type=int, default=0,
+                        help="Optimizer pool processes per serving process; 0 optimizes in the request thread")
+    parser.add_argument('--optimizer-queue', type=int, default=None,
+                        help="Optimizations allowed to wait for a pool worker (default: 2 per worker)")
+    parser.add_argument('--optimizer-queue-timeout', type=float, default=5.0,
+                        help="Seconds to wait for a pool slot before answering 503")
+    parser.add_argument('--optimizer-timeout', type=float, default=300.0,
+                        help="Seconds a pooled optimization may run before it is cancelled (504)")
+    return parser.parse_args(argv)
 
 if __name__ == '__main__':
+    args = parse_args()
+    if args.grid_tables:
+        # Also seen by optimizer pool workers, which warm their grids on start
+        os.environ[TABLES_ENV] = args.grid_tables
+    configure_optimizer_pool(args.optimizer_workers,
+                             max_pending=args.optimizer_queue,
+                             queue_timeout=args.optimizer_queue_timeout,
+                             result_timeout=args.optimizer_timeout,
+                             preload_grids=args.preload_grid or [])
+
     print("Starting Feng Shui Scoring Server...")
-    print("Server will be available at: http://localhost:5000")
+    print(f"Server will be available at: http://localhost:{args.port}")
     print("Endpoints:")
     print("  - POST /calculate-live-score")
     print("  - POST /random-auto-placer")
+    print("  - POST /feng-shui-optimizer")
+    print("  - POST /floor-plan-optimizer")
+    print("  - POST /cancel-optimization")
+    print("  - POST /heatmap")
+    print("  - POST /random-layouts")
+    print("  - GET /optimizer-stats")
     print("\nPress Ctrl+C to stop the server")
-    
-    app.run(debug=True, port=5000, host='0.0.0.0') 
\ No newline at end of file
+
+    if args.workers > 0:
+        from prefork import PreforkServer
+        server = PreforkServer(
+            app,
+            host=args.host,
+            port=args.port,
+            workers=args.workers,
+            preload_grids=args.preload_grid or [(144, 144)],
+            graceful_timeout=args.graceful_timeout,
+            backlog=args.backlog
+        )
+        server.serve_forever()
+    else:
+        app.run(debug=True, port=args.port, host=args.host)
@@ -0,0 +1,124 @@
+"""
+Admissible upper bounds on the layout score.
+
+score_upper_bounds() bounds each component of _calculate_layout_score for
+a list of object types, from the config alone: every bonus earned and no
+penalty paid, all at once.
+
+    bagua_scores         best zone preference x 8 x type weight, per object
+    command_position     30 when a bed and a door are placed
+    chi_flow             10 per pair of objects (2 for two pieces of furniture too
+                         large to be within 20 cells without overlapping), plus 25
+    layout_bonus         10 per object (exact)
+    wall_bonuses         15 per door or window
+    feng_shui_penalties  best wall/corner bonus per piece of furniture
+    door_blocked, furniture_overlap, door_window_overlap
+                         0 (more only if a config weight is negative)
+
+The bagua and wall terms depend only on one object's position, so they are
+also bounded jointly: each object's best anchor in heatmap.position_scores().
+The total takes the tighter of the two. No layout of these types scores
+above it, so optimize_layout stops a search whose best score is within
+algorithm 'bound_tolerance' of the bound.
+"""
+
+from typing import Dict, List
+import numpy as np
+from heatmap import position_scores
+from layout import (
+    intern_type,
+    TYPE_BAGUA_PREFERENCES,
+    TYPE_DIMENSIONS,
+    BED,
+    DOOR,
+    WINDOW,
+    FURNITURE_IDS,
+    WALL_OPENING_IDS
+)
+
+def _chi_flow_pair_bound(type1: int, type2: int) -> float:
+    """
+    Best chi flow term of a pair. Non-overlapping furniture anchors are at
+    least the smaller width or the smaller height apart; overlapping
+    furniture makes the layout invalid anyway.
+    """
+    if type1 in FURNITURE_IDS and type2 in FURNITURE_IDS:
+        (width1, height1), (width2, height2) = TYPE_DIMENSIONS[type1], TYPE_DIMENSIONS[type2]
+        if min(width1, width2, height1, height2) > 20:
+            return 2.0
+    return 10.0
+
+def _gain(weight: float) -> float:
+    """Most a penalty term can add: nothing, unless its weight is negative."""
+    return max(0.0, -weight)
+
+def _bagua_bound(optimizer, type_id: int) -> float:
+    return max(TYPE_BAGUA_PREFERENCES[type_id]) * 8.0 * optimizer._type_weight(type_id)
+
+def _furniture_wall_bound(penalties: Dict, type_id: int) -> float:
+    """Best wall-distance term of a piece of furniture: against a wall, in a corner, or near one (0)."""
+    wall = penalties['wall_placement_bonus']
+    corner = wall + penalties['corner_placement_bonus'] - (75.0 if type_id == BED else 0.0)
+    return max(0.0, wall, corner, _gain(penalties['furniture_floating']))
+
+def position_upper_bound(optimizer, type_id: int) -> float:
+    """
+    Best bagua plus wall term of one object of a type anywhere it can go.
+    Furniture has to stay inside the grid (anything else scores -10000);
+    doors and windows may leave the wall and lose only the wall bonus.
+    """
+    scores = position_scores(optimizer, type_id)
+    best = float(np.nanmax(scores)) if not np.isnan(scores).all() else -np.inf
+    if type_id in FURNITURE_IDS:
+        if np.isfinite(best):
+            return best
+        penalties = optimizer.config['feng_shui_penalties']
+        return _bagua_bound(optimizer, type_id) + _furniture_wall_bound(penalties, type_id)
+    return max(best, _bagua_bound(optimizer, type_id))
+
+def score_upper_bounds(optimizer, objects_to_place: List[str]) -> Dict:
+    """
+    Upper bounds on the score of any layout of objects_to_place.
+
+    Returns:
+        'components': bound per score component (keys of get_score_breakdown,
+            plus door_window_overlap), 'position': joint bound of the
+            position-only terms, and 'total'
+    """
+    penalties = optimizer.config['feng_shui_penalties']
+    type_ids = [intern_type(obj_type) for obj_type in objects_to_place]
+    count = len(type_ids)
+    doors = sum(type_id == DOOR for type_id in type_ids)
+    windows = sum(type_id == WINDOW for type_id in type_ids)
+    furniture = [type_id for type_id in type_ids if type_id in FURNITURE_IDS]
+    openings = sum(type_id in WALL_OPENING_IDS for type_id in type_ids)
+    has_bed, has_door, has_window = BED in type_ids, doors > 0, windows > 0
+
+    # Terms that only apply to the last bed/door/window, at most once each
+    pair_gains = 0.0
+    if has_bed and has_door:
+        pair_gains += _gain(penalties['door_at_bed_foot']) + _gain(penalties['door_facing_bed'])
+    if has_door and has_window:
+        pair_gains += (_gain(penalties['window_next_to_door']) + _gain(penalties['same_wall_door_window']) +
+                       _gain(penalties['door_window_overlap']))
+    if has_bed and has_window:
+        pair_gains += _gain(penalties['bed_under_window'])
+    pair_gains += doors * len(furniture) * _gain(penalties['door_furniture_gap'])
+
+    components = {
+        'bagua_scores': sum(_bagua_bound(optimizer, type_id) for type_id in type_ids),
+        'command_position': 30.0 if has_bed and has_door else 0.0,
+        'chi_flow': sum(_chi_flow_pair_bound(type_id, other) for position, type_id in enumerate(type_ids)
+                        for other in type_ids[position + 1:]) + (25.0 if count > 2 else 0.0),
+        'layout_bonus': 10.0 * count,
+        'wall_bonuses': 15.0 * openings,
+        'feng_shui_penalties': sum(_furniture_wall_bound(penalties, type_id) for type_id in furniture) + pair_gains,
+        'door_blocked': doors * len(furniture) * _gain(penalties['door_blocked']),
+        'furniture_overlap': len(furniture) * (len(furniture) - 1) / 2 * _gain(penalties['furniture_overlap']),
+        'door_window_overlap': doors * windows * _gain(penalties['door_window_overlap'])
+    }
+    separate_position = (components['bagua_scores'] + components['wall_bonuses'] +
+                         sum(_furniture_wall_bound(penalties, type_id) for type_id in furniture))
+    position = sum(position_upper_bound(optimizer, type_id) for type_id in type_ids)
+    total = sum(components.values()) - separate_position + min(separate_position, position)
+    return {'components': components, 'position': position, 'total': total}
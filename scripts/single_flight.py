@@ -0,0 +1,103 @@
+"""
+Single-flight coalescing of identical in-flight requests.
+
+When a request arrives while an identical one (same canonical key) is still
+being computed, it waits for that computation's result instead of starting
+its own. Each waiter gets its own copy of the result.
+
+A follower that is cancelled (its client goes away, or its cancel id is
+cancelled) stops waiting without affecting the computation. When the
+computation itself is cancelled by its leader's token, the followers start
+over and one of them becomes the new leader, so one client giving up never
+fails the others.
+
+Coalescing happens within one server process; pre-forked workers each
+coalesce their own requests.
+"""
+
+import copy
+import hashlib
+import json
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple
+from cancellation import CancellationToken, OptimizationCancelled
+
+def canonical_key(payload: Dict) -> str:
+    """Key of a JSON-serialisable request payload, independent of key order."""
+    encoded = json.dumps(payload, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+class SingleFlight:
+    """
+    In-flight computations by key, with counts of the computations saved.
+    """
+
+    def __init__(self, poll_interval: float = 0.1):
+        """
+        Args:
+            poll_interval: Seconds between a follower's cancellation checks
+        """
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._flights: Dict[str, _Flight] = {}
+        self.counts = {'computed': 0, 'coalesced': 0, 'restarted': 0, 'abandoned': 0}
+
+    def _count(self, name: str):
+        with self._lock:
+            self.counts[name] += 1
+
+    def run(self, key: str, compute: Callable[[], Any],
+            cancel_token: Optional[CancellationToken] = None) -> Tuple[Any, bool]:
+        """
+        Return compute()'s result for `key`, and whether it was shared with
+        a computation another request had already started.
+
+        Args:
+            key: Canonical request key (see canonical_key)
+            compute: Runs the request; only called when no identical one is in flight
+            cancel_token: This request's token, checked while following another one
+        """
+        while True:
+            with self._lock:
+                flight = self._flights.get(key)
+                leader = flight is None
+                if leader:
+                    flight = self._flights[key] = _Flight()
+                    self.counts['computed'] += 1
+
+            if leader:
+                try:
+                    flight.result = compute()
+                except BaseException as e:
+                    flight.error = e
+                    raise
+                finally:
+                    with self._lock:
+                        del self._flights[key]
+                    flight.done.set()
+                return copy.deepcopy(flight.result), False
+
+            try:
+                while not flight.done.wait(self.poll_interval):
+                    if cancel_token is not None:
+                        cancel_token.check()
+            except OptimizationCancelled:
+                self._count('abandoned')
+                raise
+            if flight.error is None:
+                self._count('coalesced')
+                return copy.deepcopy(flight.result), True
+            if not isinstance(flight.error, OptimizationCancelled):
+                raise flight.error
+            # The leader's client gave up; compute it again (or follow whoever does)
+            self._count('restarted')
+
+    def to_dict(self) -> Dict:
+        with self._lock:
+            return {'in_flight': len(self._flights), **self.counts}
@@ -0,0 +1,608 @@
+"""
+Search strategies for FengShuiOptimizer.optimize_layout.
+
+Each strategy is registered by name and chosen per request (or through the
+config['algorithm'] block). Budgets come from the merged algorithm
+parameters, and every run records the same SearchStats so strategies can be
+compared on evaluations, accept rate and wall time.
+"""
+
+import math
+import random
+import time
+from typing import List, Dict, Tuple, Type, Optional
+from cancellation import CancellationToken
+from moves import MoveSelector, MOVE_OPERATORS
+from genetic_optimizer import GeneticOptimizer
+from layout import Layout
+
+STRATEGIES: Dict[str, Type['OptimizationStrategy']] = {}
+
+def register_strategy(cls):
+    """Class decorator adding a strategy to the registry under its name."""
+    STRATEGIES[cls.name] = cls
+    return cls
+
+def get_strategy(name: str, params: Dict) -> 'OptimizationStrategy':
+    """Instantiate a registered strategy with merged algorithm parameters."""
+    if name not in STRATEGIES:
+        raise ValueError(f"Unknown optimization strategy: {name}. "
+                         f"Available: {sorted(STRATEGIES)}")
+    strategy_cls = STRATEGIES[name]
+    return strategy_cls({**strategy_cls.defaults, **params})
+
+# Algorithm parameters a client may set, clamped to these (min, max) so that a
+# single request cannot hold an optimizer for long or grow its caches without bound
+INT_PARAM_LIMITS: Dict[str, Tuple[int, int]] = {
+    'max_iterations': (1, 5000),
+    'max_no_improvement': (1, 5000),
+    'restarts': (1, 16),
+    'calibration_samples': (1, 64),
+    'window': (1, 1000),
+    'max_reheats': (0, 20),
+    'population_size': (2, 500),
+    'generations': (1, 500),
+    'tournament_size': (1, 20),
+    'elite_count': (0, 50),
+    'score_cache_size': (0, 200000),
+    'surrogate_candidates': (1, 64)
+}
+FLOAT_PARAM_LIMITS: Dict[str, Tuple[float, float]] = {
+    'time_limit': (0.0, 60.0),
+    'time_budget': (0.0, 60.0),
+    'temperature': (1e-6, 1e6),
+    'cooling_rate': (0.0, 1.0),
+    'mutation_rate': (0.0, 1.0),
+    'initial_acceptance': (1e-3, 0.999),
+    'final_acceptance': (1e-6, 0.999),
+    'adaptation_gain': (0.0, 100.0),
+    'reheat_fraction': (0.0, 1.0),
+    'search_share': (0.0, 1.0),
+    'bound_tolerance': (0.0, 1e6),
+    'proposal_temperature': (1e-3, 1e6),
+    'uniform_mix': (0.0, 1.0),
+    'surrogate_top_fraction': (0.0, 1.0)
+}
+# None is meaningful for these: no separate time budget, never stop at the bound
+NULLABLE_PARAMS = {'time_budget', 'bound_tolerance'}
+# Set by the server after sanitizing, whatever the client sent
+SERVER_PARAMS = {'surrogate_path', 'diagnostics'}
+
+def sanitize_algorithm_params(params, where: str = 'algorithm') -> Dict:
+    """
+    Validate client-supplied algorithm parameters.
+
+    Returns a copy with numbers clamped to the limits above and the
+    server-controlled keys dropped. Raises ValueError for unknown keys and
+    values of the wrong type.
+    """
+    if params is None:
+        return {}
+    if not isinstance(params, dict):
+        raise ValueError(f"{where} must be an object")
+
+    sanitized = {}
+    for key, value in params.items():
+        if key in SERVER_PARAMS:
+            continue
+        if key in INT_PARAM_LIMITS or key in FLOAT_PARAM_LIMITS:
+            if value is None and key in NULLABLE_PARAMS:
+                sanitized[key] = None
+                continue
+            if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+                raise ValueError(f"{where} '{key}' must be a number, got {value!r}")
+            if key in INT_PARAM_LIMITS:
+                low, high = INT_PARAM_LIMITS[key]
+                sanitized[key] = min(high, max(low, int(value)))
+            else:
+                low, high = FLOAT_PARAM_LIMITS[key]
+                sanitized[key] = min(high, max(low, float(value)))
+        elif key == 'strategy':
+            if value not in STRATEGIES:
+                raise ValueError(f"Unknown optimization strategy: {value}. Available: {sorted(STRATEGIES)}")
+            sanitized[key] = value
+        elif key == 'moves':
+            if value not in ('adaptive', 'mutation'):
+                raise ValueError(f"Unknown moves setting: {value!r}. Use 'adaptive' or 'mutation'")
+            sanitized[key] = value
+        elif key == 'move_operators':
+            if value is not None and (not isinstance(value, list) or
+                                      any(not isinstance(name, str) or name not in MOVE_OPERATORS
+                                          for name in value)):
+                raise ValueError(f"{where} 'move_operators' must be a list of {sorted(MOVE_OPERATORS)}")
+            sanitized[key] = list(value) if value is not None else None
+        elif key == 'guided_proposals':
+            if not isinstance(value, bool):
+                raise ValueError(f"{where} 'guided_proposals' must be true or false")
+            sanitized[key] = value
+        else:
+            raise ValueError(f"Unknown parameter in {where}: {key}")
+    return sanitized
+
+class SearchStats:
+    """Counters shared by every strategy."""
+
+    def __init__(self, strategy: str):
+        self.strategy = strategy
+        self.evaluations = 0
+        self.proposals = 0
+        self.accepted = 0
+        self.iterations = 0
+        self.start_time = time.time()
+        self.wall_time = 0.0
+        # (evaluations, seconds, best score) each time the best score improves
+        self.best_trace: List[Tuple[int, float, float]] = []
+        # Strategy-specific values reported alongside the counters
+        self.extras: Dict = {}
+
+    def record_best(self, score: float):
+        """Note a new best score at the current evaluation count and time."""
+        if not self.best_trace or score > self.best_trace[-1][2]:
+            self.best_trace.append((self.evaluations, time.time() - self.start_time, score))
+
+    def evaluations_to_reach(self, target: float) -> Optional[int]:
+        """Evaluations spent before the best score first reached target, or None."""
+        for evaluations, _, score in self.best_trace:
+            if score >= target:
+                return evaluations
+        return None
+
+    def merge(self, other: 'SearchStats'):
+        """Add the counters of a sub-run (e.g. one restart) to this one."""
+        self.evaluations += other.evaluations
+        self.proposals += other.proposals
+        self.accepted += other.accepted
+        self.iterations += other.iterations
+
+    def finish(self):
+        self.wall_time = time.time() - self.start_time
+
+    def to_dict(self) -> Dict:
+        return {
+            'strategy': self.strategy,
+            'evaluations': self.evaluations,
+            'proposals': self.proposals,
+            'accepted': self.accepted,
+            'accept_rate': self.accepted / self.proposals if self.proposals else 0.0,
+            'iterations': self.iterations,
+            'wall_time': self.wall_time,
+            'evaluations_per_second': self.evaluations / self.wall_time if self.wall_time > 0 else 0.0,
+            'best_trace': [list(point) for point in self.best_trace],
+            **self.extras
+        }
+
+class OptimizationStrategy:
+    """
+    Base class for search strategies.
+
+    Subclasses set `name` and `defaults` and implement run(), which returns
+    the best layout and its score and fills in self.stats. run() must call
+    cancel_token.check() regularly when a token is given, and may start
+    from initial_layout when one is given (strategies that cannot ignore it).
+    """
+
+    name = None
+    defaults: Dict = {}
+
+    def __init__(self, params: Dict):
+        self.params = params
+        self.stats = SearchStats(self.name)
+
+    def run(self, optimizer, objects_to_place: List[str],
+            cancel_token: Optional[CancellationToken] = None,
+            initial_layout: Optional[Layout] = None) -> Tuple[Layout, float]:
+        raise NotImplementedError
+
+@register_strategy
+class AnnealingStrategy(OptimizationStrategy):
+    """
+    Hill climbing with simulated annealing on a single chain.
+
+    Proposals come from the adaptive move-operator library (moves.py) when
+    `moves` is 'adaptive', or from _generate_valid_mutation when it is
+    'mutation'. `move_operators` restricts the library to the listed names.
+    """
+
+    name = 'annealing'
+    uses_temperature = True
+    defaults = {
+        'max_iterations': 200,
+        'max_no_improvement': 50,
+        'temperature': 100.0,
+        'cooling_rate': 0.95,
+        'mutation_rate': 0.3,
+        'time_limit': 20.0,
+        'moves': 'adaptive',
+        'move_operators': None
+    }
+
+    def __init__(self, params: Dict):
+        super().__init__(params)
+        if params['moves'] == 'adaptive':
+            self.move_selector = MoveSelector(params['move_operators'])
+        elif params['moves'] == 'mutation':
+            self.move_selector = None
+        else:
+            raise ValueError(f"Unknown moves setting: {params['moves']}. Use 'adaptive' or 'mutation'")
+
+    def _propose(self, optimizer, objects_to_place: List[str], current_layout: Layout,
+                 cancel_token: Optional[CancellationToken]) -> Tuple[Layout, Optional[str]]:
+        """Next candidate layout and the move operator that produced it (if any)."""
+        if self.move_selector is None:
+            mutated_layout = optimizer._generate_valid_mutation(
+                current_layout, objects_to_place, self.params['mutation_rate'], cancel_token)
+            return mutated_layout, None
+        return optimizer._propose_move(current_layout, self.move_selector, cancel_token)
+
+    def _record_move(self, operator: Optional[str], improved: bool):
+        if operator is not None:
+            self.move_selector.record_result(operator, improved)
+            self.stats.extras['moves'] = self.move_selector.to_dict()
+
+    def _propose_scored(self, optimizer, objects_to_place: List[str], current_layout: Layout,
+                        current_score: float, cancel_token: Optional[CancellationToken]) -> Tuple[Layout, float]:
+        """
+        Next candidate layout with its exact score. With a surrogate loaded
+        (optimizer.surrogate), several proposals are drawn, the surrogate
+        picks the most promising and the best of those by exact score wins.
+        """
+        diagnostics = optimizer.diagnostics
+        ranker = optimizer.surrogate
+        with diagnostics.timer('proposal'):
+            if ranker is None:
+                candidates = [self._propose(optimizer, objects_to_place, current_layout, cancel_token)]
+            else:
+                candidates = [self._propose(optimizer, objects_to_place, current_layout, cancel_token)
+                              for _ in range(ranker.candidates)]
+        self.stats.proposals += len(candidates)
+        if ranker is None:
+            chosen = [0]
+        else:
+            with diagnostics.timer('surrogate'):
+                chosen = ranker.select([layout for layout, _ in candidates])
+
+        best_layout, best_score = None, float('-inf')
+        for index in chosen:
+            layout, operator = candidates[index]
+            with diagnostics.timer('scoring'):
+                score, computed = optimizer.score_cache.score(layout)
+            self.stats.evaluations += computed
+            self._record_move(operator, score > current_score)
+            if best_layout is None or score > best_score:
+                best_layout, best_score = layout, score
+        return best_layout, best_score
+
+    def _accept(self, mutated_score: float, current_score: float, temperature: float,
+                rng: random.Random) -> bool:
+        """Accept better solutions or worse solutions with probability (simulated annealing)."""
+        if mutated_score > current_score:
+            print(f"DEBUG: Accepting better score: {mutated_score:.2f} > {current_score:.2f}")
+            return True
+        if temperature > 0.1:  # Only accept worse solutions when temperature is high
+            acceptance_probability = math.exp((mutated_score - current_score) / temperature)
+            if rng.random() < acceptance_probability:
+                print(f"DEBUG: Accepting worse score with probability: {mutated_score:.2f} < {current_score:.2f}")
+                return True
+        return False
+
+    def search(self, optimizer, objects_to_place: List[str], current_layout: Layout,
+               max_iterations: int, time_limit: float,
+               cancel_token: Optional[CancellationToken] = None) -> Tuple[Layout, float]:
+        """Run one chain from current_layout."""
+        current_score = optimizer._calculate_layout_score(current_layout)
+        self.stats.evaluations += 1
+
+        print(f"DEBUG: Initial layout score: {current_score:.2f}")
+        optimizer._print_detailed_score_breakdown(current_layout, current_score)
+
+        best_layout = current_layout.copy()
+        best_score = current_score
+        self.stats.record_best(best_score)
+
+        temperature = self.params['temperature']
+        cooling_rate = self.params['cooling_rate']
+        max_no_improvement = self.params['max_no_improvement']
+        no_improvement_count = 0
+        diagnostics = optimizer.diagnostics
+
+        start_time = time.time()
+        for iteration in range(max_iterations):
+            # Check for timeout
+            if time.time() - start_time > time_limit:
+                print(f"DEBUG: Optimization timed out after {time.time() - start_time:.2f} seconds.")
+                break
+            if best_score >= optimizer.stop_score:
+                print(f"DEBUG: Best score {best_score:.2f} reached the score upper bound after {iteration} iterations")
+                break
+            self.stats.iterations += 1
+
+            # Generate and score a valid mutated version of the current layout
+            mutated_layout, mutated_score = self._propose_scored(
+                optimizer, objects_to_place, current_layout, current_score, cancel_token)
+
+            accepted = self._accept(mutated_score, current_score, temperature, optimizer.rng)
+            diagnostics.record_acceptance(temperature if self.uses_temperature else None,
+                                          mutated_score < current_score, accepted)
+            if accepted:
+                self.stats.accepted += 1
+                current_layout = mutated_layout
+                current_score = mutated_score
+
+                # Update best solution if this is better
+                if current_score > best_score:
+                    best_layout = current_layout.copy()
+                    best_score = current_score
+                    self.stats.record_best(best_score)
+                    no_improvement_count = 0
+                    print(f"DEBUG: New best score: {best_score:.2f}")
+                    optimizer._print_detailed_score_breakdown(best_layout, best_score)
+                else:
+                    no_improvement_count += 1
+            else:
+                no_improvement_count += 1
+
+            # Cool down temperature
+            temperature *= cooling_rate
+
+            # Early stopping if no improvement for too long
+            if no_improvement_count >= max_no_improvement:
+                print(f"DEBUG: No improvement for {max_no_improvement} iterations, stopping early")
+                break
+
+            if iteration % 20 == 0:
+                print(f"DEBUG: Iteration {iteration}, current score: {current_score:.2f}, best score: {best_score:.2f}, temperature: {temperature:.2f}")
+
+            # Always keep track of the best layout seen, regardless of acceptance
+            if mutated_score > best_score:
+                best_layout = mutated_layout.copy()
+                best_score = mutated_score
+                self.stats.record_best(best_score)
+                print(f"DEBUG: New best score found: {best_score:.2f} (even though not accepted)")
+
+        return best_layout, best_score
+
+    def run(self, optimizer, objects_to_place: List[str],
+            cancel_token: Optional[CancellationToken] = None,
+            initial_layout: Optional[Layout] = None) -> Tuple[Layout, float]:
+        if initial_layout is None:
+            initial_layout = optimizer._generate_initial_layout(objects_to_place)
+        best_layout, best_score = self.search(
+            optimizer, objects_to_place, initial_layout,
+            self.params['max_iterations'], self.params['time_limit'], cancel_token)
+        self.stats.finish()
+        return best_layout, best_score
+
+@register_strategy
+class HillClimbingStrategy(AnnealingStrategy):
+    """
+    Greedy hill climbing: only strictly better mutations are accepted.
+    """
+
+    name = 'hill_climbing'
+    uses_temperature = False
+
+    def _accept(self, mutated_score: float, current_score: float, temperature: float,
+                rng: random.Random) -> bool:
+        return mutated_score > current_score
+
+@register_strategy
+class RandomRestartStrategy(HillClimbingStrategy):
+    """
+    Hill climbing restarted from fresh random layouts, keeping the best run.
+    The iteration and time budgets are split evenly across the restarts.
+    """
+
+    name = 'random_restart'
+    defaults = {**HillClimbingStrategy.defaults, 'restarts': 4}
+
+    def run(self, optimizer, objects_to_place: List[str],
+            cancel_token: Optional[CancellationToken] = None,
+            initial_layout: Optional[Layout] = None) -> Tuple[Layout, float]:
+        restarts = max(1, int(self.params['restarts']))
+        iterations_per_restart = max(1, self.params['max_iterations'] // restarts)
+        time_per_restart = self.params['time_limit'] / restarts
+
+        best_layout, best_score = None, float('-inf')
+        for restart in range(restarts):
+            print(f"DEBUG: Random restart {restart + 1}/{restarts}")
+            if restart > 0 or initial_layout is None:
+                start_layout = optimizer._generate_initial_layout(objects_to_place)
+            else:
+                start_layout = initial_layout
+            layout, score = self.search(optimizer, objects_to_place, start_layout,
+                                        iterations_per_restart, time_per_restart, cancel_token)
+            if score > best_score:
+                best_layout, best_score = layout, score
+            if best_score >= optimizer.stop_score:
+                print(f"DEBUG: Best score {best_score:.2f} reached the score upper bound, skipping remaining restarts")
+                break
+
+        self.stats.finish()
+        return best_layout, best_score
+
+@register_strategy
+class AdaptiveAnnealingStrategy(AnnealingStrategy):
+    """
+    Simulated annealing with a schedule that adapts to the score scale.
+
+    * The chain starts greedy. Once it has seen `calibration_samples`
+      worsening proposals, the temperature is calibrated from their mean
+      score delta so that about `initial_acceptance` of worsening moves are
+      accepted, whatever the penalty magnitudes are. Calibrating from the
+      chain's own proposals costs no extra evaluations.
+    * Every `window` proposals the acceptance ratio of worsening moves is
+      compared with a target that decays geometrically from
+      `initial_acceptance` to `final_acceptance` over the iteration budget,
+      and the temperature is scaled towards it.
+    * After `max_no_improvement` proposals without a new best, the chain
+      restarts from the best layout at a reheated temperature; it stops after
+      `max_reheats` fruitless reheats.
+
+    With the defaults (tuned with benchmark_strategies.py) it ends on
+    higher scores than 'annealing' and needs fewer expected evaluations to
+    reach a given score on a 144x144 room, but about as many on 96x120.
+    """
+
+    name = 'adaptive_annealing'
+    defaults = {
+        **AnnealingStrategy.defaults,
+        'calibration_samples': 8,
+        'initial_acceptance': 0.02,
+        'final_acceptance': 0.001,
+        'window': 5,
+        'adaptation_gain': 2.0,
+        'reheat_fraction': 0.25,
+        'max_reheats': 3
+    }
+
+    def _calibrated_temperature(self, worse_deltas: List[float]) -> float:
+        """Temperature at which the mean observed worsening delta is accepted with initial_acceptance."""
+        if not worse_deltas:
+            # Nothing but improvements and ties so far; fall back to the fixed setting
+            return self.params['temperature']
+        mean_delta = sum(worse_deltas) / len(worse_deltas)
+        return max(1e-6, -mean_delta / math.log(self.params['initial_acceptance']))
+
+    def search(self, optimizer, objects_to_place: List[str], current_layout: Layout,
+               max_iterations: int, time_limit: float,
+               cancel_token: Optional[CancellationToken] = None) -> Tuple[Layout, float]:
+        """Run one adaptive chain from current_layout."""
+        start_time = time.time()
+        current_score = optimizer._calculate_layout_score(current_layout)
+        self.stats.evaluations += 1
+
+        best_layout = current_layout.copy()
+        best_score = current_score
+        self.stats.record_best(best_score)
+
+        # Greedy until enough worsening deltas have been seen to calibrate from
+        calibration_samples = max(1, int(self.params['calibration_samples']))
+        worse_deltas = []
+        initial_temperature = None
+        temperature = 0.0
+
+        initial_acceptance = self.params['initial_acceptance']
+        final_acceptance = self.params['final_acceptance']
+        window = max(1, int(self.params['window']))
+        gain = self.params['adaptation_gain']
+        max_no_improvement = self.params['max_no_improvement']
+        no_improvement_count = 0
+        reheats = 0
+        window_worse = 0
+        window_worse_accepted = 0
+        diagnostics = optimizer.diagnostics
+
+        for iteration in range(max_iterations):
+            if time.time() - start_time > time_limit:
+                print(f"DEBUG: Optimization timed out after {time.time() - start_time:.2f} seconds.")
+                break
+            if best_score >= optimizer.stop_score:
+                print(f"DEBUG: Best score {best_score:.2f} reached the score upper bound after {iteration} iterations")
+                break
+            self.stats.iterations += 1
+
+            mutated_layout, mutated_score = self._propose_scored(
+                optimizer, objects_to_place, current_layout, current_score, cancel_token)
+
+            delta = mutated_score - current_score
+            if delta >= 0:
+                accepted = True
+            elif initial_temperature is None:
+                accepted = False
+                worse_deltas.append(-delta)
+                if len(worse_deltas) >= calibration_samples:
+                    initial_temperature = temperature = self._calibrated_temperature(worse_deltas)
+                    print(f"DEBUG: Calibrated initial temperature: {temperature:.2f}")
+            else:
+                window_worse += 1
+                accepted = optimizer.rng.random() < math.exp(delta / temperature)
+                window_worse_accepted += accepted
+            diagnostics.record_acceptance(temperature, delta < 0, accepted)
+
+            if accepted:
+                self.stats.accepted += 1
+                current_layout = mutated_layout
+                current_score = mutated_score
+
+            if current_score > best_score:
+                best_layout = current_layout.copy()
+                best_score = current_score
+                self.stats.record_best(best_score)
+                no_improvement_count = 0
+                print(f"DEBUG: New best score: {best_score:.2f}")
+            else:
+                no_improvement_count += 1
+
+            # Steer the worsening-move acceptance ratio towards the decaying target
+            if initial_temperature is not None and (iteration + 1) % window == 0:
+                progress = (iteration + 1) / max_iterations
+                target = initial_acceptance * (final_acceptance / initial_acceptance) ** progress
+                if window_worse:
+                    ratio = window_worse_accepted / window_worse
+                    temperature *= min(2.0, max(0.5, math.exp(gain * (target - ratio))))
+                window_worse = 0
+                window_worse_accepted = 0
+                print(f"DEBUG: Iteration {iteration}, current score: {current_score:.2f}, "
+                      f"best score: {best_score:.2f}, temperature: {temperature:.2f}, target acceptance: {target:.3f}")
+
+            # Reheat from the best layout on stagnation
+            if no_improvement_count >= max_no_improvement:
+                if reheats >= self.params['max_reheats']:
+                    print(f"DEBUG: No improvement after {reheats} reheats, stopping early")
+                    break
+                reheats += 1
+                if initial_temperature is None:
+                    initial_temperature = self._calibrated_temperature(worse_deltas)
+                temperature = max(temperature, initial_temperature * self.params['reheat_fraction'])
+                current_layout = best_layout.copy()
+                current_score = best_score
+                no_improvement_count = 0
+                print(f"DEBUG: Reheating to {temperature:.2f} ({reheats}/{self.params['max_reheats']})")
+
+        self.stats.extras['initial_temperature'] = initial_temperature
+        self.stats.extras['final_temperature'] = temperature
+        self.stats.extras['reheats'] = self.stats.extras.get('reheats', 0) + reheats
+        return best_layout, best_score
+
+@register_strategy
+class GeneticStrategy(OptimizationStrategy):
+    """
+    Population-based genetic search (see genetic_optimizer.GeneticOptimizer).
+    """
+
+    name = 'genetic'
+    defaults = {
+        'population_size': 40,
+        'generations': 60,
+        'tournament_size': 3,
+        'elite_count': 2,
+        'mutation_rate': 0.3,
+        'time_limit': 20.0
+    }
+
+    def run(self, optimizer, objects_to_place: List[str],
+            cancel_token: Optional[CancellationToken] = None,
+            initial_layout: Optional[Layout] = None) -> Tuple[Layout, float]:
+        # The population is always sampled fresh; initial_layout is not used
+        genetic = GeneticOptimizer(
+            optimizer,
+            objects_to_place,
+            population_size=int(self.params['population_size']),
+            generations=int(self.params['generations']),
+            tournament_size=int(self.params['tournament_size']),
+            elite_count=int(self.params['elite_count']),
+            mutation_rate=self.params['mutation_rate'],
+            time_limit=self.params['time_limit'],
+            cancel_token=cancel_token,
+            rng=optimizer.np_rng
+        )
+        best_layout, best_score, genetic_stats = genetic.run()
+
+        # Every child is a proposal; valid children are the accepted ones
+        self.stats.evaluations = genetic_stats['evaluations']
+        self.stats.proposals = genetic_stats['evaluations'] - genetic.population_size
+        self.stats.accepted = genetic_stats['valid_children']
+        self.stats.iterations = genetic_stats['generations']
+        self.stats.best_trace = genetic_stats['best_trace']
+        self.stats.finish()
+        return best_layout, best_score
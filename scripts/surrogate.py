@@ -0,0 +1,361 @@
+"""
+Surrogate scorer for pre-screening search proposals.
+
+A SurrogateModel is a ridge regression of the layout score on hand-crafted
+features (layout_features), trained offline from the scored layouts of
+generate_dataset.py with train_surrogate.py and saved to a local .npz file.
+The features follow the terms of _calculate_layout_score without computing
+them exactly:
+
+* per object: one-hot bagua zone of its center; for furniture the wall
+  distance bands of the wall/floating rules, against a wall and in a
+  corner; for doors and windows whether they lie on a wall
+* per object pair: bands of the distances the rules threshold (anchor to
+  anchor, between reference points, i.e. furniture centers and openings'
+  anchors, and from an opening to the bed's foot), the anchor distance
+  relative to the grid diagonal, whether a door is within two cells of a
+  piece of furniture, the command-position curve for the bed and the door
+  and a same-wall flag for two openings
+* the spread of the objects around their center of mass
+
+A model is tied to one multiset of object types and works for any grid
+size; layouts listing the objects in another order have their columns
+matched to the model's by type, in order of appearance. With algorithm 'surrogate_path' set, optimize_layout loads it
+into a SurrogateRanker: the annealing strategies then draw
+'surrogate_candidates' proposals per iteration and only the
+'surrogate_top_fraction' the model ranks best get an exact score.
+
+Experimental: in this tree an exact score costs tens of microseconds,
+less than drawing the extra proposals and ranking them, so the surrogate
+cuts exact evaluations per result but makes a search several times slower
+in wall time (benchmark_strategies.py --surrogate). It is off by default
+and only worth enabling where exact scoring is far more expensive.
+"""
+
+import math
+import os
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from layout import (
+    TYPE_NAMES,
+    TYPE_DIMENSIONS,
+    BED,
+    DOOR,
+    FURNITURE_IDS,
+    WALL_OPENING_IDS,
+    intern_type
+)
+
+# Distance thresholds of the scoring rules, each a "< threshold" indicator
+DISTANCE_BANDS = (3, 5, 6, 8, 10, 12, 15, 20)
+
+# (path, modification time) -> loaded model
+_MODEL_CACHE: Dict[Tuple[str, float], 'SurrogateModel'] = {}
+
+def feature_names(type_ids: Sequence[int]) -> List[str]:
+    """Names of the columns of layout_features(), in order."""
+    names = []
+    for i, t in enumerate(type_ids):
+        label = f"{TYPE_NAMES[t]}{i}"
+        names += [f"{label}.zone{zone}" for zone in range(9)]
+        if t in FURNITURE_IDS:
+            names += [f"{label}.{band}" for band in ('wall', 'corner', 'near', 'moderate', 'far', 'floating')]
+        elif t in WALL_OPENING_IDS:
+            names.append(f"{label}.on_wall")
+    pairs = [(i, j) for i in range(len(type_ids)) for j in range(i + 1, len(type_ids))]
+    for i, j in pairs:
+        label = f"{TYPE_NAMES[type_ids[i]]}{i}-{TYPE_NAMES[type_ids[j]]}{j}"
+        names += [f"{label}.anchor_lt{band}" for band in DISTANCE_BANDS] + [f"{label}.distance"]
+        if type_ids[i] in FURNITURE_IDS or type_ids[j] in FURNITURE_IDS:
+            names += [f"{label}.center_lt{band}" for band in DISTANCE_BANDS]
+        if BED in (type_ids[i], type_ids[j]):
+            names += [f"{label}.foot_lt{band}" for band in DISTANCE_BANDS]
+        if DOOR in (type_ids[i], type_ids[j]) and FURNITURE_IDS & {type_ids[i], type_ids[j]}:
+            names.append(f"{label}.blocks_door")
+        if {type_ids[i], type_ids[j]} == {BED, DOOR}:
+            names.append(f"{label}.command")
+        if type_ids[i] in WALL_OPENING_IDS and type_ids[j] in WALL_OPENING_IDS:
+            names.append(f"{label}.same_wall")
+    names.append('spread')
+    return names
+
+def _wall_sides(xs, ys, grid_width: int, grid_height: int) -> np.ndarray:
+    """Wall an opening lies on: 0 left, 1 right, 2 top, 3 bottom, 4 none."""
+    return np.select([xs == 0, xs == grid_width - 1, ys == 0, ys == grid_height - 1], [0, 1, 2, 3], 4)
+
+class _FeaturePlan:
+    """
+    Index arrays that compute the features of one list of object types in a
+    few whole-batch operations, plus the permutation putting the resulting
+    blocks into feature_names() order.
+    """
+
+    def __init__(self, type_ids: Tuple[int, ...]):
+        count = len(type_ids)
+        self.count = count
+        self.widths = np.array([TYPE_DIMENSIONS[t][0] for t in type_ids])
+        self.heights = np.array([TYPE_DIMENSIONS[t][1] for t in type_ids])
+        self.furniture = np.array([t in FURNITURE_IDS for t in type_ids], dtype=bool)
+        self.furniture_index = np.flatnonzero(self.furniture)
+        self.opening_index = np.array([i for i, t in enumerate(type_ids) if t in WALL_OPENING_IDS], dtype=np.int64)
+
+        pairs = [(i, j) for i in range(count) for j in range(i + 1, count)]
+        self.pair_i = np.array([i for i, _ in pairs], dtype=np.int64)
+        self.pair_j = np.array([j for _, j in pairs], dtype=np.int64)
+        center_pairs, bed_pairs, door_pairs, command_pairs, wall_pairs = [], [], [], [], []
+        for p, (i, j) in enumerate(pairs):
+            pair = {type_ids[i], type_ids[j]}
+            if pair & FURNITURE_IDS:
+                center_pairs.append(p)
+            if BED in pair:
+                bed_pairs.append((p, *((i, j) if type_ids[i] == BED else (j, i))))
+            if DOOR in pair and pair & FURNITURE_IDS:
+                door_pairs.append((p, *((i, j) if type_ids[i] == DOOR else (j, i))))
+            if pair == {BED, DOOR}:
+                command_pairs.append(p)
+            if type_ids[i] in WALL_OPENING_IDS and type_ids[j] in WALL_OPENING_IDS:
+                wall_pairs.append(p)
+        self.center_pairs = np.array(center_pairs, dtype=np.int64)
+        self.bed_pairs = np.array(bed_pairs, dtype=np.int64).reshape(-1, 3)
+        self.door_pairs = np.array(door_pairs, dtype=np.int64).reshape(-1, 3)
+        self.command_pairs = np.array(command_pairs, dtype=np.int64)
+        self.wall_pairs = np.array(wall_pairs, dtype=np.int64)
+
+        # Names of the block columns in the order _compute emits them
+        labels = [f"{TYPE_NAMES[t]}{i}" for i, t in enumerate(type_ids)]
+        pair_labels = [f"{labels[i]}-{labels[j]}" for i, j in pairs]
+        names = [f"{labels[i]}.zone{zone}" for i in range(count) for zone in range(9)]
+        names += [f"{labels[i]}.{band}" for i in self.furniture_index
+                  for band in ('wall', 'corner', 'near', 'moderate', 'far', 'floating')]
+        names += [f"{labels[i]}.on_wall" for i in self.opening_index]
+        names += [f"{label}.anchor_lt{band}" for label in pair_labels for band in DISTANCE_BANDS]
+        names += [f"{label}.distance" for label in pair_labels]
+        names += [f"{pair_labels[p]}.center_lt{band}" for p in center_pairs for band in DISTANCE_BANDS]
+        names += [f"{pair_labels[p]}.foot_lt{band}" for p, _, _ in bed_pairs for band in DISTANCE_BANDS]
+        names += [f"{pair_labels[p]}.blocks_door" for p, _, _ in door_pairs]
+        names += [f"{pair_labels[p]}.command" for p in command_pairs]
+        names += [f"{pair_labels[p]}.same_wall" for p in wall_pairs]
+        names.append('spread')
+        position = {name: index for index, name in enumerate(names)}
+        self.order = np.array([position[name] for name in feature_names(type_ids)], dtype=np.int64)
+
+    def compute(self, xs: np.ndarray, ys: np.ndarray, grid_width: int, grid_height: int) -> np.ndarray:
+        layouts = len(xs)
+        bands = np.array(DISTANCE_BANDS, dtype=np.float64)
+        blocks = []
+
+        zone_x = np.clip(((xs + self.widths / 2) / grid_width * 3).astype(np.int64), 0, 2)
+        zone_y = np.clip(((ys + self.heights / 2) / grid_height * 3).astype(np.int64), 0, 2)
+        zone = zone_y * 3 + zone_x
+        blocks.append((zone[:, :, None] == np.arange(9)).reshape(layouts, -1))
+
+        furniture = self.furniture_index
+        x, y = xs[:, furniture], ys[:, furniture]
+        left, right = x, grid_width - (x + self.widths[furniture])
+        top, bottom = y, grid_height - (y + self.heights[furniture])
+        distance = np.minimum(np.minimum(left, right), np.minimum(top, bottom))
+        corner = ((left == 0) | (right == 0)) & ((top == 0) | (bottom == 0))
+        blocks.append(np.stack([distance == 0, corner, (distance > 0) & (distance <= 1),
+                                (distance > 1) & (distance <= 3), (distance > 3) & (distance <= 6),
+                                distance > 6], axis=2).reshape(layouts, -1))
+
+        sides = _wall_sides(xs, ys, grid_width, grid_height)
+        blocks.append(sides[:, self.opening_index] < 4)
+
+        # Reference points of the pairwise rules: furniture centers and bed feet (as the scorer rounds them)
+        center_xs = xs + np.where(self.furniture, self.widths // 2, 0)
+        center_ys = ys + np.where(self.furniture, self.heights // 2, 0)
+        i, j = self.pair_i, self.pair_j
+        anchor = np.hypot(xs[:, i] - xs[:, j], ys[:, i] - ys[:, j])
+        blocks.append((anchor[:, :, None] < bands).reshape(layouts, -1))
+        blocks.append(anchor / math.hypot(grid_width, grid_height))
+
+        pairs = self.center_pairs
+        center = np.hypot(center_xs[:, i[pairs]] - center_xs[:, j[pairs]],
+                          center_ys[:, i[pairs]] - center_ys[:, j[pairs]])
+        blocks.append((center[:, :, None] < bands).reshape(layouts, -1))
+
+        _, bed, other = self.bed_pairs.T
+        foot = np.hypot(xs[:, other] - (xs[:, bed] + self.widths[bed] // 2),
+                        ys[:, other] - (ys[:, bed] + self.heights[bed]))
+        blocks.append((foot[:, :, None] < bands).reshape(layouts, -1))
+
+        _, door, piece = self.door_pairs.T
+        blocks.append((xs[:, piece] <= xs[:, door] + 2) & (xs[:, piece] + self.widths[piece] >= xs[:, door] - 2) &
+                      (ys[:, piece] <= ys[:, door] + 2) & (ys[:, piece] + self.heights[piece] >= ys[:, door] - 2))
+
+        optimal_distance = min(grid_width, grid_height) * 0.3
+        blocks.append(np.maximum(0, 30 - np.abs(anchor[:, self.command_pairs] - optimal_distance)))
+
+        pairs = self.wall_pairs
+        blocks.append(sides[:, i[pairs]] == sides[:, j[pairs]])
+
+        if self.count > 2:
+            center_x = xs.mean(axis=1, keepdims=True)
+            center_y = ys.mean(axis=1, keepdims=True)
+            blocks.append(np.minimum(25, np.hypot(xs - center_x, ys - center_y).sum(axis=1) / self.count)[:, None])
+        else:
+            blocks.append(np.zeros((layouts, 1)))
+        return np.concatenate([block.astype(np.float64, copy=False) for block in blocks], axis=1)[:, self.order]
+
+# Type id tuple -> its _FeaturePlan
+_FEATURE_PLANS: Dict[Tuple[int, ...], _FeaturePlan] = {}
+
+def layout_features(type_ids: Sequence[int], xs: np.ndarray, ys: np.ndarray,
+                    grid_width: int, grid_height: int) -> np.ndarray:
+    """
+    Feature matrix of a batch of layouts.
+
+    Every feature is computed for all layouts and all objects or object
+    pairs at once, so the cost hardly depends on the batch size.
+
+    Args:
+        type_ids: Type id of every object (column of xs and ys)
+        xs: (layouts, objects) anchor x coordinates
+        ys: (layouts, objects) anchor y coordinates
+        grid_width: Width of the grid in cells
+        grid_height: Height of the grid in cells
+
+    Returns:
+        (layouts, len(feature_names(type_ids))) float array
+    """
+    type_ids = tuple(type_ids)
+    plan = _FEATURE_PLANS.get(type_ids)
+    if plan is None:
+        plan = _FEATURE_PLANS[type_ids] = _FeaturePlan(type_ids)
+    xs = np.asarray(xs, dtype=np.float64)
+    ys = np.asarray(ys, dtype=np.float64)
+    return plan.compute(xs, ys, grid_width, grid_height)
+
+class SurrogateModel:
+    """
+    Linear approximation of the layout score for one list of object types.
+    """
+
+    def __init__(self, object_types: List[str], weights: np.ndarray, intercept: float,
+                 metrics: Optional[Dict] = None):
+        """
+        Args:
+            object_types: Object type of every layout column, in order
+            weights: One weight per feature_names() column
+            intercept: Score predicted for all-zero features
+            metrics: Holdout quality recorded at training time
+        """
+        self.object_types = list(object_types)
+        self.type_ids = tuple(intern_type(t) for t in self.object_types)
+        self.weights = np.asarray(weights, dtype=np.float64)
+        self.intercept = float(intercept)
+        self.metrics = metrics or {}
+        if len(self.weights) != len(feature_names(self.type_ids)):
+            raise ValueError("Surrogate weights do not match the features of its object types")
+
+    @classmethod
+    def fit(cls, object_types: List[str], gram: np.ndarray, moments: np.ndarray, ridge: float = 1.0,
+            metrics: Optional[Dict] = None) -> 'SurrogateModel':
+        """
+        Ridge solution from accumulated sufficient statistics, so the
+        training set never has to be in memory at once.
+
+        Args:
+            object_types: Object type of every layout column, in order
+            gram: Sum of a^T a over rows a = [features, 1]
+            moments: Sum of a^T score over the same rows
+            ridge: L2 penalty on the weights (not on the intercept)
+            metrics: Holdout quality to store with the model
+        """
+        penalty = np.full(len(gram), float(ridge))
+        penalty[-1] = 0.0
+        solution = np.linalg.lstsq(gram + np.diag(penalty), moments, rcond=None)[0]
+        return cls(object_types, solution[:-1], solution[-1], metrics)
+
+    def predict(self, xs: np.ndarray, ys: np.ndarray, grid_width: int, grid_height: int) -> np.ndarray:
+        """Predicted scores of a batch of layouts."""
+        features = layout_features(self.type_ids, xs, ys, grid_width, grid_height)
+        return features @ self.weights + self.intercept
+
+    def save(self, path: str):
+        names = sorted(self.metrics)
+        np.savez(path, object_types=np.array(self.object_types), weights=self.weights,
+                 intercept=self.intercept, metric_names=np.array(names, dtype=str),
+                 metric_values=np.array([self.metrics[name] for name in names], dtype=np.float64))
+
+    @classmethod
+    def load(cls, path: str) -> 'SurrogateModel':
+        with np.load(path) as data:
+            metrics = {str(name): float(value) for name, value in zip(data['metric_names'], data['metric_values'])}
+            return cls([str(t) for t in data['object_types']], data['weights'],
+                       float(data['intercept']), metrics)
+
+def load_surrogate(path: str) -> SurrogateModel:
+    """Model saved at path, loaded once per process and again when the file changes."""
+    key = (os.path.abspath(path), os.path.getmtime(path))
+    if key not in _MODEL_CACHE:
+        _MODEL_CACHE[key] = SurrogateModel.load(path)
+    return _MODEL_CACHE[key]
+
+class SurrogateRanker:
+    """
+    Picks which proposals of an iteration get an exact score.
+    """
+
+    def __init__(self, model: SurrogateModel, grid_width: int, grid_height: int,
+                 candidates: int = 8, top_fraction: float = 0.25):
+        """
+        Args:
+            model: Surrogate for the layouts being searched
+            grid_width: Width of the grid in cells
+            grid_height: Height of the grid in cells
+            candidates: Proposals drawn per iteration
+            top_fraction: Share of them scored exactly (at least one)
+        """
+        if candidates < 1:
+            raise ValueError("surrogate_candidates must be at least 1")
+        if not 0.0 < top_fraction <= 1.0:
+            raise ValueError("surrogate_top_fraction must be in (0, 1]")
+        self.model = model
+        self.grid_width = grid_width
+        self.grid_height = grid_height
+        self.candidates = int(candidates)
+        self.keep = max(1, math.ceil(self.candidates * top_fraction))
+        self.ranked = 0
+        self.screened_out = 0
+        # Layout type tuple -> column order of the model, or None if the types differ
+        self._column_orders: Dict[Tuple[int, ...], Optional[List[int]]] = {}
+
+    def _column_order(self, types: Tuple[int, ...]) -> Optional[List[int]]:
+        order = self._column_orders.get(types, ())
+        if order == ():
+            order = None
+            if sorted(types) == sorted(self.model.type_ids):
+                remaining = list(enumerate(types))
+                order = []
+                for type_id in self.model.type_ids:
+                    position = next(p for p, (_, t) in enumerate(remaining) if t == type_id)
+                    order.append(remaining.pop(position)[0])
+            self._column_orders[types] = order
+        return order
+
+    def select(self, layouts: List) -> List[int]:
+        """
+        Indices of the layouts to score exactly, best predicted first.
+        Layouts of other objects than the model's (e.g. the reduced ones of
+        the 'drop' repair stage) are taken in drawing order instead.
+        """
+        order = self._column_order(layouts[0].types) if layouts else None
+        if len(layouts) <= self.keep or order is None:
+            return list(range(min(self.keep, len(layouts))))
+        xs = np.array([layout.xs for layout in layouts])[:, order]
+        ys = np.array([layout.ys for layout in layouts])[:, order]
+        predicted = self.model.predict(xs, ys, self.grid_width, self.grid_height)
+        self.ranked += len(layouts)
+        self.screened_out += len(layouts) - self.keep
+        return [int(index) for index in np.argsort(-predicted, kind='stable')[:self.keep]]
+
+    def to_dict(self) -> Dict:
+        return {
+            'candidates': self.candidates,
+            'scored_per_iteration': self.keep,
+            'ranked': self.ranked,
+            'screened_out': self.screened_out,
+            'model_metrics': self.model.metrics
+        }
@@ -0,0 +1,226 @@
+"""
+Room-symmetry canonicalisation of layouts.
+
+The eight symmetries of a rectangle-or-square grid (the dihedral group D4)
+map a layout to mirror and rotation images of itself. canonical_key()
+picks one representative per class, so caches and visited-state sets can
+share entries between equivalent layouts. It also puts interchangeable
+objects of the same type in a fixed order.
+
+Reuse is only correct for a symmetry under which the cached quantity is
+exactly invariant. exact_symmetries() works this out per quantity:
+
+* 'validity': placement rules and overlaps depend only on the cells each
+  object covers, so every symmetry the grid and the object shapes allow
+  is exact. The 90-degree ones need a square grid and square furniture,
+  since types have a fixed orientation. The exception is an opening
+  mapped into a corner the placement rules read as another wall. Such
+  layouts have no image under that symmetry (transform_layout() returns
+  None).
+* 'position': the single-object score terms (heatmap.position_scores).
+  Bagua zone preferences are not mirror-symmetric for the built-in types.
+  Each candidate symmetry is therefore checked against the type's whole
+  position raster.
+* 'score': the full _calculate_layout_score. With two or more objects the
+  pairwise terms (chi flow, command position, the door/window/bed
+  distance penalties) use anchor corners and the bed's foot rather than
+  footprints. Those are preserved only when every object has the same
+  footprint and no bed, door or window is present. Otherwise only the
+  identity is exact.
+
+Object order matters to the scorer only through the "last object of a
+type" rule for beds, doors and windows. canonical_key() therefore sorts
+every other instance and keeps the last instance of those types last.
+"""
+
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+import numpy as np
+from heatmap import position_scores
+from layout import (
+    Layout,
+    TYPE_DIMENSIONS,
+    TYPE_SPANS,
+    TYPE_IS_BOUNDARY,
+    BED,
+    DOOR,
+    WINDOW
+)
+
+# name -> (swaps axes, mirrors x, mirrors y), applied as: optional transpose, then mirrors
+SYMMETRIES: Dict[str, Tuple[bool, bool, bool]] = {
+    'identity': (False, False, False),
+    'flip_x': (False, True, False),
+    'flip_y': (False, False, True),
+    'rot180': (False, True, True),
+    'transpose': (True, False, False),
+    'rot90': (True, True, False),
+    'rot270': (True, False, True),
+    'anti_transpose': (True, True, True),
+}
+
+SYMMETRY_TERMS = ('validity', 'position', 'score')
+
+# Types whose last instance the scorer singles out (see _find_last)
+ORDER_SENSITIVE_IDS = frozenset((BED, DOOR, WINDOW))
+
+def footprint(type_id: int, x: int, y: int, grid_width: int, grid_height: int) -> Tuple[int, int, int, int]:
+    """Cells covered by an object as (x, y, width, height); doors and windows cover their wall span."""
+    if TYPE_IS_BOUNDARY[type_id]:
+        if x == 0 or x == grid_width - 1:
+            return x, y, 1, TYPE_SPANS[type_id]
+        return x, y, TYPE_SPANS[type_id], 1
+    width, height = TYPE_DIMENSIONS[type_id]
+    return x, y, width, height
+
+def transform_position(symmetry: str, type_id: int, x: int, y: int,
+                       grid_width: int, grid_height: int) -> Optional[Tuple[int, int]]:
+    """
+    Anchor of the image of one object under a symmetry, or None when no
+    anchor has that image: an opening on the bottom or top wall whose image
+    starts at x = 0 or x = grid_width - 1 would be read as lying on a side wall.
+    """
+    swap, mirror_x, mirror_y = SYMMETRIES[symmetry]
+    fx, fy, width, height = footprint(type_id, x, y, grid_width, grid_height)
+    if swap:
+        fx, fy, width, height = fy, fx, height, width
+        grid_width, grid_height = grid_height, grid_width
+    if mirror_x:
+        fx = grid_width - fx - width
+    if mirror_y:
+        fy = grid_height - fy - height
+    if TYPE_IS_BOUNDARY[type_id] and footprint(type_id, fx, fy, grid_width, grid_height)[2:] != (width, height):
+        return None
+    return fx, fy
+
+def transform_layout(layout: Layout, symmetry: str, grid_width: int, grid_height: int) -> Optional[Layout]:
+    """
+    Image of a layout under a symmetry the grid allows (see
+    available_symmetries), or None if an opening has no exact image.
+    """
+    xs, ys = [], []
+    for t, x, y in zip(layout.types, layout.xs, layout.ys):
+        position = transform_position(symmetry, t, x, y, grid_width, grid_height)
+        if position is None:
+            return None
+        xs.append(position[0])
+        ys.append(position[1])
+    return Layout(layout.types, xs, ys)
+
+def available_symmetries(type_ids: Iterable[int], grid_width: int, grid_height: int) -> List[str]:
+    """Symmetries that map every layout of these types on this grid to another such layout."""
+    square = grid_width == grid_height and all(
+        TYPE_IS_BOUNDARY[t] or TYPE_DIMENSIONS[t][0] == TYPE_DIMENSIONS[t][1] for t in set(type_ids))
+    return [name for name, (swap, _, _) in SYMMETRIES.items() if square or not swap]
+
+def _position_raster_invariant(optimizer, type_id: int, symmetry: str) -> bool:
+    raster = position_scores(optimizer, type_id)
+    ys, xs = np.nonzero(~np.isnan(raster))
+    for x, y in zip(xs, ys):
+        image = transform_position(symmetry, type_id, int(x), int(y),
+                                   optimizer.grid_width, optimizer.grid_height)
+        if image is None or raster[image[1], image[0]] != raster[y, x]:
+            return False
+    return True
+
+def exact_symmetries(optimizer, type_ids: Sequence[int], terms: str = 'score') -> List[str]:
+    """
+    Symmetries under which `terms` is exactly invariant for layouts of these types.
+
+    Args:
+        optimizer: FengShuiOptimizer providing the grid size and scoring config
+        type_ids: Type id of every object in the layouts
+        terms: 'validity', 'position' or 'score' (see the module docstring)
+    """
+    if terms not in SYMMETRY_TERMS:
+        raise ValueError(f"Unknown symmetry terms: {terms}. Available: {list(SYMMETRY_TERMS)}")
+    candidates = available_symmetries(type_ids, optimizer.grid_width, optimizer.grid_height)
+    if terms == 'validity':
+        return candidates
+
+    if terms == 'score' and len(type_ids) >= 2:
+        shapes = {TYPE_DIMENSIONS[t] for t in type_ids}
+        if len(shapes) > 1 or any(TYPE_IS_BOUNDARY[t] or t in ORDER_SENSITIVE_IDS for t in type_ids):
+            return ['identity']
+
+    return [name for name in candidates if name == 'identity' or all(
+        _position_raster_invariant(optimizer, t, name) for t in set(type_ids))]
+
+def _ordered_key(types: Tuple[int, ...], xs: Sequence[int], ys: Sequence[int]) -> Tuple:
+    """Objects grouped by type, sorted within the type except a pinned last instance."""
+    by_type: Dict[int, List[Tuple[int, int]]] = {}
+    for t, x, y in zip(types, xs, ys):
+        by_type.setdefault(t, []).append((x, y))
+    key = []
+    for t in sorted(by_type):
+        positions = by_type[t]
+        if t in ORDER_SENSITIVE_IDS:
+            positions = sorted(positions[:-1]) + positions[-1:]
+        else:
+            positions = sorted(positions)
+        key.append((t, tuple(positions)))
+    return tuple(key)
+
+def canonical_key(layout: Layout, grid_width: int, grid_height: int,
+                  symmetries: Sequence[str] = ('identity',)) -> Tuple:
+    """
+    Hashable key shared by the images of the layout under `symmetries`.
+    Symmetries without an exact image of this layout are skipped, which
+    can only split a class, never merge layouts that differ.
+    """
+    keys = [_ordered_key(layout.types, layout.xs, layout.ys)]
+    for symmetry in symmetries:
+        if symmetry != 'identity':
+            image = transform_layout(layout, symmetry, grid_width, grid_height)
+            if image is not None:
+                keys.append(_ordered_key(image.types, image.xs, image.ys))
+    return min(keys)
+
+class ScoreCache:
+    """
+    Memo of layout scores keyed by canonical_key(), for the search loops.
+    """
+
+    def __init__(self, score_function, grid_width: int, grid_height: int,
+                 symmetries: Sequence[str] = ('identity',), max_entries: int = 50000):
+        """
+        Args:
+            score_function: Layout -> score, e.g. optimizer._calculate_layout_score
+            grid_width: Width of the grid in cells
+            grid_height: Height of the grid in cells
+            symmetries: Symmetries the score is exactly invariant under
+            max_entries: Entries kept before the memo is cleared; 0 disables it
+        """
+        self.score_function = score_function
+        self.grid_width = grid_width
+        self.grid_height = grid_height
+        self.symmetries = list(symmetries)
+        self.max_entries = max_entries
+        self.scores: Dict[Tuple, float] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def score(self, layout: Layout) -> Tuple[float, bool]:
+        """Score of a layout and whether it had to be computed."""
+        if self.max_entries <= 0:
+            self.misses += 1
+            return self.score_function(layout), True
+        key = canonical_key(layout, self.grid_width, self.grid_height, self.symmetries)
+        score: Optional[float] = self.scores.get(key)
+        if score is not None:
+            self.hits += 1
+            return score, False
+        self.misses += 1
+        score = self.score_function(layout)
+        if len(self.scores) >= self.max_entries:
+            self.scores.clear()
+        self.scores[key] = score
+        return score, True
+
+    def to_dict(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            'symmetries': self.symmetries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0
+        }
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Train a surrogate scorer (see surrogate.py) from a generate_dataset.py
+dataset in .npy format.
+
+The ridge regression is solved from sums accumulated chunk by chunk, so the
+dataset is streamed from its memory-mapped chunks rather than loaded. Every
+`--holdout-every`-th chunk of each grid is held out and used to report the
+R^2, the rank correlation and how often the model's best of a group of
+`--group` layouts is among the exact best `--top-fraction` of the group.
+
+    python train_surrogate.py --data data/layouts --out surrogate.npz
+
+The model is then used by passing algorithm {"surrogate_path": "surrogate.npz"}.
+"""
+
+import argparse
+import json
+import math
+import os
+from typing import Dict, List, Tuple
+import numpy as np
+from generate_dataset import MANIFEST_NAME, load_chunks
+from layout import intern_type
+from surrogate import SurrogateModel, feature_names, layout_features
+
+def _ranks(values: np.ndarray) -> np.ndarray:
+    ranks = np.empty(len(values))
+    ranks[np.argsort(values, kind='stable')] = np.arange(len(values))
+    return ranks
+
+def evaluate(model: SurrogateModel, holdout: List[Tuple[np.ndarray, Tuple[int, int]]],
+             group: int, top_fraction: float) -> Dict:
+    """Holdout quality of a model: R^2, Spearman correlation and top-k hit rate."""
+    predicted, actual, hits, groups = [], [], 0, 0
+    keep = max(1, math.ceil(group * top_fraction))
+    for records, (grid_width, grid_height) in holdout:
+        chunk_predicted = model.predict(records['x'], records['y'], grid_width, grid_height)
+        chunk_actual = np.asarray(records['score'], dtype=np.float64)
+        predicted.append(chunk_predicted)
+        actual.append(chunk_actual)
+        usable = len(chunk_actual) // group * group
+        if usable:
+            exact = chunk_actual[:usable].reshape(-1, group)
+            chosen = chunk_predicted[:usable].reshape(-1, group).argmax(axis=1)
+            threshold = -np.sort(-exact, axis=1)[:, keep - 1]
+            hits += int((exact[np.arange(len(exact)), chosen] >= threshold).sum())
+            groups += len(exact)
+    if not predicted:
+        return {}
+    predicted, actual = np.concatenate(predicted), np.concatenate(actual)
+    residual = ((actual - predicted) ** 2).sum()
+    total = ((actual - actual.mean()) ** 2).sum()
+    return {
+        'holdout_rows': float(len(actual)),
+        'r2': float(1 - residual / total) if total > 0 else 0.0,
+        'spearman': float(np.corrcoef(_ranks(predicted), _ranks(actual))[0, 1]),
+        'top_hit_rate': hits / groups if groups else 0.0
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Train a surrogate layout scorer")
+    parser.add_argument('--data', required=True, help="Directory written by generate_dataset.py (npy format)")
+    parser.add_argument('--out', required=True, help="Model file to write (.npz)")
+    parser.add_argument('--ridge', type=float, default=1.0, help="L2 penalty on the weights")
+    parser.add_argument('--holdout-every', type=int, default=10,
+                        help="Hold out every Nth chunk of each grid (0 trains on everything)")
+    parser.add_argument('--group', type=int, default=8, help="Group size of the top-k hit rate")
+    parser.add_argument('--top-fraction', type=float, default=0.25)
+    args = parser.parse_args()
+
+    with open(os.path.join(args.data, MANIFEST_NAME)) as f:
+        manifest = json.load(f)
+    if manifest['format'] != 'npy':
+        parser.error("Training needs a dataset generated with --format npy")
+    objects = manifest['objects']
+    type_ids = [intern_type(t) for t in objects]
+    width = len(feature_names(type_ids)) + 1
+
+    gram, moments, rows = np.zeros((width, width)), np.zeros(width), 0
+    holdout = []
+    for grid in manifest['grids']:
+        grid = tuple(grid)
+        for index, records in enumerate(load_chunks(args.data, grid)):
+            if not len(records):
+                continue
+            if args.holdout_every and index % args.holdout_every == args.holdout_every - 1:
+                holdout.append((records, grid))
+                continue
+            features = layout_features(type_ids, records['x'], records['y'], *grid)
+            augmented = np.hstack([features, np.ones((len(features), 1))])
+            gram += augmented.T @ augmented
+            moments += augmented.T @ np.asarray(records['score'], dtype=np.float64)
+            rows += len(records)
+    if not rows:
+        parser.error(f"No training layouts found in {args.data}")
+
+    model = SurrogateModel.fit(objects, gram, moments, args.ridge)
+    model.metrics = {'training_rows': float(rows), **evaluate(model, holdout, args.group, args.top_fraction)}
+    model.save(args.out)
+    print(f"Trained on {rows} layouts of {objects}, {width - 1} features")
+    for name, value in model.metrics.items():
+        print(f"  {name}: {value:.4f}")
+    print(f"Saved {args.out}")
+
+if __name__ == '__main__':
+    main()
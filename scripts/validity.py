@@ -0,0 +1,172 @@
+"""
+Incremental validity tracking for layouts.
+
+A layout is valid when every object satisfies its placement rule (doors and
+windows on a wall with room for their span, furniture inside the grid, known
+types only) and no two non-boundary objects overlap. These are the rules
+helpers.is_position_valid / check_object_collision apply cell by cell.
+
+ValidityTracker keeps the rule flags and the overlap counts up to date as
+single objects move, using a bucket grid so a move only looks at the objects
+near the old and new positions. Moves can be undone one at a time or rolled
+back to a mark.
+"""
+
+from typing import Dict, List, Set, Tuple
+from layout import Layout, TYPE_DIMENSIONS, TYPE_IS_BOUNDARY, TYPE_IS_KNOWN, TYPE_SPANS
+
+def satisfies_placement_rule(type_id: int, x: int, y: int, grid_width: int, grid_height: int) -> bool:
+    """Placement rule of one object, ignoring the other objects."""
+    if not TYPE_IS_KNOWN[type_id]:
+        return False
+
+    if TYPE_IS_BOUNDARY[type_id]:
+        span = TYPE_SPANS[type_id]
+        if x == 0 or x == grid_width - 1:  # Vertical wall
+            return 0 <= y and y + span <= grid_height
+        if y == 0 or y == grid_height - 1:  # Horizontal wall
+            return 0 <= x and x + span <= grid_width
+        return False
+
+    width, height = TYPE_DIMENSIONS[type_id]
+    return x >= 0 and y >= 0 and x + width <= grid_width and y + height <= grid_height
+
+class ValidityTracker:
+    """
+    Mutable validity state of one Layout, updated by move() / undo().
+
+    The tracker owns the layout while in use: move objects through it, not
+    through layout.move(), or its counts go stale.
+    """
+
+    def __init__(self, layout: Layout, grid_width: int, grid_height: int, bucket_size: int = 16):
+        """
+        Args:
+            layout: Layout to track; moves are applied to it in place
+            grid_width: Width of the grid in cells
+            grid_height: Height of the grid in cells
+            bucket_size: Side of the square buckets used to find neighbours
+        """
+        self.layout = layout
+        self.grid_width = grid_width
+        self.grid_height = grid_height
+        self.bucket_size = bucket_size
+
+        self.buckets: Dict[Tuple[int, int], Set[int]] = {}
+        self.rule_ok: List[bool] = [True] * len(layout)
+        self.overlaps: List[int] = [0] * len(layout)
+        self.rule_violations = 0
+        self.overlap_pairs = 0
+        self._undo: List[Tuple[int, int, int]] = []
+
+        for index in range(len(layout)):
+            self._insert(index)
+
+    def _bucket_keys(self, index: int) -> List[Tuple[int, int]]:
+        x, y = self.layout.xs[index], self.layout.ys[index]
+        width, height = TYPE_DIMENSIONS[self.layout.types[index]]
+        size = self.bucket_size
+        return [(bx, by)
+                for bx in range(x // size, (x + width - 1) // size + 1)
+                for by in range(y // size, (y + height - 1) // size + 1)]
+
+    def _overlapping(self, index: int) -> Set[int]:
+        """Non-boundary objects whose rectangles overlap the object at index."""
+        layout = self.layout
+        x, y = layout.xs[index], layout.ys[index]
+        width, height = TYPE_DIMENSIONS[layout.types[index]]
+
+        candidates = set()
+        for key in self._bucket_keys(index):
+            candidates |= self.buckets.get(key, set())
+        candidates.discard(index)
+
+        overlapping = set()
+        for other in candidates:
+            other_x, other_y = layout.xs[other], layout.ys[other]
+            other_width, other_height = TYPE_DIMENSIONS[layout.types[other]]
+            if not (x + width <= other_x or other_x + other_width <= x or
+                    y + height <= other_y or other_y + other_height <= y):
+                overlapping.add(other)
+        return overlapping
+
+    def _insert(self, index: int):
+        type_id = self.layout.types[index]
+        rule_ok = satisfies_placement_rule(type_id, self.layout.xs[index], self.layout.ys[index],
+                                           self.grid_width, self.grid_height)
+        self.rule_ok[index] = rule_ok
+        self.rule_violations += not rule_ok
+
+        if TYPE_IS_BOUNDARY[type_id]:
+            return  # Doors and windows occupy no cells
+        for other in self._overlapping(index):
+            self.overlaps[other] += 1
+            self.overlaps[index] += 1
+            self.overlap_pairs += 1
+        for key in self._bucket_keys(index):
+            self.buckets.setdefault(key, set()).add(index)
+
+    def _remove(self, index: int):
+        self.rule_violations -= not self.rule_ok[index]
+        self.rule_ok[index] = True
+
+        if TYPE_IS_BOUNDARY[self.layout.types[index]]:
+            return
+        for key in self._bucket_keys(index):
+            bucket = self.buckets[key]
+            bucket.discard(index)
+            if not bucket:
+                del self.buckets[key]
+        for other in self._overlapping(index):
+            self.overlaps[other] -= 1
+            self.overlap_pairs -= 1
+        self.overlaps[index] = 0
+
+    def move(self, index: int, x: int, y: int):
+        """Move one object, remembering its old position for undo()."""
+        self._undo.append((index, self.layout.xs[index], self.layout.ys[index]))
+        self._remove(index)
+        self.layout.move(index, x, y)
+        self._insert(index)
+
+    def append(self, type_id: int, x: int, y: int):
+        """Add an object to the layout (not undoable)."""
+        self.layout.append(type_id, x, y)
+        self.rule_ok.append(True)
+        self.overlaps.append(0)
+        self._insert(len(self.layout) - 1)
+
+    def undo(self):
+        """Revert the most recent move."""
+        index, x, y = self._undo.pop()
+        self._remove(index)
+        self.layout.move(index, x, y)
+        self._insert(index)
+
+    def mark(self) -> int:
+        """Position in the undo history to roll back to later."""
+        return len(self._undo)
+
+    def rollback(self, mark: int = 0):
+        """Undo every move made since mark."""
+        while len(self._undo) > mark:
+            self.undo()
+
+    def object_is_valid(self, index: int) -> bool:
+        """The object satisfies its placement rule and overlaps nothing."""
+        return self.rule_ok[index] and self.overlaps[index] == 0
+
+    @property
+    def is_valid(self) -> bool:
+        return self.rule_violations == 0 and self.overlap_pairs == 0
+
+    def violations(self) -> List[str]:
+        """Human-readable reasons the layout is invalid."""
+        layout = self.layout
+        reasons = [f"Invalid position for {layout.type_name(index)} at ({layout.xs[index]}, {layout.ys[index]})"
+                   for index in range(len(layout)) if not self.rule_ok[index]]
+        for index in range(len(layout)):
+            for other in sorted(self._overlapping(index)) if self.overlaps[index] else ():
+                if other > index:
+                    reasons.append(f"Overlap detected between {layout.type_name(index)} and {layout.type_name(other)}")
+        return reasons
@@ -0,0 +1,71 @@
+"""
+Compact wire format for placement-returning endpoints.
+
+By default placements travel as a list of {'type', 'x', 'y'} objects. A
+client that sends
+
+    X-Placement-Format: columnar
+
+gets every 'placements' value in the response as parallel arrays instead:
+
+    {"types": ["bed", "door"], "type": [0, 1, 0], "x": [...], "y": [...]}
+
+where 'type' indexes into the per-value 'types' table, and the body is
+encoded without whitespace. Request bodies may use the same form for their
+'placements'. Independently, responses larger than GZIP_MIN_BYTES are
+gzip-compressed when the request's Accept-Encoding allows it.
+"""
+
+import gzip
+from typing import Dict, List, Optional, Union
+from layout import Layout
+
+PLACEMENT_FORMAT_HEADER = 'X-Placement-Format'
+PLACEMENT_FORMATS = ('objects', 'columnar')
+
+# Keys whose values are placement lists, wherever they appear in a response
+PLACEMENT_KEYS = ('placements',)
+
+# Smaller bodies are not worth the compression time
+GZIP_MIN_BYTES = 1024
+GZIP_LEVEL = 5
+
+def placement_format(value: Optional[str]) -> str:
+    """Validate the X-Placement-Format header value (default 'objects')."""
+    value = (value or 'objects').strip().lower()
+    if value not in PLACEMENT_FORMATS:
+        raise ValueError(f"Unknown placement format: {value}. Available: {list(PLACEMENT_FORMATS)}")
+    return value
+
+def read_placements(value: Union[List[Dict], Dict]) -> Layout:
+    """Build a Layout from request placements in either wire format."""
+    if isinstance(value, dict):
+        return Layout.from_columns(value)
+    return Layout.from_placements(value)
+
+def placements_to_columns(placements: List[Dict]) -> Dict:
+    """
+    Columnar form of response placements (see Layout.to_columns), keeping
+    their type names as they are rather than interning them.
+    """
+    table: Dict[str, int] = {}
+    indices = [table.setdefault(placement['type'], len(table)) for placement in placements]
+    return {'types': list(table), 'type': indices,
+            'x': [placement['x'] for placement in placements],
+            'y': [placement['y'] for placement in placements]}
+
+def to_columnar(payload):
+    """Copy of a response payload with every placement list in columnar form."""
+    if isinstance(payload, dict):
+        return {key: (placements_to_columns(value)
+                      if key in PLACEMENT_KEYS and isinstance(value, list) else to_columnar(value))
+                for key, value in payload.items()}
+    if isinstance(payload, list):
+        return [to_columnar(item) for item in payload]
+    return payload
+
+def maybe_gzip(body: bytes, accepts_gzip: bool) -> Optional[bytes]:
+    """Gzip-compressed body, or None when it should go out as is."""
+    if not accepts_gzip or len(body) < GZIP_MIN_BYTES:
+        return None
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)